@@ -0,0 +1,215 @@
+"""
+Load benchmark of the hot endpoints: seeds a SQLite file database with
+synthetic trips, users, cards and reservations, then drives each endpoint
+with concurrent workers through the Flask test client. Reports latency
+percentiles and throughput, and stores them as JSON.
+
+    python -m benchmarks.bench_endpoints --workers 16 --seconds 5
+    python -m benchmarks.bench_endpoints --compare benchmarks/results/endpoints-....json
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from tickets_project import create_app, db
+
+from .results import default_path, percentile, read_results, write_results
+from .synthetic import CITIES, PASSWORD, seed, username
+
+
+def list_trips(client, rng, args):
+    return client.get("/trips/")
+
+
+def filter_trips(client, rng, args):
+    return client.post(
+        "/trips/filter",
+        data={"filter_type": "dep_city", "filter_data": rng.choice(CITIES)},
+    )
+
+
+def create_reservation(client, rng, args):
+    return client.post(
+        f"/trips/{rng.randrange(1, args.trips + 1)}/reserve",
+        data={"ticket_numbers": str(rng.randrange(1, 3))},
+    )
+
+
+def list_reservations(client, rng, args):
+    return client.get("/reservations/")
+
+
+def log_in(client, rng, args):
+    return client.post(
+        "/login",
+        data={
+            "username": username(rng.randrange(2, args.users + 1)),
+            "password": PASSWORD,
+        },
+    )
+
+
+SCENARIOS = {
+    "trips.list": list_trips,
+    "trips.filter": filter_trips,
+    "reservations.create_post": create_reservation,
+    "reservations.list": list_reservations,
+    "users.login_post": log_in,
+}
+
+
+def run_scenario(app, scenario, args):
+    barrier = threading.Barrier(args.workers + 1)
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    deadline = None
+
+    def work(worker):
+        rng = random.Random(worker)
+        client = app.test_client()
+        with client.session_transaction() as session:
+            # regular users, user 1 is the admin
+            session["_user_id"] = str(worker % (args.users - 1) + 2)
+        own_latencies = []
+        own_statuses = Counter()
+
+        barrier.wait()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = scenario(client, rng, args)
+            own_latencies.append(time.perf_counter() - start)
+            own_statuses[response.status_code] += 1
+
+        with lock:
+            latencies.extend(own_latencies)
+            statuses.update(own_statuses)
+
+    workers = [
+        threading.Thread(target=work, args=(worker,)) for worker in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    deadline = time.perf_counter() + args.seconds
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput": len(latencies) / elapsed,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else None,
+        **{
+            f"p{p}_ms": percentile(latencies, p) * 1000 if latencies else None
+            for p in (50, 95, 99)
+        },
+    }
+
+
+def print_comparison(results, baseline):
+    print(f"\ncompared with {baseline['commit']} ({baseline['created_at']}):")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before or not before["requests"] or not result["requests"]:
+            continue
+        print(
+            f"{name:>26}: p95 {result['p95_ms'] / before['p95_ms'] - 1:+7.1%}, "
+            f"throughput {result['throughput'] / before['throughput'] - 1:+7.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--cards", type=int, default=300)
+    parser.add_argument("--reservations", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument(
+        "--seconds", type=float, default=5, help="How long each endpoint is driven."
+    )
+    parser.add_argument("--password-rounds", type=int, default=12)
+    parser.add_argument(
+        "--endpoint",
+        action="append",
+        choices=SCENARIOS,
+        help="Endpoints to drive, all of them by default.",
+    )
+    parser.add_argument(
+        "--request-log",
+        action="store_true",
+        help="Log every request, to measure what the request log costs.",
+    )
+    parser.add_argument(
+        "--profile-sample-rate",
+        type=float,
+        default=0,
+        help="Share of requests profiled, to measure what profiling costs.",
+    )
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="Earlier JSON results to compare with.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+                + os.path.join(tmp_dir, "endpoints.db"),
+                "SQLALCHEMY_ENGINE_OPTIONS": {
+                    "connect_args": {"timeout": 60},
+                    "pool_size": args.workers + 4,
+                },
+                "TESTING": True,
+                "REQUEST_LOG": args.request_log,
+                "PROFILE_SAMPLE_RATE": args.profile_sample_rate,
+            }
+        )
+        with app.app_context():
+            start = time.perf_counter()
+            seed(
+                args.trips,
+                args.users,
+                args.cards,
+                args.reservations,
+                args.password_rounds,
+            )
+            print(f"seeded in {time.perf_counter() - start:.2f}s")
+
+        results = {}
+        for name in args.endpoint or SCENARIOS:
+            result = results[name] = run_scenario(app, SCENARIOS[name], args)
+            print(
+                f"{name:>26}: {result['throughput']:8.1f} req/s, "
+                f"p50/p95/p99 {result['p50_ms']:.1f}/{result['p95_ms']:.1f}/"
+                f"{result['p99_ms']:.1f}ms, {result['errors']} errors "
+                f"({result['requests']} requests)"
+            )
+
+        with app.app_context():
+            db.engine.dispose()
+
+    params = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in ("output", "compare")
+    }
+    path = write_results(
+        args.output or default_path("endpoints"), "endpoints", params, results
+    )
+    print(f"results written to {path}")
+    if args.compare:
+        print_comparison(results, read_results(args.compare))
+
+
+if __name__ == "__main__":
+    main()
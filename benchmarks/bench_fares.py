@@ -0,0 +1,75 @@
+"""
+Compares quoting fares one at a time with calculate_discount against
+quoting all of them at once with quote_fares.
+
+    python -m benchmarks.bench_fares --quotes 500
+"""
+
+import argparse
+import random
+import timeit
+from datetime import datetime, timedelta
+
+from tickets_project.fares import quote_fares
+from tickets_project.models.train_card import SUPPORTED_CARD_TYPES, TrainCard
+from tickets_project.models.trip import Trip
+from tickets_project.reservations import calculate_discount
+
+
+def generate_quotes(count, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2030, 1, 1)
+    quotes = []
+    for _ in range(count):
+        departure = start + timedelta(minutes=rng.randrange(365 * 24 * 60))
+        trip = Trip(
+            departure_datetime=departure,
+            arrival_datetime=departure + timedelta(minutes=rng.randrange(30, 600)),
+            base_ticket_price=round(rng.uniform(5, 100), 2),
+        )
+        card_type = rng.choice([None, *SUPPORTED_CARD_TYPES])
+        card = TrainCard(card_type=card_type) if card_type else None
+        quotes.append((trip, card, rng.randrange(1, 6), rng.random() < 0.3))
+    return quotes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quotes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    quotes = generate_quotes(args.quotes)
+    columns = (
+        [trip.departure_datetime for trip, _, _, _ in quotes],
+        [trip.arrival_datetime for trip, _, _, _ in quotes],
+        [trip.base_ticket_price for trip, _, _, _ in quotes],
+        [num_of_tickets for _, _, num_of_tickets, _ in quotes],
+        [card.card_type if card else None for _, card, _, _ in quotes],
+        [has_child for _, _, _, has_child in quotes],
+    )
+
+    def scalar():
+        return [calculate_discount(*quote) for quote in quotes]
+
+    def batch():
+        return quote_fares(*columns)
+
+    assert scalar() == batch().tolist()
+
+    results = {}
+    for name, quote in (("calculate_discount", scalar), ("quote_fares", batch)):
+        seconds = min(timeit.repeat(quote, number=1, repeat=args.repeat))
+        results[name] = seconds
+        print(
+            f"{name:>20}: {seconds * 1000:8.3f} ms per {args.quotes} quotes, "
+            f"{seconds / args.quotes * 1e9:8.0f} ns per quote"
+        )
+    print(
+        f"{'speedup':>20}: "
+        f"{results['calculate_discount'] / results['quote_fares']:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compares reservations per second with a commit per request against group
+commit, with concurrent buyers on a SQLite file database.
+
+    python -m benchmarks.bench_group_commit --buyers 32 --reservations 20
+    python -m benchmarks.bench_group_commit --journal-mode DELETE --synchronous FULL
+
+Group commit saves fsyncs. With the default WAL and synchronous=NORMAL a
+commit doesn't fsync, so compare with the durable settings as well.
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from tickets_project import create_app, db
+from tickets_project.engine import DEFAULT_SQLITE_PRAGMAS
+from tickets_project.models.reservation import Reservation
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+
+
+def run(group_commit, buyers, reservations, tmp_dir, pragmas):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+            + os.path.join(tmp_dir, f"group_commit_{group_commit}.db"),
+            "SQLALCHEMY_ENGINE_OPTIONS": {
+                "connect_args": {"timeout": 60},
+                "pool_size": buyers + 1,
+            },
+            "SQLITE_PRAGMAS": pragmas,
+            "GROUP_COMMIT": group_commit,
+            "TESTING": True,
+        }
+    )
+    with app.app_context():
+        db.session.add(
+            User(
+                email="bench@email.bg",
+                username="bench_user",
+                password="strongpass",
+                firstname="bench",
+                lastname="bench",
+                age=30,
+            )
+        )
+        db.session.add(
+            Trip(
+                departure_city="Sofia",
+                arrival_city="Varna",
+                departure_datetime=datetime.now() + timedelta(days=1),
+                arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                available_seats=buyers * reservations,
+                base_ticket_price=10,
+            )
+        )
+        db.session.commit()
+        commits = []
+        event.listen(db.engine, "commit", lambda *args: commits.append(1))
+
+    barrier = threading.Barrier(buyers + 1)
+
+    def buy():
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+        barrier.wait()
+        for _ in range(reservations):
+            client.post("/trips/1/reserve", data={"ticket_numbers": "1"})
+
+    threads = [threading.Thread(target=buy) for _ in range(buyers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        created = Reservation.query.count()
+        db.engine.dispose()
+    return created, len(commits), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--buyers", type=int, default=32)
+    parser.add_argument("--reservations", type=int, default=20)
+    parser.add_argument(
+        "--journal-mode", default=DEFAULT_SQLITE_PRAGMAS["journal_mode"]
+    )
+    parser.add_argument("--synchronous", default=DEFAULT_SQLITE_PRAGMAS["synchronous"])
+    args = parser.parse_args()
+    pragmas = {
+        **DEFAULT_SQLITE_PRAGMAS,
+        "journal_mode": args.journal_mode,
+        "synchronous": args.synchronous,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for group_commit in (False, True):
+            created, commits, elapsed = run(
+                group_commit, args.buyers, args.reservations, tmp_dir, pragmas
+            )
+            print(
+                f"{'group commit' if group_commit else 'commit per request':>20}: "
+                f"{created} reservations in {elapsed:.2f}s, "
+                f"{created / elapsed:7.1f} reservations/s, {commits} commits"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Compares concurrent read and write throughput on a SQLite file database
+with SQLite's default settings against the tuned pragmas.
+
+    python -m benchmarks.bench_sqlite_tuning --readers 8 --writers 4 --seconds 5
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import OperationalError
+
+from tickets_project import create_app, db
+from tickets_project.engine import DEFAULT_SQLITE_PRAGMAS
+from tickets_project.models.reservation import Reservation
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+
+TRIPS = 100
+
+
+def run(pragmas, readers, writers, seconds, tmp_dir):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+            + os.path.join(tmp_dir, f"tuning_{bool(pragmas)}.db"),
+            "SQLALCHEMY_ENGINE_OPTIONS": {
+                "connect_args": {"timeout": 60},
+                "pool_size": readers + writers + 1,
+            },
+            "SQLITE_PRAGMAS": pragmas,
+            "TESTING": True,
+        }
+    )
+    with app.app_context():
+        db.session.add(
+            User(
+                email="bench@email.bg",
+                username="bench_user",
+                password="strongpass",
+                firstname="bench",
+                lastname="bench",
+                age=30,
+            )
+        )
+        for i in range(TRIPS):
+            db.session.add(
+                Trip(
+                    departure_city="Sofia",
+                    arrival_city="Varna",
+                    departure_datetime=datetime.now() + timedelta(days=1, hours=i),
+                    arrival_datetime=datetime.now() + timedelta(days=1, hours=i + 3),
+                    available_seats=1000000,
+                    base_ticket_price=10,
+                )
+            )
+        db.session.commit()
+
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(readers + writers + 1)
+    stop = threading.Event()
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def read(n):
+        with app.app_context():
+            barrier.wait()
+            while not stop.is_set():
+                try:
+                    Trip.query.filter(Trip.available_seats > 0).order_by(
+                        Trip.departure_datetime
+                    ).limit(20).all()
+                    db.session.execute(
+                        db.select(db.func.count(Reservation.id)).where(
+                            Reservation.trip_id == n % TRIPS + 1
+                        )
+                    ).scalar()
+                    db.session.rollback()
+                    count("reads")
+                except OperationalError:
+                    db.session.rollback()
+                    count("errors")
+
+    def write(n):
+        with app.app_context():
+            barrier.wait()
+            i = 0
+            while not stop.is_set():
+                trip_id = (n + i) % TRIPS + 1
+                i += 1
+                try:
+                    db.session.execute(
+                        db.update(Trip)
+                        .where(Trip.id == trip_id)
+                        .values(available_seats=Trip.available_seats - 1)
+                    )
+                    db.session.add(
+                        Reservation(
+                            ticket_numbers=1, sum_price=10, trip_id=trip_id, user_id=1
+                        )
+                    )
+                    db.session.commit()
+                    count("writes")
+                except OperationalError:
+                    db.session.rollback()
+                    count("errors")
+
+    threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)] + [
+        threading.Thread(target=write, args=(n,)) for n in range(writers)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        db.engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, pragmas in [
+            ("SQLite defaults", {}),
+            ("tuned pragmas", DEFAULT_SQLITE_PRAGMAS),
+        ]:
+            counts = run(pragmas, args.readers, args.writers, args.seconds, tmp_dir)
+            print(
+                f"{name:>16}: {counts['reads'] / args.seconds:8.1f} reads/s, "
+                f"{counts['writes'] / args.seconds:7.1f} writes/s, "
+                f"{counts['errors']} errors"
+            )
+
+
+if __name__ == "__main__":
+    main()
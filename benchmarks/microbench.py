@@ -0,0 +1,245 @@
+"""
+Microbenchmarks of the functions the hot paths depend on, over generated
+inputs. Reports ns/op and bytes allocated per op, and fails when a function
+got slower or allocates more than --threshold compared to the baseline.
+
+    python -m benchmarks.microbench
+    python -m benchmarks.microbench --case calculate_discount --threshold 0.5
+    python -m benchmarks.microbench --update-baseline
+
+The baseline is only meaningful on the machine it was recorded on, record a
+new one (--update-baseline) before comparing on another machine.
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+
+from tickets_project import DATETIME_FORMAT, SUPPORTED_TRIP_FILTER_TYPES
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import check_email
+from tickets_project.reservations import (calculate_discount,
+                                          validate_available_tickets)
+from tickets_project.trips import filter_trips, validate_trip_input
+
+from .bench_fares import generate_quotes
+from .results import default_path, read_results, write_results
+from .synthetic import CITIES, generate_trips
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "microbench_baseline.json")
+# ops whose allocations are traced, tracing is too slow for all of them
+ALLOCATION_SAMPLES = 200
+
+
+def generate_trip_objects(rng, size):
+    return [Trip(**row) for row in generate_trips(rng, size, datetime.now())]
+
+
+# every case returns a function doing a single op and the inputs to run it on
+def bench_calculate_discount(rng, size):
+    def op(quote):
+        calculate_discount(*quote)
+
+    return op, generate_quotes(size, seed=rng.random())
+
+
+def bench_validate_available_tickets(rng, size):
+    def op(request):
+        try:
+            validate_available_tickets(*request)
+        except ValueError:
+            pass
+
+    # about one in ten asks for more seats than there are
+    return op, [(rng.randrange(1, 6), rng.randrange(0, 50)) for _ in range(size)]
+
+
+def bench_filter_trips(rng, size):
+    # an op filters a page sized list of trips
+    trips = generate_trip_objects(rng, 100)
+
+    def op(trip_filter):
+        filter_trips(trips, *trip_filter)
+
+    return op, [
+        (filter_type, rng.choice(CITIES))
+        for filter_type in rng.choices(SUPPORTED_TRIP_FILTER_TYPES, k=size)
+    ]
+
+
+def bench_validate_trip_input(rng, size):
+    def op(trip_input):
+        try:
+            validate_trip_input(trip_input)
+        except ValueError:
+            pass
+
+    inputs = []
+    for row in generate_trips(rng, size, datetime.now()):
+        if rng.random() < 0.1:
+            row["arrival_city"] = row["departure_city"]
+        inputs.append(
+            {
+                "departure_city": row["departure_city"],
+                "arrival_city": row["arrival_city"],
+                "departure_datetime": row["departure_datetime"].strftime(
+                    DATETIME_FORMAT
+                ),
+                "arrival_datetime": row["arrival_datetime"].strftime(DATETIME_FORMAT),
+            }
+        )
+    return op, inputs
+
+
+def bench_check_email(rng, size):
+    def op(email):
+        try:
+            check_email(email)
+        except ValueError:
+            pass
+
+    emails = []
+    for n in range(size):
+        name = "".join(
+            rng.choices("abcdefghijklmnopqrstuvwxyz._", k=rng.randrange(3, 20))
+        )
+        domain = rng.choice(["example.com", "mail.bg", "abv.bg", "company.co.uk"])
+        # about one in three is missing its domain or its @
+        emails.append(
+            rng.choice(
+                [f"{name}{n}@{domain}"] * 4
+                + [f"{name}{n}@localhost", f"{name}{n}.{domain}"]
+            )
+        )
+    return op, emails
+
+
+def bench_trip_repr(rng, size):
+    return repr, generate_trip_objects(rng, size)
+
+
+CASES = {
+    "calculate_discount": bench_calculate_discount,
+    "validate_available_tickets": bench_validate_available_tickets,
+    "filter_trips": bench_filter_trips,
+    "validate_trip_input": bench_validate_trip_input,
+    "check_email": bench_check_email,
+    "Trip.__repr__": bench_trip_repr,
+}
+
+
+def measure(case, size, repeat, seed):
+    op, inputs = case(random.Random(seed), size)
+
+    def run():
+        for value in inputs:
+            op(value)
+
+    # warm up, so caches filled on first use aren't counted
+    run()
+
+    gc.collect()
+    seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+
+    # the memory an op allocates on top of what is allocated already,
+    # freed again by the end of the op or not
+    allocated = 0
+    samples = inputs[:ALLOCATION_SAMPLES]
+    tracemalloc.start()
+    try:
+        for value in samples:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            op(value)
+            _, peak = tracemalloc.get_traced_memory()
+            allocated += peak - before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops": len(inputs),
+        "ns_per_op": seconds / len(inputs) * 1e9,
+        "bytes_per_op": allocated / len(samples),
+    }
+
+
+def regressions(results, baseline, threshold):
+    found = []
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        for metric in ("ns_per_op", "bytes_per_op"):
+            # a few bytes per op are noise, not a regression
+            limit = before[metric] * (1 + threshold)
+            if metric == "bytes_per_op":
+                limit = max(limit, before[metric] + 16)
+            if result[metric] > limit:
+                found.append(
+                    f"{name} {metric}: {result[metric]:.1f} > {before[metric]:.1f}"
+                    f" (+{result[metric] / max(before[metric], 1e-9) - 1:.0%})"
+                )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--case", action="append", choices=CASES)
+    parser.add_argument("--size", type=int, default=2000, help="Inputs per case.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Fail when a case is this much worse than the baseline (0.25 = 25%%).",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store this run as the baseline instead of comparing with it.",
+    )
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.case or CASES:
+        result = results[name] = measure(CASES[name], args.size, args.repeat, args.seed)
+        print(
+            f"{name:>26}: {result['ns_per_op']:10.0f} ns/op "
+            f"{result['bytes_per_op']:10.1f} B/op"
+        )
+
+    params = {"size": args.size, "repeat": args.repeat, "seed": args.seed}
+    if args.update_baseline:
+        if os.path.exists(args.baseline):
+            # cases that weren't run keep their old baseline
+            results = {**read_results(args.baseline)["results"], **results}
+        write_results(args.baseline, "microbench", params, results)
+        print(f"baseline written to {args.baseline}")
+        return
+
+    write_results(
+        args.output or default_path("microbench"), "microbench", params, results
+    )
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --update-baseline first")
+        return
+
+    found = regressions(results, read_results(args.baseline), args.threshold)
+    if found:
+        print(f"\nregressed by more than {args.threshold:.0%}:")
+        for regression in found:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nno regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
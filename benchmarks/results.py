@@ -0,0 +1,63 @@
+"""
+Benchmark results as JSON files, so runs can be compared over time.
+"""
+
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values, p):
+    # nearest rank
+    if not sorted_values:
+        return None
+    rank = max(1, round(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def default_path(name):
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return os.path.join(RESULTS_DIR, f"{name}-{timestamp}.json")
+
+
+def write_results(path, name, params, results):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "benchmark": name,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "params": params,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+        f.write("\n")
+    return path
+
+
+def read_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
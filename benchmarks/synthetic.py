@@ -0,0 +1,108 @@
+"""
+Fast synthetic data for benchmarks: rows are generated as plain dicts and
+inserted with one executemany per chunk, without creating model objects.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from tickets_project import db
+from tickets_project.models.reservation import Reservation
+from tickets_project.models.train_card import SUPPORTED_CARD_TYPES, TrainCard
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+from tickets_project.passwords import PasswordHasher
+
+CITIES = [
+    "Sofia",
+    "Plovdiv",
+    "Varna",
+    "Burgas",
+    "Ruse",
+    "Stara Zagora",
+    "Pleven",
+    "Sliven",
+    "Dobrich",
+    "Shumen",
+    "Pernik",
+    "Haskovo",
+    "Yambol",
+    "Pazardzhik",
+    "Blagoevgrad",
+    "Veliko Tarnovo",
+]
+PASSWORD = "benchmark"
+CHUNK_SIZE = 5000
+
+
+def username(n):
+    return f"user{n}"
+
+
+def insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(db.insert(model), rows[start : start + CHUNK_SIZE])
+    db.session.commit()
+
+
+def generate_trips(rng, count, now):
+    for _ in range(count):
+        departure_city, arrival_city = rng.sample(CITIES, 2)
+        departure = now + timedelta(minutes=rng.randrange(30, 60 * 24 * 60))
+        yield {
+            "departure_city": departure_city,
+            "arrival_city": arrival_city,
+            "departure_datetime": departure,
+            "arrival_datetime": departure + timedelta(minutes=rng.randrange(30, 600)),
+            "two_way_trip": rng.random() < 0.2,
+            "available_seats": rng.randrange(50, 500),
+            "base_ticket_price": round(rng.uniform(5, 80), 2),
+        }
+
+
+def generate_users(rng, count, password_hash):
+    # user 1 is an admin, the others are regular users
+    for n in range(1, count + 1):
+        yield {
+            "email": f"{username(n)}@example.com",
+            "username": username(n),
+            "password": password_hash,
+            "firstname": "Bench",
+            "lastname": f"User {n}",
+            "age": rng.randrange(18, 90),
+            "is_admin": n == 1,
+        }
+
+
+def generate_cards(rng, users, count):
+    for user_id in rng.sample(range(1, users + 1), min(count, users)):
+        yield {"card_type": rng.choice(SUPPORTED_CARD_TYPES), "user_id": user_id}
+
+
+def generate_reservations(rng, trips, users, count, now):
+    for _ in range(count):
+        tickets = rng.randrange(1, 4)
+        yield {
+            "created_at": now - timedelta(minutes=rng.randrange(0, 6 * 24 * 60)),
+            "ticket_numbers": tickets,
+            "sum_price": round(tickets * rng.uniform(5, 80), 2),
+            "has_child": rng.random() < 0.2,
+            "is_paid_for": rng.random() < 0.7,
+            "trip_id": rng.randrange(1, trips + 1),
+            "user_id": rng.randrange(1, users + 1),
+        }
+
+
+def seed(trips, users, cards, reservations, password_rounds=12, seed=0):
+    # needs an app context with an empty database. Every user's password is
+    # PASSWORD, hashed once with password_rounds.
+    rng = random.Random(seed)
+    now = datetime.now()
+    password_hash = PasswordHasher(workers=0, rounds=password_rounds).hash(PASSWORD)
+
+    insert(Trip, list(generate_trips(rng, trips, now)))
+    insert(User, list(generate_users(rng, users, password_hash)))
+    insert(TrainCard, list(generate_cards(rng, users, cards)))
+    insert(
+        Reservation, list(generate_reservations(rng, trips, users, reservations, now))
+    )
@@ -1,25 +1,114 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 from flask import Flask
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 
+from .engine import (DEFAULT_SQLITE_PRAGMAS, RoutingSession, engine_options,
+                     set_sqlite_pragmas)
+
 load_dotenv()
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 DATETIME_FORMAT = "%Y-%m-%dT%H:%M"
 SUPPORTED_TRIP_FILTER_TYPES = ["dep_city", "arr_city", "one_way", "two_way"]
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+IMPORT_BATCH_SIZE = 10000
+# users are hashed before they are inserted, so their batches are smaller
+USER_IMPORT_BATCH_SIZE = 1000
+SETTLEMENT_CHUNK_SIZE = 1000
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
 
     app.config["SECRET_KEY"] = os.environ.get("APP_SECRET")
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
-        basedir, "database.db"
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+        "DATABASE_URL", "sqlite:///" + os.path.join(basedir, "database.db")
+    )
+    app.config["SQLITE_PRAGMAS"] = dict(DEFAULT_SQLITE_PRAGMAS)
+    # read replicas, comma separated - views marked read only query one of them
+    app.config["SQLALCHEMY_BINDS"] = {
+        f"replica_{i}": url.strip()
+        for i, url in enumerate(os.environ.get("DATABASE_REPLICA_URLS", "").split(","))
+        if url.strip()
+    }
+    app.config["READ_REPLICAS"] = list(app.config["SQLALCHEMY_BINDS"])
+    # seconds a client reads from the primary after a write, so it sees it
+    app.config["READ_REPLICA_STICKY_SECONDS"] = int(
+        os.environ.get("READ_REPLICA_STICKY_SECONDS", 5)
+    )
+    # memory:// caches per worker, sqlite:///path shares the cache between workers
+    app.config["CACHE_URL"] = os.environ.get("CACHE_URL", "memory://")
+    app.config["CACHE_TTL"] = int(os.environ.get("CACHE_TTL", 60))
+    # seconds the logged in user is taken from the cache instead of the database
+    app.config["USER_IDENTITY_TTL"] = int(os.environ.get("USER_IDENTITY_TTL", 300))
+    # seat holds, memory:// per worker or sqlite:///path shared between workers
+    app.config["HOLD_LEDGER_URL"] = os.environ.get("HOLD_LEDGER_URL", "memory://")
+    app.config["HOLD_TTL"] = int(os.environ.get("HOLD_TTL", 300))
+    # responses of requests with an Idempotency-Key, replayed to retries
+    app.config["IDEMPOTENCY_URL"] = os.environ.get("IDEMPOTENCY_URL", "memory://")
+    app.config["IDEMPOTENCY_TTL"] = int(os.environ.get("IDEMPOTENCY_TTL", 24 * 3600))
+    app.config["IDEMPOTENCY_MAX_KEYS"] = int(
+        os.environ.get("IDEMPOTENCY_MAX_KEYS", 100000)
+    )
+    # how long a key stays claimed by a request that never finishes
+    app.config["IDEMPOTENCY_LOCK_TTL"] = 60
+    # reservations of concurrent requests are committed together by one writer.
+    # Only worth it when commits fsync (a rollback journal, synchronous=FULL),
+    # with the default WAL pragmas it is slower.
+    app.config["GROUP_COMMIT"] = os.environ.get("GROUP_COMMIT", "").lower() == "true"
+    app.config["GROUP_COMMIT_MAX_BATCH"] = 200
+    # seconds the writer waits for more reservations to join a batch
+    app.config["GROUP_COMMIT_MAX_WAIT"] = 0.002
+    # bcrypt runs in worker processes, half of the cores are left to requests.
+    # 0 workers hash on the request thread.
+    app.config["PASSWORD_HASH_WORKERS"] = int(
+        os.environ.get("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2))
+    )
+    # logins running or waiting for a worker before more are turned away
+    app.config["PASSWORD_HASH_MAX_PENDING"] = int(
+        os.environ.get("PASSWORD_HASH_MAX_PENDING", 32)
+    )
+    app.config["PASSWORD_HASH_ROUNDS"] = 12
+    # rows an upload to /users/import may have, every password is hashed while
+    # the request waits. Larger files go through `flask users import`.
+    app.config["USER_IMPORT_MAX_ROWS"] = int(
+        os.environ.get("USER_IMPORT_MAX_ROWS", 1000)
+    )
+    # Server-Timing header and a JSON log line with where each request's time went
+    app.config["SERVER_TIMING"] = os.environ.get("SERVER_TIMING", "").lower() != "false"
+    # admins can ask for a profile with the X-Profile header,
+    # the profiles of the slowest requests are kept
+    app.config["PROFILE_DIR"] = os.environ.get(
+        "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "tickets_project-profiles")
+    )
+    app.config["PROFILE_KEEP"] = 20
+    # seconds between sweeps of expired reservations, 0 disables the sweeper
+    app.config["RESERVATION_SWEEP_INTERVAL"] = int(
+        os.environ.get("RESERVATION_SWEEP_INTERVAL", 600)
+    )
+    if test_config:
+        app.config.update(test_config)
+    # dev mode logs every request and profiles a share of them, but not while
+    # testing, the tests would be timing the logging and profiling
+    dev_mode = bool(os.environ.get("DEV_MODE_ENABLED")) and not app.testing
+    app.config.setdefault(
+        "REQUEST_LOG", dev_mode or os.environ.get("REQUEST_LOG", "").lower() == "true"
+    )
+    app.config.setdefault(
+        "PROFILE_SAMPLE_RATE",
+        float(os.environ.get("PROFILE_SAMPLE_RATE", 0.01)) if dev_mode else 0,
+    )
+    # pool size, overflow and pre-ping come from the environment
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS",
+        engine_options(app.config["SQLALCHEMY_DATABASE_URI"]),
     )
 
     db.init_app(app)
@@ -28,19 +117,31 @@ def create_app():
     login_manager.login_view = "users.login"
     login_manager.init_app(app)
 
-    from .models.user import User
+    # every model has to be imported for create_all() to know about its table
+    from .identity import load_identity
+    from .models import (pricing_rule, reservation, schedule_template,
+                         train_card, trip, user)
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # a snapshot of the user, usually from the cache rather than the database
+        return load_identity(int(user_id))
 
     with app.app_context():
-        db.create_all()
+        for engine in db.engines.values():
+            set_sqlite_pragmas(engine, app.config["SQLITE_PRAGMAS"])
+        # replicas are copies of the primary, their tables aren't created
+        db.create_all(bind_key=None)
+        sync_schema()
 
     # blueprints
+    from .api import api as api_blueprint
     from .cards import cards as cards_blueprint
+    from .journeys import journeys as journeys_blueprint
     from .main import main as main_blueprint
+    from .pricing import pricing as pricing_blueprint
     from .reservations import reservations as reservations_blueprint
+    from .schedules import schedules as schedules_blueprint
     from .trips import trips as trips_blueprint
     from .users import users as users_blueprint
 
@@ -49,5 +150,46 @@ def create_app():
     app.register_blueprint(trips_blueprint)
     app.register_blueprint(reservations_blueprint)
     app.register_blueprint(cards_blueprint)
+    app.register_blueprint(journeys_blueprint)
+    app.register_blueprint(schedules_blueprint)
+    app.register_blueprint(api_blueprint)
+    app.register_blueprint(pricing_blueprint)
+
+    from .idempotency import new_idempotency_key
+
+    app.jinja_env.globals["new_idempotency_key"] = new_idempotency_key
+
+    from .replicas import init_replicas
+
+    init_replicas(app)
+
+    from .instrumentation import init_instrumentation
+
+    init_instrumentation(app)
+
+    if app.config["RESERVATION_SWEEP_INTERVAL"] and not app.testing:
+        from .reservations import start_sweeper
+
+        start_sweeper(app)
 
     return app
+
+
+def sync_schema():
+    # create_all() skips tables that already exist, so columns and indexes
+    # added to existing models later on have to be created separately.
+    # Only nullable columns can be added to a table that already has rows.
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        db.text(
+                            f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                            f"{column.type.compile(db.engine.dialect)}"
+                        )
+                    )
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
@@ -0,0 +1,159 @@
+import json
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Blueprint, Response, request
+
+from .cache import get_cache, get_timetable_modified, get_timetable_version
+from .models.trip import Trip
+from .pagination import paginate_request
+from .schedules import ensure_materialized
+from .trips import (SEARCH_CRITERIA, TRIP_PAGE_KEY, build_search_query,
+                    build_trips_query)
+
+# listings only contain trips that haven't departed yet, so they also change
+# as time passes - validators are only reused within the same interval
+FRESHNESS_INTERVAL = 60
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+# only these columns are selected, no Trip objects are created for the rows
+TRIP_FIELDS = (
+    Trip.id,
+    Trip.departure_city,
+    Trip.arrival_city,
+    Trip.departure_datetime,
+    Trip.arrival_datetime,
+    Trip.two_way_trip,
+    Trip.available_seats,
+    Trip.base_ticket_price,
+)
+
+
+def serialize_trip(row):
+    return {
+        "id": row.id,
+        "departure_city": row.departure_city,
+        "arrival_city": row.arrival_city,
+        "departure_datetime": row.departure_datetime.isoformat(),
+        "arrival_datetime": row.arrival_datetime.isoformat(),
+        "two_way_trip": row.two_way_trip,
+        "available_seats": row.available_seats,
+        "base_ticket_price": row.base_ticket_price,
+    }
+
+
+def json_response(body, status=200):
+    return Response(body, status=status, mimetype="application/json")
+
+
+def conditional(view):
+    # answers with 304 when the client already has the current version,
+    # without touching the database. Rendered bodies are cached by version,
+    # so other clients polling the same URL don't hit the database either.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        interval = int(time.time() // FRESHNESS_INTERVAL)
+        modified = get_timetable_modified()
+        etag = f"{get_timetable_version()}-{modified}-{interval}"
+        last_modified = datetime.fromtimestamp(
+            max(modified, interval * FRESHNESS_INTERVAL), timezone.utc
+        )
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = (
+                request.if_modified_since is not None
+                and request.if_modified_since >= last_modified
+            )
+
+        if not_modified:
+            response = Response(status=304)
+        else:
+            cache = get_cache()
+            cache_key = f"api:{etag}:{request.full_path}"
+            body = cache.get(cache_key)
+            if body is None:
+                payload, status = view(*args, **kwargs)
+                if status != 200:
+                    return json_response(json.dumps(payload), status)
+                body = json.dumps(payload)
+                cache.set(cache_key, body)
+            response = json_response(body)
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
+
+
+def trip_page(query):
+    try:
+        page = paginate_request(
+            query.with_entities(*TRIP_FIELDS), TRIP_PAGE_KEY, request.args
+        )
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    return {
+        "trips": [serialize_trip(row) for row in page.items],
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
+    }, 200
+
+
+@api.route("/trips")
+@conditional
+def list_trips():
+    ensure_materialized()
+    try:
+        query = build_trips_query(
+            request.args.get("filter_type"),
+            request.args.get("filter_data"),
+            future_only=True,
+        )
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return trip_page(query)
+
+
+@api.route("/trips/search")
+@conditional
+def search_trips():
+    criteria = {
+        name: request.args.get(name)
+        for name in SEARCH_CRITERIA
+        if request.args.get(name)
+    }
+    ensure_materialized()
+    try:
+        query = build_search_query(**criteria, future_only=True)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return trip_page(query)
+
+
+@api.route("/trips/<int:id>")
+@conditional
+def trip_detail(id):
+    row = Trip.query.with_entities(*TRIP_FIELDS).filter(Trip.id == id).first()
+    if not row:
+        return {"error": f"Trip with id {id} doesn't exist!"}, 404
+    return serialize_trip(row), 200
+
+
+@api.route("/trips/<int:id>/availability")
+@conditional
+def trip_availability(id):
+    row = (
+        Trip.query.with_entities(Trip.id, Trip.available_seats)
+        .filter(Trip.id == id)
+        .first()
+    )
+    if not row:
+        return {"error": f"Trip with id {id} doesn't exist!"}, 404
+    return {"id": row.id, "available_seats": row.available_seats}, 200
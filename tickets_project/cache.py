@@ -0,0 +1,211 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+TIMETABLE_VERSION = "timetable_version"
+TIMETABLE_MODIFIED = "timetable_modified"
+
+
+class LRUCache:
+    # in-process cache, shared by the threads of a single worker
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # counters are kept apart so they are never evicted
+        self._counters = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def _set(self, key, value, ttl):
+        ttl = ttl or self.ttl
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def add(self, key, value, ttl=None):
+        # sets the value only if the key isn't set yet, False if it was
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def set_counter(self, key, value):
+        with self._lock:
+            self._counters[key] = value
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class SQLiteCache:
+    # cache in a SQLite file, so several workers on a host can share it.
+    # Values have to be JSON serializable.
+
+    def __init__(self, path, ttl=None):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_counter "
+                "(key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT value FROM cache_entry WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entry VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl if ttl else None),
+            )
+            # expired entries are removed as new ones are added
+            connection.execute(
+                "DELETE FROM cache_entry WHERE expires_at <= ?", (time.time(),)
+            )
+
+    def add(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        with self._connection() as connection:
+            # the DELETE takes the write lock, so the check and the insert
+            # happen in one go
+            connection.execute(
+                "DELETE FROM cache_entry WHERE key = ? AND expires_at <= ?",
+                (key, time.time()),
+            )
+            return (
+                connection.execute(
+                    "INSERT OR IGNORE INTO cache_entry VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time() + ttl if ttl else None),
+                ).rowcount
+                == 1
+            )
+
+    def delete(self, key):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache_entry")
+
+    def get_counter(self, key):
+        row = (
+            self._connection()
+            .execute("SELECT value FROM cache_counter WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return row[0] if row else 0
+
+    def set_counter(self, key, value):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_counter VALUES (?, ?)", (key, value)
+            )
+
+    def incr(self, key):
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO cache_counter VALUES (?, 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1",
+                (key,),
+            )
+            return connection.execute(
+                "SELECT value FROM cache_counter WHERE key = ?", (key,)
+            ).fetchone()[0]
+
+
+def create_cache(url, ttl=None, max_size=1024):
+    # memory:// for a per-worker cache, sqlite:///path/to/file for a shared one
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///") :], ttl=ttl)
+    if url == "memory://":
+        return LRUCache(max_size=max_size, ttl=ttl)
+    raise ValueError(f"Cache backend {url} not supported")
+
+
+def get_cache():
+    if "cache" not in current_app.extensions:
+        current_app.extensions["cache"] = create_cache(
+            current_app.config["CACHE_URL"], ttl=current_app.config["CACHE_TTL"]
+        )
+    return current_app.extensions["cache"]
+
+
+def get_timetable_version():
+    return get_cache().get_counter(TIMETABLE_VERSION)
+
+
+def get_timetable_modified():
+    # unix time of the last timetable change, 0 if unknown
+    return get_cache().get_counter(TIMETABLE_MODIFIED)
+
+
+def bump_timetable_version():
+    # called whenever trips or their seats change - every cached
+    # trip listing was rendered for an older version, so none is used again
+    cache = get_cache()
+    cache.set_counter(TIMETABLE_MODIFIED, int(time.time()))
+    return cache.incr(TIMETABLE_VERSION)
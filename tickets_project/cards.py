@@ -2,6 +2,7 @@ from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
 from . import db
+from .identity import invalidate_identity
 from .models.train_card import SUPPORTED_CARD_TYPES, TrainCard
 
 cards = Blueprint("cards", __name__)
@@ -24,12 +25,13 @@ def register():
             card.card_type = card_type
         else:
             card = TrainCard(card_type=card_type, user_id=current_user.id)
-            if card.type == SUPPORTED_CARD_TYPES[0] and current_user.age <= 60:
+            if card.card_type == SUPPORTED_CARD_TYPES[0] and current_user.age <= 60:
                 raise ValueError(
                     "Card for people of age not available for people under 60"
                 )
             db.session.add(card)
         db.session.commit()
+        invalidate_identity(current_user.id)
     except ValueError as e:
         flash(str(e), category="error")
         return redirect(url_for("cards.manage"))
@@ -43,5 +45,6 @@ def remove():
     card = TrainCard.query.filter_by(user_id=current_user.id).first()
     db.session.delete(card)
     db.session.commit()
+    invalidate_identity(current_user.id)
 
     return redirect(url_for("cards.manage", card=card, user_age=current_user.age))
@@ -0,0 +1,79 @@
+import os
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# applied to every new SQLite connection. In WAL mode readers go on while a
+# write is committed, and synchronous=NORMAL then only syncs the database on
+# checkpoints instead of on every commit - a power cut can lose the last
+# commits, but can't corrupt the database.
+DEFAULT_SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    # milliseconds a connection waits for the write lock
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    # negative values are in KiB
+    "cache_size": -64 * 1024,
+}
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def is_memory_database(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == "sqlite" and url.database in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def engine_options(uri, environ=os.environ):
+    # pool settings for the database at uri, taken from the environment
+    options = {}
+    # in-memory SQLite databases live in a single connection, there's no pool
+    if not is_memory_database(uri):
+        if environ.get("DATABASE_POOL_SIZE"):
+            options["pool_size"] = int(environ["DATABASE_POOL_SIZE"])
+        if environ.get("DATABASE_MAX_OVERFLOW"):
+            options["max_overflow"] = int(environ["DATABASE_MAX_OVERFLOW"])
+    # a server may have closed idle connections, SQLite files never do
+    pre_ping = environ.get("DATABASE_POOL_PRE_PING")
+    if pre_ping:
+        options["pool_pre_ping"] = pre_ping.strip().lower() in TRUE_VALUES
+    elif make_url(uri).get_backend_name() != "sqlite":
+        options["pool_pre_ping"] = True
+    return options
+
+
+def set_sqlite_pragmas(engine, pragmas):
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if name == "busy_timeout":
+                # a longer timeout given in connect_args is kept
+                current = cursor.execute("PRAGMA busy_timeout").fetchone()[0]
+                value = max(current, value)
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+class RoutingSession(Session):
+    # reads of views marked read only go to the replica picked for the
+    # request (see replicas.py), everything else goes to the primary. Once a
+    # request wrote, its later reads go to the primary as well, so it sees
+    # its own writes.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or getattr(clause, "is_dml", False):
+                g.wrote_to_primary = True
+            elif g.get("replica") and not g.get("wrote_to_primary"):
+                return self._db.engines[g.replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
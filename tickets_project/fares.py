@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import numpy as np
+
+from .pricing import get_pricing_rules
+
+# the same pricing rules as reservations.calculate_discount, which prices a
+# single reservation. These price many trips or reservations with one call,
+# e.g. to show the price for the current user next to every trip of a listing.
+
+
+def microseconds(value):
+    # microseconds since midnight of a datetime or time
+    return (
+        (value.hour * 60 + value.minute) * 60 + value.second
+    ) * 1000000 + value.microsecond
+
+
+def time_of_day(datetimes):
+    # microseconds since midnight, compares the same way as datetime.time()
+    if isinstance(datetimes, np.ndarray) and datetimes.dtype.kind == "M":
+        datetimes = datetimes.astype("datetime64[us]")
+        return (datetimes - datetimes.astype("datetime64[D]")).astype(np.int64)
+    if isinstance(datetimes, datetime):
+        datetimes = [datetimes]
+    # numpy converts datetime objects one by one and slowly,
+    # reading their fields is several times faster
+    return np.fromiter(
+        (microseconds(dt) for dt in datetimes),
+        dtype=np.int64,
+        count=len(datetimes),
+    )
+
+
+def quote_fares(
+    departures,
+    arrivals,
+    base_prices,
+    num_of_tickets,
+    card_types=None,
+    has_child=False,
+    rules=None,
+):
+    # every argument is either an array with one value per quote or a single
+    # value used for all of them. Card types are one of SUPPORTED_CARD_TYPES,
+    # or None for users without a card.
+    rules = rules or get_pricing_rules()
+    departures = time_of_day(departures)
+    arrivals = time_of_day(arrivals)
+    base_prices = np.asarray(base_prices, dtype=np.float64)
+    num_of_tickets = np.asarray(num_of_tickets, dtype=np.int64)
+    card_types = np.asarray(card_types, dtype=object)
+    has_child = np.asarray(has_child, dtype=bool)
+
+    time_discount = np.zeros(np.broadcast(departures, arrivals).shape)
+    for departs_from, departs_until, arrives_until, discount in rules.off_peak_windows:
+        in_window = np.ones(time_discount.shape, dtype=bool)
+        if departs_from is not None:
+            in_window &= departures >= microseconds(departs_from)
+        if departs_until is not None:
+            in_window &= departures <= microseconds(departs_until)
+        if arrives_until is not None:
+            in_window &= arrivals <= microseconds(arrives_until)
+        time_discount = np.where(
+            in_window, np.maximum(time_discount, discount), time_discount
+        )
+
+    card_discount = np.zeros(np.broadcast(card_types, has_child).shape)
+    owner_ticket_only = np.zeros(card_discount.shape, dtype=bool)
+    has_card = {}
+    for (card_type, with_child), (discount, owner_only) in rules.card_discounts.items():
+        # comparing the card types is the slow part, it's done once per type
+        if card_type not in has_card:
+            has_card[card_type] = card_types == card_type
+        matches = has_card[card_type] & (has_child == with_child)
+        card_discount = np.where(matches, discount, card_discount)
+        owner_ticket_only = np.where(matches, owner_only, owner_ticket_only)
+
+    # discounts are added up in the same order as calculate_discount does it,
+    # so the floating point results are identical
+    total_discount = np.where(
+        owner_ticket_only, time_discount, time_discount + card_discount
+    )
+    return np.where(
+        owner_ticket_only,
+        (base_prices - (base_prices * card_discount))
+        + ((num_of_tickets - 1) * (base_prices - (base_prices * time_discount))),
+        (base_prices - (base_prices * total_discount)) * num_of_tickets,
+    )
+
+
+def quote_trips(trips, card=None, num_of_tickets=1, has_child=False):
+    # fares of the same reservation on each of the trips
+    return quote_fares(
+        [trip.departure_datetime for trip in trips],
+        [trip.arrival_datetime for trip in trips],
+        [trip.base_ticket_price for trip in trips],
+        num_of_tickets,
+        card.card_type if card else None,
+        has_child,
+    )
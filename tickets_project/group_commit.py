@@ -0,0 +1,92 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from flask import current_app
+
+from . import db
+
+
+class GroupCommitWriter:
+    # applies writes submitted by concurrent requests from a single thread,
+    # committing a whole batch of them at once, so a burst of writes needs far
+    # fewer fsyncs. That only pays off where every commit fsyncs: SQLite with
+    # a rollback journal and synchronous=FULL. With the default WAL and
+    # synchronous=NORMAL a commit doesn't fsync, and the extra hop through
+    # the writer thread makes reservations slower (see bench_group_commit).
+    #
+    # A write is a function that either raises ValueError before it changed
+    # anything, or makes its changes in db.session. Writes that raise fail on
+    # their own, the others of the batch are still committed.
+
+    def __init__(self, app, max_batch=200, max_wait=0.002):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="group-commit-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, write, *args):
+        future = Future()
+        self._queue.put((future, write, args))
+        return future
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        # a short wait lets the requests arriving together share a commit
+        try:
+            while len(batch) < self.max_batch:
+                batch.append(self._queue.get(timeout=self.max_wait))
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            with self.app.app_context():
+                try:
+                    self._apply(batch)
+                finally:
+                    db.session.remove()
+
+    def _apply(self, batch):
+        results = []
+        for future, write, args in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                results.append((future, write(*args)))
+            except ValueError as e:
+                future.set_exception(e)
+            except Exception as e:
+                # the transaction is lost, the writes applied so far with it
+                db.session.rollback()
+                for failed, _ in [(future, None), *results]:
+                    failed.set_exception(e)
+                results = []
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for future, _ in results:
+                future.set_exception(e)
+            return
+
+        for future, result in results:
+            future.set_result(result)
+
+
+def get_writer():
+    with current_app.extensions.setdefault("group_commit_lock", threading.Lock()):
+        if "group_commit_writer" not in current_app.extensions:
+            current_app.extensions["group_commit_writer"] = GroupCommitWriter(
+                current_app._get_current_object(),
+                max_batch=current_app.config["GROUP_COMMIT_MAX_BATCH"],
+                max_wait=current_app.config["GROUP_COMMIT_MAX_WAIT"],
+            )
+    return current_app.extensions["group_commit_writer"]
@@ -0,0 +1,199 @@
+import heapq
+import secrets
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app
+
+# seats put aside for a buyer for a few minutes, until the hold is turned into
+# a reservation. Holds are kept outside of the trip table, so buyers of a
+# popular trip don't all wait on its row, and seats of abandoned holds come
+# back on their own when the hold expires.
+SeatHold = namedtuple(
+    "SeatHold", ["id", "trip_id", "user_id", "seats", "has_child", "expires_at"]
+)
+
+
+def new_hold(trip_id, user_id, seats, has_child, ttl):
+    return SeatHold(
+        secrets.token_urlsafe(16),
+        trip_id,
+        user_id,
+        seats,
+        has_child,
+        time.time() + ttl,
+    )
+
+
+class MemoryHoldLedger:
+    # holds of a single worker
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._holds = {}
+        self._held_seats = {}
+        # (expires_at, id) of every hold, the next one to expire first
+        self._expiry = []
+
+    def _expire(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, hold_id = heapq.heappop(self._expiry)
+            self._remove(hold_id)
+
+    def _remove(self, hold_id):
+        hold = self._holds.pop(hold_id, None)
+        if hold:
+            self._held_seats[hold.trip_id] -= hold.seats
+            if not self._held_seats[hold.trip_id]:
+                del self._held_seats[hold.trip_id]
+        return hold
+
+    def hold(self, trip_id, user_id, seats, has_child, available_seats, ttl):
+        # None if the seats that aren't held already are not enough
+        with self._lock:
+            self._expire(time.time())
+            if self._held_seats.get(trip_id, 0) + seats > available_seats:
+                return None
+            hold = new_hold(trip_id, user_id, seats, has_child, ttl)
+            self._holds[hold.id] = hold
+            self._held_seats[trip_id] = self._held_seats.get(trip_id, 0) + seats
+            heapq.heappush(self._expiry, (hold.expires_at, hold.id))
+            return hold
+
+    def get(self, hold_id):
+        with self._lock:
+            self._expire(time.time())
+            return self._holds.get(hold_id)
+
+    def release(self, hold_id):
+        with self._lock:
+            return self._remove(hold_id) is not None
+
+    def restore(self, hold):
+        # puts back a released hold, its seats were held already
+        with self._lock:
+            self._holds[hold.id] = hold
+            self._held_seats[hold.trip_id] = (
+                self._held_seats.get(hold.trip_id, 0) + hold.seats
+            )
+            heapq.heappush(self._expiry, (hold.expires_at, hold.id))
+
+    def held_seats(self, trip_id):
+        with self._lock:
+            self._expire(time.time())
+            return self._held_seats.get(trip_id, 0)
+
+
+class SQLiteHoldLedger:
+    # holds in a SQLite file, shared by the workers on a host
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS seat_hold (id TEXT PRIMARY KEY, "
+            "trip_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+            "seats INTEGER NOT NULL, has_child INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_seat_hold_trip_expires "
+            "ON seat_hold (trip_id, expires_at)"
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_seat_hold_expires ON seat_hold (expires_at)"
+        )
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # transactions are started explicitly
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def hold(self, trip_id, user_id, seats, has_child, available_seats, ttl):
+        connection = self._connection()
+        now = time.time()
+        # IMMEDIATE takes the write lock before counting, so two workers
+        # can't both see the same free seats
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM seat_hold WHERE expires_at <= ?", (now,))
+            held_seats = connection.execute(
+                "SELECT COALESCE(SUM(seats), 0) FROM seat_hold WHERE trip_id = ?",
+                (trip_id,),
+            ).fetchone()[0]
+            if held_seats + seats > available_seats:
+                connection.execute("ROLLBACK")
+                return None
+            hold = new_hold(trip_id, user_id, seats, has_child, ttl)
+            connection.execute(
+                "INSERT INTO seat_hold VALUES (?, ?, ?, ?, ?, ?)", tuple(hold)
+            )
+            connection.execute("COMMIT")
+            return hold
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get(self, hold_id):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT * FROM seat_hold WHERE id = ? AND expires_at > ?",
+                (hold_id, time.time()),
+            )
+            .fetchone()
+        )
+        if not row:
+            return None
+        hold = SeatHold(*row)
+        return hold._replace(has_child=bool(hold.has_child))
+
+    def release(self, hold_id):
+        return (
+            self._connection()
+            .execute("DELETE FROM seat_hold WHERE id = ?", (hold_id,))
+            .rowcount
+            == 1
+        )
+
+    def restore(self, hold):
+        # puts back a released hold, its seats were held already
+        self._connection().execute(
+            "INSERT OR IGNORE INTO seat_hold VALUES (?, ?, ?, ?, ?, ?)", tuple(hold)
+        )
+
+    def held_seats(self, trip_id):
+        return (
+            self._connection()
+            .execute(
+                "SELECT COALESCE(SUM(seats), 0) FROM seat_hold "
+                "WHERE trip_id = ? AND expires_at > ?",
+                (trip_id, time.time()),
+            )
+            .fetchone()[0]
+        )
+
+
+def create_hold_ledger(url):
+    # memory:// for holds per worker, sqlite:///path/to/file for shared ones
+    if url.startswith("sqlite:///"):
+        return SQLiteHoldLedger(url[len("sqlite:///") :])
+    if url == "memory://":
+        return MemoryHoldLedger()
+    raise ValueError(f"Hold ledger backend {url} not supported")
+
+
+def get_hold_ledger():
+    if "hold_ledger" not in current_app.extensions:
+        current_app.extensions["hold_ledger"] = create_hold_ledger(
+            current_app.config["HOLD_LEDGER_URL"]
+        )
+    return current_app.extensions["hold_ledger"]
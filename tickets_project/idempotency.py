@@ -0,0 +1,100 @@
+import hashlib
+import uuid
+from functools import wraps
+
+from flask import Response, current_app, request
+from flask_login import current_user
+
+from .cache import create_cache
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_FIELD = "idempotency_key"
+IN_FLIGHT = "in_flight"
+
+
+def new_idempotency_key():
+    # rendered into forms, so a resubmitted form reuses its key
+    return uuid.uuid4().hex
+
+
+def get_idempotency_store():
+    if "idempotency" not in current_app.extensions:
+        current_app.extensions["idempotency"] = create_cache(
+            current_app.config["IDEMPOTENCY_URL"],
+            ttl=current_app.config["IDEMPOTENCY_TTL"],
+            max_size=current_app.config["IDEMPOTENCY_MAX_KEYS"],
+        )
+    return current_app.extensions["idempotency"]
+
+
+def request_fingerprint():
+    # a key reused for a different request is an error, not a retry
+    form = sorted(
+        (name, value)
+        for name, value in request.form.items(multi=True)
+        if name != IDEMPOTENCY_FIELD
+    )
+    return hashlib.sha256(repr((request.path, form)).encode()).hexdigest()
+
+
+def idempotent(view):
+    # requests retried with the same Idempotency-Key header (or form field)
+    # get the response of the first one, without running the view again.
+    # Requests without a key aren't affected.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER) or request.form.get(
+            IDEMPOTENCY_FIELD
+        )
+        if not key:
+            return view(*args, **kwargs)
+
+        store = get_idempotency_store()
+        store_key = f"idempotency:{current_user.get_id()}:{key}"
+        fingerprint = request_fingerprint()
+
+        # the key is claimed before the view runs, so a retry arriving while
+        # the first request is still running doesn't run it a second time
+        if not store.add(
+            store_key,
+            {IN_FLIGHT: True, "fingerprint": fingerprint},
+            ttl=current_app.config["IDEMPOTENCY_LOCK_TTL"],
+        ):
+            stored = store.get(store_key)
+            if stored is None:
+                # expired in the meantime
+                return wrapper(*args, **kwargs)
+            if stored["fingerprint"] != fingerprint:
+                return Response(
+                    "Idempotency key was already used for another request", 422
+                )
+            if stored.get(IN_FLIGHT):
+                return Response("A request with this idempotency key is running", 409)
+            return Response(stored["body"], stored["status"], headers=stored["headers"])
+
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except BaseException:
+            store.delete(store_key)
+            raise
+
+        if response.status_code >= 500:
+            # failures can be retried
+            store.delete(store_key)
+        else:
+            store.set(
+                store_key,
+                {
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "headers": {
+                        name: value
+                        for name, value in response.headers.items()
+                        if name in ("Location", "Content-Type")
+                    },
+                    "body": response.get_data(as_text=True),
+                },
+            )
+        return response
+
+    return wrapper
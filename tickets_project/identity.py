@@ -0,0 +1,93 @@
+from collections import namedtuple
+
+from flask import current_app
+from flask_login import UserMixin
+
+from . import db
+from .cache import get_cache
+from .models.user import User
+
+# the train card as far as pricing needs it
+CardSnapshot = namedtuple("CardSnapshot", ["card_type"])
+
+
+class UserIdentity(UserMixin):
+    # what requests need to know about the logged in user, kept in the cache
+    # so most requests don't query the user at all. Views that change the
+    # user or their card invalidate it; with a cache per worker the other
+    # workers see the change once their copy expires.
+
+    def __init__(
+        self, id, username, firstname, is_admin, age, card_type, admin_checked=False
+    ):
+        self.id = id
+        self.username = username
+        self.firstname = firstname
+        self._is_admin = is_admin
+        # whether the admin flag was read from the database by this request
+        self._admin_checked = admin_checked
+        self.age = age
+        self.train_card = CardSnapshot(card_type) if card_type else None
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            user.id,
+            user.username,
+            user.firstname,
+            user.is_admin,
+            user.age,
+            user.train_card.card_type if user.train_card else None,
+            admin_checked=True,
+        )
+
+    @property
+    def is_admin(self):
+        # revoking admin rights can't wait for the other workers' copies to
+        # expire, so a cached admin flag is checked against the database
+        # once per request. Most users aren't admins and cost nothing.
+        if self._is_admin and not self._admin_checked:
+            self._is_admin = bool(
+                db.session.scalar(db.select(User.is_admin).where(User.id == self.id))
+            )
+            self._admin_checked = True
+            if not self._is_admin:
+                invalidate_identity(self.id)
+        return self._is_admin
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "username": self.username,
+            "firstname": self.firstname,
+            "is_admin": self._is_admin,
+            "age": self.age,
+            "card_type": self.train_card.card_type if self.train_card else None,
+        }
+
+
+def identity_key(user_id):
+    return f"user_identity:{user_id}"
+
+
+def load_identity(user_id):
+    cache = get_cache()
+    snapshot = cache.get(identity_key(user_id))
+    if snapshot is not None:
+        return UserIdentity(**snapshot)
+
+    # the train card is used for pricing, it's loaded in the same query
+    user = db.session.get(User, user_id, options=[db.joinedload(User.train_card)])
+    if not user:
+        return None
+    identity = UserIdentity.from_user(user)
+    cache.set(
+        identity_key(user_id),
+        identity.snapshot(),
+        ttl=current_app.config["USER_IDENTITY_TTL"],
+    )
+    return identity
+
+
+def invalidate_identity(user_id):
+    get_cache().delete(identity_key(user_id))
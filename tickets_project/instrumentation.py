@@ -0,0 +1,216 @@
+import contextlib
+import cProfile
+import heapq
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from flask import (before_render_template, current_app, g, has_request_context,
+                   request, template_rendered)
+from flask_login import current_user
+from sqlalchemy import event
+
+from . import db
+
+# asks for the request to be profiled, only honoured for admins
+PROFILE_HEADER = "X-Profile"
+
+logger = logging.getLogger("tickets_project.requests")
+
+
+class RequestTimings:
+    # where the time of a request went, in seconds
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql = 0.0
+        self.template = 0.0
+        self.password_hash = 0.0
+
+
+def current_timings():
+    # None outside of requests, e.g. in the group commit writer's thread
+    return g.get("timings") if has_request_context() else None
+
+
+@contextlib.contextmanager
+def timed(name):
+    # adds the time spent in the block to the current request's timings
+    timings = current_timings()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            setattr(timings, name, getattr(timings, name) + time.perf_counter() - start)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    timings = current_timings()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql += elapsed
+
+
+def before_render(app, template, context):
+    g.setdefault("template_starts", []).append(time.perf_counter())
+
+
+def after_render(app, template, context):
+    starts = g.get("template_starts")
+    timings = current_timings()
+    if starts and timings is not None:
+        timings.template += time.perf_counter() - starts.pop()
+
+
+class ProfileStore:
+    # keeps the profiles of the slowest sampled requests, the profile of a
+    # faster one is deleted once there are enough slower ones
+
+    def __init__(self, directory, keep):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+        # (duration, path) of the kept profiles, the fastest one first
+        self._kept = []
+
+    def save(self, profile, duration, always=False):
+        endpoint = re.sub(r"[^\w.-]", "_", request.endpoint or "unknown")
+        path = os.path.join(
+            self.directory,
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{endpoint}-{duration * 1000:.0f}ms"
+            f"-{random.getrandbits(32):08x}.prof",
+        )
+        with self._lock:
+            if always:
+                evicted = None
+            elif len(self._kept) < self.keep:
+                heapq.heappush(self._kept, (duration, path))
+                evicted = None
+            elif duration > self._kept[0][0]:
+                _, evicted = heapq.heapreplace(self._kept, (duration, path))
+            else:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(path)
+            if evicted:
+                with contextlib.suppress(OSError):
+                    os.remove(evicted)
+        return path
+
+
+# only one request is profiled at a time - Python allows a single profiler
+# per interpreter on newer versions, and profiling is slow enough anyway
+profiler_lock = threading.Lock()
+
+
+def should_profile():
+    if request.headers.get(PROFILE_HEADER):
+        if current_user.is_authenticated and current_user.is_admin:
+            return "requested"
+    rate = current_app.config["PROFILE_SAMPLE_RATE"]
+    if rate and random.random() < rate:
+        return "sampled"
+    return None
+
+
+def start_request():
+    g.timings = RequestTimings()
+    if request.endpoint in (None, "static"):
+        return
+
+    profile_mode = should_profile()
+    if profile_mode and profiler_lock.acquire(blocking=False):
+        g.profile_mode = profile_mode
+        g.profile = cProfile.Profile()
+        g.profile.enable()
+
+
+def finish_request(response):
+    timings = g.pop("timings", None)
+    if timings is None or request.endpoint in (None, "static"):
+        return response
+    total = time.perf_counter() - timings.start
+
+    profile = g.pop("profile", None)
+    profile_path = None
+    if profile is not None:
+        profile.disable()
+        try:
+            profile_path = current_app.extensions["profile_store"].save(
+                profile, total, always=g.profile_mode == "requested"
+            )
+        finally:
+            profiler_lock.release()
+        if profile_path and g.profile_mode == "requested":
+            response.headers["X-Profile-File"] = os.path.basename(profile_path)
+
+    if current_app.config["SERVER_TIMING"]:
+        response.headers["Server-Timing"] = ", ".join(
+            [
+                f'sql;dur={timings.sql * 1000:.1f};desc="{timings.sql_count} queries"',
+                f"template;dur={timings.template * 1000:.1f}",
+                f"hash;dur={timings.password_hash * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+    if not current_app.config["REQUEST_LOG"]:
+        return response
+    logger.info(
+        json.dumps(
+            {
+                "endpoint": request.endpoint,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "total_ms": round(total * 1000, 2),
+                "sql_count": timings.sql_count,
+                "sql_ms": round(timings.sql * 1000, 2),
+                "template_ms": round(timings.template * 1000, 2),
+                "hash_ms": round(timings.password_hash * 1000, 2),
+                "profile": profile_path and os.path.basename(profile_path),
+            }
+        )
+    )
+    return response
+
+
+def release_profiler(exception):
+    # a request that failed never got to finish_request
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profile.disable()
+        profiler_lock.release()
+
+
+def init_instrumentation(app):
+    app.extensions["profile_store"] = ProfileStore(
+        app.config["PROFILE_DIR"], app.config["PROFILE_KEEP"]
+    )
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    before_render_template.connect(before_render, app)
+    template_rendered.connect(after_render, app)
+
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(release_profiler)
+
+    if app.config["REQUEST_LOG"] and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
@@ -0,0 +1,249 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, flash, render_template, request
+from flask_login import current_user, login_required
+
+from . import DATETIME_FORMAT
+from .models.trip import Trip
+from .reservations import calculate_discount
+
+MIN_TRANSFER_TIME = timedelta(minutes=15)
+# how far after the requested time the first leg may depart, and
+# the longest we are willing to wait for each of the following legs
+FIRST_LEG_WINDOW = timedelta(days=3)
+MAX_TRANSFER_WAIT = timedelta(hours=24)
+MAX_LEGS = 4
+
+journeys = Blueprint("journeys", __name__)
+
+# lightweight copy of a trip - has the same fields calculate_discount reads
+Leg = namedtuple(
+    "Leg",
+    [
+        "id",
+        "departure_city",
+        "arrival_city",
+        "departure_datetime",
+        "arrival_datetime",
+        "base_ticket_price",
+    ],
+)
+Itinerary = namedtuple("Itinerary", ["legs", "prices", "total_price"])
+
+
+def city_key(city):
+    return city.strip().lower()
+
+
+class TimetableGraph:
+    # time-expanded graph of future trips: for every city, its departures
+    # sorted by time. It is built from the database once and then kept up
+    # to date by the trip create/edit/delete endpoints.
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._legs = {}
+        self._departures = {}
+        self._loaded = False
+
+    def ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self.load(Trip.query.filter(Trip.departure_datetime >= datetime.now()))
+        return self
+
+    def load(self, trips):
+        with self._lock:
+            self._legs = {}
+            self._departures = {}
+            for trip in trips:
+                self.add_trip(trip)
+            self._loaded = True
+
+    def invalidate(self):
+        # next query rebuilds the graph from the database
+        with self._lock:
+            self._loaded = False
+
+    def add_trip(self, trip):
+        leg = Leg(
+            trip.id,
+            trip.departure_city,
+            trip.arrival_city,
+            trip.departure_datetime,
+            trip.arrival_datetime,
+            trip.base_ticket_price,
+        )
+        with self._lock:
+            if leg.id in self._legs:
+                self.remove_trip(leg.id)
+            self._legs[leg.id] = leg
+            insort(
+                self._departures.setdefault(city_key(leg.departure_city), []),
+                (leg.departure_datetime, leg.id),
+            )
+
+    def update_trip(self, trip):
+        self.add_trip(trip)
+
+    def remove_trip(self, trip_id):
+        with self._lock:
+            leg = self._legs.pop(trip_id, None)
+            if leg:
+                self._departures[city_key(leg.departure_city)].remove(
+                    (leg.departure_datetime, leg.id)
+                )
+
+    def departures(self, city, earliest, window=MAX_TRANSFER_WAIT):
+        departures = self._departures.get(city_key(city), [])
+        latest = earliest + window
+        i = bisect_left(departures, (earliest,))
+        while i < len(departures) and departures[i][0] <= latest:
+            yield self._legs[departures[i][1]]
+            i += 1
+
+    def earliest_arrival(
+        self,
+        origin,
+        destination,
+        depart_after,
+        min_transfer=MIN_TRANSFER_TIME,
+        max_legs=MAX_LEGS,
+    ):
+        # time-dependent Dijkstra - states are ordered by arrival time,
+        # so the first state reaching the destination arrives the earliest
+        destination = city_key(destination)
+        with self._lock:
+            queue = [(depart_after, 0, origin, ())]
+            settled = set()
+            while queue:
+                arrival, num_legs, city, legs = heapq.heappop(queue)
+                if city_key(city) == destination and legs:
+                    return legs
+                if (city_key(city), num_legs) in settled or num_legs == max_legs:
+                    continue
+                settled.add((city_key(city), num_legs))
+
+                if legs:
+                    departures = self.departures(city, arrival + min_transfer)
+                else:
+                    departures = self.departures(city, arrival, FIRST_LEG_WINDOW)
+                for leg in departures:
+                    heapq.heappush(
+                        queue,
+                        (
+                            leg.arrival_datetime,
+                            num_legs + 1,
+                            leg.arrival_city,
+                            legs + (leg,),
+                        ),
+                    )
+        return None
+
+    def cheapest(
+        self,
+        origin,
+        destination,
+        depart_after,
+        price,
+        min_transfer=MIN_TRANSFER_TIME,
+        max_legs=MAX_LEGS,
+    ):
+        # Dijkstra over legs ordered by the total price paid so far
+        destination = city_key(destination)
+        with self._lock:
+            queue = [
+                (price(leg), leg.arrival_datetime, (leg,))
+                for leg in self.departures(origin, depart_after, FIRST_LEG_WINDOW)
+            ]
+            heapq.heapify(queue)
+            settled = set()
+            while queue:
+                total, _, legs = heapq.heappop(queue)
+                last = legs[-1]
+                if city_key(last.arrival_city) == destination:
+                    return legs
+                if last.id in settled or len(legs) == max_legs:
+                    continue
+                settled.add(last.id)
+
+                earliest = last.arrival_datetime + min_transfer
+                for leg in self.departures(last.arrival_city, earliest):
+                    if leg.id not in settled:
+                        heapq.heappush(
+                            queue,
+                            (total + price(leg), leg.arrival_datetime, legs + (leg,)),
+                        )
+        return None
+
+
+def get_timetable_graph():
+    # one graph per app, so apps pointed at different databases don't mix
+    return current_app.extensions.setdefault("timetable_graph", TimetableGraph())
+
+
+def plan_journeys(origin, destination, depart_after, card, num_of_tickets, has_child):
+    from .schedules import ensure_materialized
+
+    depart_after = max(depart_after, datetime.now())
+    ensure_materialized(depart_after + FIRST_LEG_WINDOW + MAX_TRANSFER_WAIT * MAX_LEGS)
+    graph = get_timetable_graph().ensure_loaded()
+
+    prices = {}
+
+    def price(leg):
+        if leg.id not in prices:
+            prices[leg.id] = calculate_discount(leg, card, num_of_tickets, has_child)
+        return prices[leg.id]
+
+    results = {}
+    for name, legs in [
+        ("earliest", graph.earliest_arrival(origin, destination, depart_after)),
+        ("cheapest", graph.cheapest(origin, destination, depart_after, price)),
+    ]:
+        if legs:
+            leg_prices = [price(leg) for leg in legs]
+            results[name] = Itinerary(legs, leg_prices, sum(leg_prices))
+    return results
+
+
+@journeys.route("/journeys/")
+@login_required
+def plan():
+    origin = request.args.get("departure_city")
+    destination = request.args.get("arrival_city")
+    if not origin or not destination:
+        return render_template("/journeys/plan.html", results=None)
+
+    try:
+        depart_after = (
+            datetime.strptime(request.args.get("departure_from"), DATETIME_FORMAT)
+            if request.args.get("departure_from")
+            else datetime.now()
+        )
+        num_of_tickets = (
+            int(request.args.get("ticket_numbers"))
+            if request.args.get("ticket_numbers")
+            else 1
+        )
+        if num_of_tickets <= 0:
+            raise ValueError("Number of tickets should be positive")
+    except ValueError as e:
+        flash(str(e), category="error")
+        return render_template("/journeys/plan.html", results=None)
+
+    results = plan_journeys(
+        origin,
+        destination,
+        depart_after,
+        current_user.train_card,
+        num_of_tickets,
+        bool(request.args.get("has_child")),
+    )
+    if not results:
+        flash(f"No connections from {origin} to {destination}", category="error")
+    return render_template("/journeys/plan.html", results=results)
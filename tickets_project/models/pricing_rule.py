@@ -0,0 +1,65 @@
+from sqlalchemy.orm import validates
+
+from .. import db
+from .train_card import SUPPORTED_CARD_TYPES
+
+# off peak rules discount trips departing (and arriving) within a time window,
+# card rules discount reservations of users with a train card
+OFF_PEAK = "off_peak"
+CARD = "card"
+SUPPORTED_RULE_KINDS = [OFF_PEAK, CARD]
+
+
+class PricingRule(db.Model):
+    __tablename__ = "pricing_rule"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    # off peak window, any bound can be left open
+    departs_from = db.Column(db.Time, nullable=True)
+    departs_until = db.Column(db.Time, nullable=True)
+    arrives_until = db.Column(db.Time, nullable=True)
+    # card rules, with_child is null if it applies with or without a child
+    card_type = db.Column(db.String(100), nullable=True)
+    with_child = db.Column(db.Boolean, nullable=True)
+    # only the ticket of the card owner is discounted, instead of every ticket.
+    # That ticket doesn't get any other discount.
+    owner_ticket_only = db.Column(db.Boolean, nullable=False, default=False)
+    discount = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        if self.kind == OFF_PEAK:
+            return "%s%% off trips departing %s - %s, arriving until %s" % (
+                round(self.discount * 100, 2),
+                self.departs_from.strftime("%H:%M") if self.departs_from else "",
+                self.departs_until.strftime("%H:%M") if self.departs_until else "",
+                self.arrives_until.strftime("%H:%M") if self.arrives_until else "-",
+            )
+        return "%s%% off %s with a %s card%s" % (
+            round(self.discount * 100, 2),
+            "the owner's ticket" if self.owner_ticket_only else "all tickets",
+            self.card_type,
+            {None: "", True: " and a child", False: " without a child"}[
+                self.with_child
+            ],
+        )
+
+    @validates("kind")
+    def validate_kind(self, key, kind):
+        if kind not in SUPPORTED_RULE_KINDS:
+            raise ValueError(f"Pricing rule kind {kind} not supported")
+        return kind
+
+    @validates("card_type")
+    def validate_card_type(self, key, card_type):
+        if self.kind == CARD and card_type not in SUPPORTED_CARD_TYPES:
+            raise ValueError(f"Card type {card_type} not supported")
+        return card_type
+
+    @validates("discount")
+    def validate_discount(self, key, discount):
+        if discount is None:
+            raise ValueError("No discount provided")
+        if not 0 < discount <= 1:
+            raise ValueError("Discount must be between 0 and 100%")
+        return discount
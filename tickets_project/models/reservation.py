@@ -8,9 +8,13 @@ from .trip import Trip
 
 class Reservation(db.Model):
     __tablename__ = "reservation"
+    __table_args__ = (
+        # the expiry sweep looks up unpaid reservations by age
+        db.Index("ix_reservation_unpaid_created", "is_paid_for", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now())
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.now)
     ticket_numbers = db.Column(db.Integer, nullable=False)
     sum_price = db.Column(db.Float, nullable=False)
     has_child = db.Column(db.Boolean, nullable=False, default=False)
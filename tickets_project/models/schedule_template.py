@@ -0,0 +1,114 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.orm import validates
+
+from .. import db
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+EVERY_DAY = (1 << len(WEEKDAYS)) - 1
+
+
+class ScheduleTemplate(db.Model):
+    __tablename__ = "schedule_template"
+
+    id = db.Column(db.Integer, primary_key=True)
+    departure_city = db.Column(db.String(100), nullable=False)
+    arrival_city = db.Column(db.String(100), nullable=False)
+    departure_time = db.Column(db.Time, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False)
+    # bit 0 is Monday, bit 6 is Sunday
+    weekday_mask = db.Column(db.Integer, nullable=False, default=EVERY_DAY)
+    valid_from = db.Column(db.Date, nullable=False)
+    valid_until = db.Column(db.Date, nullable=False)
+    two_way_trip = db.Column(db.Boolean, nullable=False, default=False)
+    available_seats = db.Column(db.Integer, nullable=False)
+    base_ticket_price = db.Column(db.Float, nullable=False)
+    trips = db.relationship("Trip", backref="schedule_template", lazy=True)
+
+    def __repr__(self):
+        return "%s %s service from %s to %s at %s (%s), %s to %s" % (
+            ("Two-way" if self.two_way_trip else "One-way"),
+            ", ".join(
+                day for i, day in enumerate(WEEKDAYS) if self.weekday_mask & (1 << i)
+            ),
+            self.departure_city,
+            self.arrival_city,
+            self.departure_time.strftime("%H:%M"),
+            timedelta(minutes=self.duration_minutes),
+            self.valid_from,
+            self.valid_until,
+        )
+
+    def departures(self, start, end):
+        # departure datetimes of the service between start and end
+        day = max(start.date(), self.valid_from)
+        while day <= min(end.date(), self.valid_until):
+            if self.weekday_mask & (1 << day.weekday()):
+                departure = datetime.combine(day, self.departure_time)
+                if start <= departure <= end:
+                    yield departure
+            day += timedelta(days=1)
+
+    @validates("departure_city")
+    def validate_departure_city(self, key, departure_city):
+        if not departure_city:
+            raise ValueError("No departure city provided")
+        return departure_city
+
+    @validates("arrival_city")
+    def validate_arrival_city(self, key, arrival_city):
+        if not arrival_city:
+            raise ValueError("No arrival city provided")
+        return arrival_city
+
+    @validates("departure_time")
+    def validate_departure_time(self, key, departure_time):
+        if departure_time is None:
+            raise ValueError("No departure time provided")
+        return departure_time
+
+    @validates("duration_minutes")
+    def validate_duration_minutes(self, key, duration_minutes):
+        if duration_minutes is None:
+            raise ValueError("No trip duration provided")
+        if duration_minutes <= 0:
+            raise ValueError("Trip duration must be positive")
+        return duration_minutes
+
+    @validates("weekday_mask")
+    def validate_weekday_mask(self, key, weekday_mask):
+        if not weekday_mask or weekday_mask & ~EVERY_DAY:
+            raise ValueError("Select at least one day of the week")
+        return weekday_mask
+
+    @validates("valid_from")
+    def validate_valid_from(self, key, valid_from):
+        if not valid_from:
+            raise ValueError("No start of validity provided")
+        return valid_from
+
+    @validates("valid_until")
+    def validate_valid_until(self, key, valid_until):
+        if not valid_until:
+            raise ValueError("No end of validity provided")
+        if self.valid_from and valid_until < self.valid_from:
+            raise ValueError("Schedule cannot end before it starts")
+        if valid_until < date.today():
+            raise ValueError("Schedule cannot end in the past")
+        return valid_until
+
+    @validates("available_seats")
+    def validate_available_seats(self, key, available_seats):
+        if available_seats is None:
+            raise ValueError("No available seats provided")
+        if available_seats < 0:
+            raise ValueError("Available seats cannot be negative")
+        return available_seats
+
+    @validates("base_ticket_price")
+    def validate_base_ticket_price(self, key, base_ticket_price):
+        if base_ticket_price is None:
+            raise ValueError("No base ticket price provided")
+        if base_ticket_price <= 0:
+            raise ValueError("Base ticket price must be a positive number")
+        return base_ticket_price
@@ -7,15 +7,33 @@ from .. import db
 
 class Trip(db.Model):
     __tablename__ = "trip"
+    __table_args__ = (
+        db.Index(
+            "ix_trip_route_departure",
+            "departure_city",
+            "arrival_city",
+            "departure_datetime",
+        ),
+        # each departure of a recurring service is materialized only once
+        db.Index(
+            "ix_trip_schedule_departure",
+            "schedule_template_id",
+            "departure_datetime",
+            unique=True,
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    departure_datetime = db.Column(db.DateTime, nullable=False)
+    departure_datetime = db.Column(db.DateTime, nullable=False, index=True)
     arrival_datetime = db.Column(db.DateTime, nullable=False)
     departure_city = db.Column(db.String(100), nullable=False)
-    arrival_city = db.Column(db.String(100), nullable=False)
-    two_way_trip = db.Column(db.Boolean, nullable=False, default=False)
+    arrival_city = db.Column(db.String(100), nullable=False, index=True)
+    two_way_trip = db.Column(db.Boolean, nullable=False, default=False, index=True)
     available_seats = db.Column(db.Integer, nullable=False)
     base_ticket_price = db.Column(db.Float, nullable=False)
+    schedule_template_id = db.Column(
+        db.Integer, db.ForeignKey("schedule_template.id"), nullable=True
+    )
     reservations = db.relationship("Reservation", backref="trip", lazy=True)
 
     def __repr__(self):
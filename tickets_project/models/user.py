@@ -5,6 +5,25 @@ from sqlalchemy.orm import validates
 
 from .. import db
 
+EMAIL_PATTERN = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b")
+
+
+def check_email(email):
+    # everything but uniqueness, which needs the database
+    if not email:
+        raise ValueError("No email address provided")
+    if not EMAIL_PATTERN.fullmatch(email):
+        raise ValueError("Please enter a valid email")
+
+    return email
+
+
+def check_username(username):
+    if not username:
+        raise ValueError("No username provided")
+
+    return username
+
 
 class User(db.Model, UserMixin):
     __tablename__ = "user"
@@ -33,21 +52,15 @@ class User(db.Model, UserMixin):
 
     @validates("email")
     def validate_email(self, key, email):
-        if not email:
-            raise ValueError("No email address provided")
+        check_email(email)
         if User.query.filter_by(email=email).first():
             raise ValueError("Email address is already in use")
-        if not re.fullmatch(
-            r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b", email
-        ):
-            raise ValueError("Please enter a valid email")
 
         return email
 
     @validates("username")
     def validate_username(self, key, username):
-        if not username:
-            raise ValueError("No username provided")
+        check_username(username)
         if User.query.filter_by(username=username).first():
             raise ValueError("Username is already in use")
 
@@ -0,0 +1,101 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from . import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+Page = namedtuple("Page", ["items", "next_cursor", "prev_cursor"])
+
+
+def get_page_size(args):
+    try:
+        page_size = int(args.get("page_size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    values = [
+        value.isoformat() if isinstance(value, datetime) else value for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(values) != len(columns):
+            raise ValueError
+        return [
+            (
+                datetime.fromisoformat(value)
+                if column.type.python_type is datetime
+                else column.type.python_type(value)
+            )
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError, UnicodeError, json.JSONDecodeError):
+        raise ValueError("Invalid page cursor")
+
+
+def keyset_condition(columns, values, after):
+    # (c1, c2) > (v1, v2) is expanded to c1 > v1 OR (c1 = v1 AND c2 > v2)
+    # so the database can range scan the index on the leading column
+    conditions = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal_prefix = [c == v for c, v in zip(columns[:i], values[:i])]
+        compare = column > value if after else column < value
+        conditions.append(and_(*equal_prefix, compare))
+    return or_(*conditions)
+
+
+def paginate(query, columns, after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    # keyset pagination - each page is a WHERE on the sort key of the last
+    # row seen, instead of an OFFSET that has to skip over all previous rows
+    query = query.order_by(None)
+
+    if before:
+        values = decode_cursor(before, columns)
+        rows = (
+            query.filter(keyset_condition(columns, values, after=False))
+            .order_by(*[column.desc() for column in columns])
+            .limit(page_size + 1)
+            .all()
+        )
+        has_more = len(rows) > page_size
+        items = rows[:page_size][::-1]
+        has_prev, has_next = has_more, True
+    else:
+        if after:
+            values = decode_cursor(after, columns)
+            query = query.filter(keyset_condition(columns, values, after=True))
+        rows = query.order_by(*columns).limit(page_size + 1).all()
+        items = rows[:page_size]
+        has_prev, has_next = bool(after), len(rows) > page_size
+
+    if not items:
+        return Page(items, None, None)
+
+    return Page(
+        items,
+        item_cursor(items[-1], columns) if has_next else None,
+        item_cursor(items[0], columns) if has_prev else None,
+    )
+
+
+def item_cursor(item, columns):
+    return encode_cursor([getattr(item, column.key) for column in columns])
+
+
+def paginate_request(query, columns, args):
+    return paginate(
+        query,
+        columns,
+        after=args.get("after"),
+        before=args.get("before"),
+        page_size=get_page_size(args),
+    )
@@ -0,0 +1,123 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from flask import current_app
+
+from .instrumentation import timed
+
+
+class PasswordServiceBusy(Exception):
+    # raised instead of queueing a hash when too many are waiting already
+    pass
+
+
+def _start_worker(niceness):
+    # hashes can wait a little, the requests served next to them can't
+    if niceness:
+        os.nice(niceness)
+
+
+def _pool_context():
+    # the server runs threads, and a forked worker would get a copy of any
+    # lock one of them holds. Workers are started from a clean process instead.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password, hashed):
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # not a bcrypt hash at all, so no password matches it
+        return False
+
+
+class PasswordHasher:
+    # bcrypt is slow on purpose and keeps a core busy for the whole hash.
+    # Hashes run in a few worker processes, so a burst of logins can't take
+    # the CPU and the request threads the other pages need. At most
+    # max_pending hashes are running or waiting for a process, logins and
+    # signups beyond that are turned away instead of piling up.
+    #
+    # With no workers, hashes run on the calling thread - still bounded.
+
+    def __init__(self, workers=1, max_pending=32, rounds=12, niceness=5):
+        self.rounds = rounds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        if workers:
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=_pool_context(),
+                initializer=_start_worker,
+                initargs=(niceness,),
+            )
+            atexit.register(self.shutdown)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordServiceBusy(
+                "Too many logins at the moment, please try again in a moment."
+            )
+        try:
+            with timed("password_hash"):
+                if self._executor is None:
+                    return fn(*args)
+                return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_hashpw, bytes(password, "utf-8"), self.rounds)
+
+    def check(self, password, hashed):
+        if isinstance(hashed, str):
+            hashed = bytes(hashed, "utf-8")
+        return self._run(_checkpw, bytes(password, "utf-8"), hashed)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            atexit.unregister(self.shutdown)
+
+
+def hash_passwords(passwords, workers=1, rounds=12, niceness=5):
+    # for bulk imports - a pool of their own, so logins don't queue behind them
+    passwords = [bytes(password, "utf-8") for password in passwords]
+    if not workers:
+        return [_hashpw(password, rounds) for password in passwords]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_pool_context(),
+        initializer=_start_worker,
+        initargs=(niceness,),
+    ) as executor:
+        return list(
+            executor.map(
+                _hashpw,
+                passwords,
+                itertools.repeat(rounds, len(passwords)),
+                chunksize=max(1, len(passwords) // (workers * 4)),
+            )
+        )
+
+
+def get_password_hasher():
+    with current_app.extensions.setdefault("password_hasher_lock", threading.Lock()):
+        if "password_hasher" not in current_app.extensions:
+            current_app.extensions["password_hasher"] = PasswordHasher(
+                workers=current_app.config["PASSWORD_HASH_WORKERS"],
+                max_pending=current_app.config["PASSWORD_HASH_MAX_PENDING"],
+                rounds=current_app.config["PASSWORD_HASH_ROUNDS"],
+            )
+    return current_app.extensions["password_hasher"]
@@ -0,0 +1,265 @@
+from collections import namedtuple
+from datetime import datetime, time
+from functools import lru_cache
+from time import monotonic
+
+from flask import (Blueprint, current_app, flash, has_app_context, redirect,
+                   render_template, request, url_for)
+from flask_login import current_user, login_required
+
+from . import db
+from .cache import get_cache
+from .models.pricing_rule import CARD, OFF_PEAK, PricingRule
+from .models.train_card import SUPPORTED_CARD_TYPES
+
+PRICING_VERSION = "pricing_version"
+# distinct (departure, arrival) times of day whose discount is remembered
+TIME_DISCOUNT_CACHE_SIZE = 4096
+
+pricing = Blueprint("pricing", __name__)
+
+
+# the fields of a pricing rule, for rules that aren't stored. Compiling plain
+# tuples doesn't configure the mappers, so the defaults can be compiled on import.
+RuleFields = namedtuple(
+    "RuleFields",
+    [
+        "kind",
+        "departs_from",
+        "departs_until",
+        "arrives_until",
+        "card_type",
+        "with_child",
+        "owner_ticket_only",
+        "discount",
+    ],
+    defaults=[None, None, None, None, None, False, None],
+)
+
+# used as long as no rules are stored in the database
+DEFAULT_PRICING_RULES = (
+    RuleFields(
+        kind=OFF_PEAK,
+        departs_from=time(9, 30),
+        arrives_until=time(16, 0),
+        discount=0.05,
+    ),
+    RuleFields(kind=OFF_PEAK, departs_from=time(19, 30), discount=0.05),
+    RuleFields(
+        kind=CARD,
+        card_type=SUPPORTED_CARD_TYPES[0],
+        owner_ticket_only=True,
+        discount=0.34,
+    ),
+    RuleFields(
+        kind=CARD,
+        card_type=SUPPORTED_CARD_TYPES[1],
+        with_child=False,
+        discount=0.1,
+    ),
+    RuleFields(
+        kind=CARD,
+        card_type=SUPPORTED_CARD_TYPES[1],
+        with_child=True,
+        discount=0.5,
+    ),
+)
+
+
+def default_pricing_rules():
+    # the default rules as models, to be listed or stored
+    return [PricingRule(**rule._asdict()) for rule in DEFAULT_PRICING_RULES]
+
+
+class PricingRules:
+    # pricing rules compiled for quoting: the off peak windows as a tuple and
+    # the card rules as a lookup by (card type, has child)
+
+    def __init__(self, rules, version=0):
+        self.version = version
+        self.compiled_at = monotonic()
+        self.off_peak_windows = tuple(
+            (rule.departs_from, rule.departs_until, rule.arrives_until, rule.discount)
+            for rule in rules
+            if rule.kind == OFF_PEAK
+        )
+        self.card_discounts = {}
+        for rule in rules:
+            if rule.kind != CARD:
+                continue
+            for has_child in (False, True):
+                # a rule for a specific has child value wins over a general one
+                if rule.with_child not in (None, has_child) or (
+                    rule.with_child is None
+                    and (rule.card_type, has_child) in self.card_discounts
+                ):
+                    continue
+                self.card_discounts[(rule.card_type, has_child)] = (
+                    rule.discount,
+                    rule.owner_ticket_only,
+                )
+        # trips share a handful of departure and arrival times,
+        # so the windows are only checked once for each of them
+        self.time_discount = lru_cache(maxsize=TIME_DISCOUNT_CACHE_SIZE)(
+            self._time_discount
+        )
+
+    def _time_discount(self, departure, arrival):
+        # the windows don't add up, the best matching one is used
+        discount = 0
+        for (
+            departs_from,
+            departs_until,
+            arrives_until,
+            window_discount,
+        ) in self.off_peak_windows:
+            if (
+                (departs_from is None or departure >= departs_from)
+                and (departs_until is None or departure <= departs_until)
+                and (arrives_until is None or arrival <= arrives_until)
+            ):
+                discount = max(discount, window_discount)
+        return discount
+
+    def fare(
+        self,
+        departure_datetime,
+        arrival_datetime,
+        base_ticket_price,
+        card_type,
+        num_of_tickets,
+        has_child,
+    ):
+        total_discount = self.time_discount(
+            departure_datetime.time(), arrival_datetime.time()
+        )
+        card_discount, owner_ticket_only = self.card_discounts.get(
+            (card_type, has_child), (0, False)
+        )
+
+        if owner_ticket_only:
+            return (base_ticket_price - (base_ticket_price * card_discount)) + (
+                (num_of_tickets - 1)
+                * (base_ticket_price - (base_ticket_price * total_discount))
+            )
+        if card_discount:
+            total_discount += card_discount
+        return (
+            base_ticket_price - (base_ticket_price * total_discount)
+        ) * num_of_tickets
+
+
+_default_rules = PricingRules(DEFAULT_PRICING_RULES)
+
+
+def get_pricing_rules():
+    # the compiled rules are kept per app and compiled again once the rules in
+    # the database changed. The version is only shared between workers with a
+    # shared cache, so the rules are compiled again after CACHE_TTL as well.
+    if not has_app_context():
+        return _default_rules
+
+    version = get_cache().get_counter(PRICING_VERSION)
+    rules = current_app.extensions.get("pricing_rules")
+    if (
+        rules is None
+        or rules.version != version
+        or monotonic() - rules.compiled_at >= current_app.config["CACHE_TTL"]
+    ):
+        rules = PricingRules(PricingRule.query.all() or DEFAULT_PRICING_RULES, version)
+        current_app.extensions["pricing_rules"] = rules
+    return rules
+
+
+def bump_pricing_version():
+    return get_cache().incr(PRICING_VERSION)
+
+
+@pricing.route("/pricing/")
+@login_required
+def list():
+    if not current_user.is_admin:
+        raise PermissionError("Cannot manage pricing as user is not admin")
+
+    rules = PricingRule.query.order_by(PricingRule.id).all()
+    return render_template(
+        "/pricing/list.html",
+        rules=rules or default_pricing_rules(),
+        using_defaults=not rules,
+        card_types=SUPPORTED_CARD_TYPES,
+    )
+
+
+@pricing.route("/pricing/create", methods=["POST"])
+@login_required
+def create_post():
+    if not current_user.is_admin:
+        raise PermissionError("Cannot create pricing rules as user is not admin")
+
+    try:
+        rule = PricingRule(**parse_pricing_rule_input(request.form))
+        # the first stored rule would replace all default rules
+        if not PricingRule.query.first():
+            db.session.add_all(default_pricing_rules())
+        db.session.add(rule)
+        db.session.commit()
+    except ValueError as e:
+        flash(str(e), category="error")
+        return redirect(url_for("pricing.list"))
+    bump_pricing_version()
+
+    flash("Pricing rule successfully created", category="info")
+    return redirect(url_for("pricing.list"))
+
+
+@pricing.route("/pricing/delete/<int:id>", methods=["POST"])
+@login_required
+def delete_post(id):
+    if not current_user.is_admin:
+        raise PermissionError("Cannot delete pricing rule as user is not admin")
+
+    rule = PricingRule.query.filter_by(id=id).first()
+    if not rule:
+        flash(f"Pricing rule with id {id} doesn't exist!", category="error")
+        return redirect(url_for("pricing.list"))
+
+    db.session.delete(rule)
+    db.session.commit()
+    bump_pricing_version()
+
+    flash("Pricing rule successfully removed", category="info")
+    return redirect(url_for("pricing.list"))
+
+
+def parse_pricing_rule_input(inputs):
+    def parse_time(name):
+        value = inputs.get(name)
+        return datetime.strptime(value, "%H:%M").time() if value else None
+
+    try:
+        # percent in the form, a fraction in the database
+        discount = float(inputs.get("discount", "")) / 100
+    except ValueError:
+        raise ValueError("Enter the discount in percent.")
+
+    kind = inputs.get("kind")
+    if kind == CARD:
+        with_child = inputs.get("with_child")
+        return {
+            "kind": kind,
+            "card_type": inputs.get("card_type"),
+            "with_child": {"yes": True, "no": False}.get(with_child),
+            "owner_ticket_only": True if inputs.get("owner_ticket_only") else False,
+            "discount": discount,
+        }
+
+    try:
+        return {
+            "kind": kind,
+            "departs_from": parse_time("departs_from"),
+            "departs_until": parse_time("departs_until"),
+            "arrives_until": parse_time("arrives_until"),
+            "discount": discount,
+        }
+    except ValueError:
+        raise ValueError("Enter the times of the off peak window as HH:MM.")
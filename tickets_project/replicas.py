@@ -0,0 +1,86 @@
+import contextlib
+import functools
+import random
+import time
+
+import click
+from flask import current_app, g, request, session
+from flask.cli import with_appcontext
+
+from . import db
+
+# the flask session key holding until when a client reads from the primary
+PRIMARY_UNTIL = "primary_until"
+
+
+def read_only(view):
+    # the view's queries may go to a read replica. Views that need the user
+    # list login_required first, so the user is loaded from the primary.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        replicas = current_app.config["READ_REPLICAS"]
+        # clients that just wrote read from the primary for a while, as the
+        # replicas may not have their write yet
+        if replicas and session.get(PRIMARY_UNTIL, 0) <= time.time():
+            g.replica = random.choice(replicas)
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def on_primary():
+    # for reads of a read only view that decide what to write
+    replica = g.pop("replica", None)
+    try:
+        yield
+    finally:
+        if replica:
+            g.replica = replica
+
+
+def stick_to_primary(response):
+    # a write may also have been made by another thread, like the group
+    # commit writer, so any request that isn't a read counts as one
+    wrote = g.get("wrote_to_primary") or (
+        request.method not in ("GET", "HEAD", "OPTIONS") and not g.get("read_only")
+    )
+    if wrote and current_app.config["READ_REPLICAS"]:
+        session[PRIMARY_UNTIL] = (
+            time.time() + current_app.config["READ_REPLICA_STICKY_SECONDS"]
+        )
+    return response
+
+
+def sync_sqlite_replicas():
+    # copies the primary onto every SQLite replica with the backup API - a
+    # stand-in for replication when the replicas are local SQLite files
+    primary = db.engines[None]
+    synced = []
+    for key in current_app.config["READ_REPLICAS"]:
+        replica = db.engines[key]
+        if primary.dialect.name != "sqlite" or replica.dialect.name != "sqlite":
+            continue
+        source = primary.raw_connection()
+        target = replica.raw_connection()
+        try:
+            source.driver_connection.backup(target.driver_connection)
+        finally:
+            target.close()
+            source.close()
+        synced.append(key)
+    return synced
+
+
+@click.command("sync-replicas")
+@with_appcontext
+def sync_replicas_command():
+    """Copy the database onto its SQLite read replicas."""
+    synced = sync_sqlite_replicas()
+    click.echo(f"Synced {len(synced)} replicas.")
+
+
+def init_replicas(app):
+    app.after_request(stick_to_primary)
+    app.cli.add_command(sync_replicas_command)
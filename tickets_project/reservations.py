@@ -1,40 +1,66 @@
+import builtins
 import datetime
-
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+import io
+import itertools
+import threading
+import time
+
+import click
+from flask import (Blueprint, current_app, flash, redirect, render_template,
+                   request, url_for)
 from flask_login import current_user, login_required
 
-from . import db
+from . import SETTLEMENT_CHUNK_SIZE, db
+from .cache import bump_timetable_version
+from .group_commit import get_writer
+from .holds import get_hold_ledger
+from .idempotency import idempotent
 from .models.reservation import Reservation
-from .models.train_card import SUPPORTED_CARD_TYPES, TrainCard
 from .models.trip import Trip
+from .pagination import paginate_request
+from .pricing import get_pricing_rules
+from .replicas import read_only
 
 reservations = Blueprint("reservations", __name__)
 
+RESERVATION_PAGE_KEY = (Reservation.created_at, Reservation.id)
+# reservations that are unpaid for longer than this are deleted
+RESERVATION_EXPIRY = datetime.timedelta(days=7)
+SWEEP_BATCH_SIZE = 1000
+
 
 @reservations.route("/reservations/")
 @login_required
+@read_only
 def list():
     if current_user.is_admin:
-        reservations = Reservation.query.all()
+        reservations = Reservation.query
     else:
         reservations = Reservation.query.filter_by(user_id=current_user.id)
+    # expired reservations are deleted by the sweeper, until then they're hidden
+    reservations = reservations.filter(
+        db.or_(
+            Reservation.is_paid_for,
+            Reservation.created_at >= datetime.datetime.now() - RESERVATION_EXPIRY,
+        )
+    )
 
-    paid_reservations = []
-    for reservation in reservations:
-        if not reservation.is_paid_for and (
-            (datetime.datetime.now() - reservation.created_at).days > 7
-        ):
-            # it is unpaid for for longer than a week, delete it :)
-            db.session.delete(reservation)
-            continue
+    reservations = reservations.options(db.joinedload(Reservation.trip))
 
-        paid_reservations.append(reservation)
+    try:
+        page = paginate_request(reservations, RESERVATION_PAGE_KEY, request.args)
+    except ValueError as e:
+        flash(str(e), category="error")
+        page = paginate_request(reservations, RESERVATION_PAGE_KEY, {})
 
-    return render_template("/reservations/list.html", reservations=paid_reservations)
+    return render_template(
+        "/reservations/list.html", reservations=page.items, page=page
+    )
 
 
 @reservations.route("/reservations/<int:id>/pay", methods=["POST"])
 @login_required
+@idempotent
 def pay(id):
     reservation = Reservation.query.filter_by(id=id).first()
     if not reservation:
@@ -46,6 +72,36 @@ def pay(id):
     return redirect(url_for("reservations.list"))
 
 
+@reservations.route("/reservations/settle", methods=["POST"])
+@login_required
+def settle():
+    # bulk payment callbacks: a JSON body with reservation_ids, or a
+    # settlement file upload
+    if not current_user.is_admin:
+        raise PermissionError("Cannot settle payments as user is not admin")
+
+    from .settlement import read_settlement_upload, settle_reservations
+
+    settlement_file = request.files.get("settlement_file")
+    if settlement_file:
+        ids = read_settlement_upload(
+            io.TextIOWrapper(settlement_file.stream, encoding="utf-8", newline=""),
+            settlement_file.filename or "",
+        )
+    else:
+        ids = (request.get_json(silent=True) or {}).get("reservation_ids")
+        # list is shadowed by the list view
+        if not isinstance(ids, builtins.list):
+            return {"error": "Provide reservation_ids or a settlement_file"}, 400
+
+    settlement = settle_reservations(ids)
+    return {
+        "paid": len(settlement.paid),
+        "already_paid": settlement.already_paid,
+        "unknown": settlement.unknown,
+    }
+
+
 @reservations.route("/trips/<int:trip_id>/reserve")
 @login_required
 def create(trip_id):
@@ -53,11 +109,16 @@ def create(trip_id):
     if not trip:
         flash(f"Trip with id {id} doesn't exist!", category="error")
         return redirect(url_for("trips.list"))
-    return render_template("/reservations/create.html", trip=trip)
+    return render_template(
+        "/reservations/create.html",
+        trip=trip,
+        held_seats=get_hold_ledger().held_seats(trip.id),
+    )
 
 
 @reservations.route("/trips/<int:trip_id>/reserve", methods=["POST"])
 @login_required
+@idempotent
 def create_post(trip_id):
     trip = Trip.query.filter_by(id=trip_id).first()
     if not trip:
@@ -65,49 +126,206 @@ def create_post(trip_id):
         return redirect(url_for("trips.list"))
 
     try:
-        # calculate discount
-        num_of_tickets = (
-            int(request.form.get("ticket_numbers"))
-            if request.form.get("ticket_numbers")
-            else -1
+        num_of_tickets, has_child = parse_reservation_input(request.form)
+        create_reservation(
+            trip,
+            num_of_tickets,
+            has_child,
+            held_seats=get_hold_ledger().held_seats(trip.id),
         )
-        validate_available_tickets(num_of_tickets, trip.available_seats)
+    except ValueError as e:
+        flash(str(e), category="error")
+        return redirect(url_for("reservations.create", trip_id=trip.id))
 
-        has_child = bool(request.form.get("has_child"))
+    return redirect(url_for("reservations.list"))
 
-        card = TrainCard.query.filter_by(user_id=current_user.id).first()
-        final_price = calculate_discount(trip, card, num_of_tickets, has_child)
 
-        # create a new trip with the form data.
-        new_reservation = Reservation(
-            ticket_numbers=num_of_tickets,
-            sum_price=final_price,
-            has_child=has_child,
-            is_paid_for=False,
-            trip_id=trip_id,
-            user_id=current_user.id,
-        )
-        trip.available_seats -= num_of_tickets
+@reservations.route("/trips/<int:trip_id>/hold", methods=["POST"])
+@login_required
+@idempotent
+def hold_post(trip_id):
+    trip = Trip.query.filter_by(id=trip_id).first()
+    if not trip:
+        flash(f"Trip with id {trip_id} doesn't exist!", category="error")
+        return redirect(url_for("trips.list"))
 
-        # add the new trip to the database
-        db.session.add(new_reservation)
-        db.session.commit()
+    ledger = get_hold_ledger()
+    try:
+        num_of_tickets, has_child = parse_reservation_input(request.form)
+        # the trip row is only read, the seats are taken in the ledger
+        hold = ledger.hold(
+            trip.id,
+            current_user.id,
+            num_of_tickets,
+            has_child,
+            trip.available_seats,
+            current_app.config["HOLD_TTL"],
+        )
+        if not hold:
+            validate_available_tickets(
+                num_of_tickets,
+                max(trip.available_seats - ledger.held_seats(trip.id), 0),
+            )
+            raise ValueError("The seats were just taken, please try again.")
     except ValueError as e:
         flash(str(e), category="error")
         return redirect(url_for("reservations.create", trip_id=trip.id))
 
+    return redirect(url_for("reservations.hold", hold_id=hold.id))
+
+
+@reservations.route("/holds/<hold_id>")
+@login_required
+def hold(hold_id):
+    hold = get_hold_ledger().get(hold_id)
+    if not hold or hold.user_id != current_user.id:
+        flash("Your seats are no longer held, please reserve again.", category="error")
+        return redirect(url_for("trips.list"))
+
+    trip = Trip.query.filter_by(id=hold.trip_id).first()
+    if not trip:
+        return trip_of_hold_removed(hold)
+
+    card = current_user.train_card
+    return render_template(
+        "/reservations/hold.html",
+        hold=hold,
+        trip=trip,
+        price=calculate_discount(trip, card, hold.seats, hold.has_child),
+        expires_in=max(int(hold.expires_at - time.time()), 0),
+    )
+
+
+@reservations.route("/holds/<hold_id>/confirm", methods=["POST"])
+@login_required
+@idempotent
+def confirm_hold(hold_id):
+    ledger = get_hold_ledger()
+    hold = ledger.get(hold_id)
+    if not hold or hold.user_id != current_user.id:
+        flash("Your seats are no longer held, please reserve again.", category="error")
+        return redirect(url_for("trips.list"))
+
+    # the hold is claimed before the reservation is created, so of two
+    # confirms of the same hold only one gets to reserve its seats
+    if not ledger.release(hold.id):
+        flash("Your seats are no longer held, please reserve again.", category="error")
+        return redirect(url_for("trips.list"))
+
+    trip = Trip.query.filter_by(id=hold.trip_id).first()
+    if not trip:
+        return trip_of_hold_removed(hold)
+
+    try:
+        create_reservation(
+            trip,
+            hold.seats,
+            hold.has_child,
+            held_seats=ledger.held_seats(trip.id),
+        )
+    except Exception as e:
+        # the seats are held again until the hold lapses
+        ledger.restore(hold)
+        if not isinstance(e, ValueError):
+            raise
+        flash(str(e), category="error")
+        return redirect(url_for("reservations.hold", hold_id=hold.id))
+
     return redirect(url_for("reservations.list"))
 
 
+def trip_of_hold_removed(hold):
+    # the trip was deleted while its seats were held, releasing the hold
+    # again after confirm_hold claimed it does nothing
+    get_hold_ledger().release(hold.id)
+    flash(f"Trip with id {hold.trip_id} doesn't exist!", category="error")
+    return redirect(url_for("trips.list"))
+
+
+@reservations.route("/holds/<hold_id>/release", methods=["POST"])
+@login_required
+def release_hold(hold_id):
+    ledger = get_hold_ledger()
+    hold = ledger.get(hold_id)
+    if hold and hold.user_id == current_user.id:
+        ledger.release(hold.id)
+        return redirect(url_for("reservations.create", trip_id=hold.trip_id))
+    return redirect(url_for("trips.list"))
+
+
+def get_reservation(id):
+    # the trip is loaded in the same query
+    return (
+        Reservation.query.options(db.joinedload(Reservation.trip))
+        .filter_by(id=id)
+        .first()
+    )
+
+
+def parse_reservation_input(inputs):
+    num_of_tickets = (
+        int(inputs.get("ticket_numbers")) if inputs.get("ticket_numbers") else -1
+    )
+    if num_of_tickets <= 0:
+        raise ValueError("Number of tickets should be positive")
+    return num_of_tickets, bool(inputs.get("has_child"))
+
+
+def create_reservation(trip, num_of_tickets, has_child, held_seats=0):
+    validate_available_tickets(num_of_tickets, trip.available_seats - held_seats)
+
+    # calculate discount
+    card = current_user.train_card
+    final_price = calculate_discount(trip, card, num_of_tickets, has_child)
+
+    # create a new trip with the form data.
+    new_reservation = Reservation(
+        ticket_numbers=num_of_tickets,
+        sum_price=final_price,
+        has_child=has_child,
+        is_paid_for=False,
+        trip_id=trip.id,
+        user_id=current_user.id,
+    )
+    if current_app.config["GROUP_COMMIT"]:
+        # committed together with the reservations of concurrent requests
+        get_writer().submit(
+            write_reservation,
+            {
+                column.key: getattr(new_reservation, column.key)
+                for column in Reservation.__table__.columns
+                if getattr(new_reservation, column.key) is not None
+            },
+            held_seats,
+        ).result()
+    else:
+        write_reservation(new_reservation, held_seats)
+        db.session.commit()
+    bump_timetable_version()
+    return new_reservation
+
+
+def write_reservation(reservation, held_seats=0):
+    # the reservation, or its column values outside of the request session
+    if isinstance(reservation, dict):
+        reservation = Reservation(**reservation)
+    reserve_seats(
+        reservation.trip_id, reservation.ticket_numbers, held_seats=held_seats
+    )
+
+    # add the new trip to the database
+    db.session.add(reservation)
+
+
 @reservations.route("/reservations/<int:id>")
 @login_required
 def edit(id):
-    reservation = Reservation.query.filter_by(id=id).first()
+    reservation = get_reservation(id)
     if not reservation:
         flash(f"Reservation with id {id} doesn't exist!", category="error")
         return redirect(url_for("reservations.list"))
 
-    trip = Trip.query.filter_by(id=reservation.trip_id).first()
+    trip = reservation.trip
     return render_template(
         "/reservations/edit.html", reservation=reservation, trip=trip
     )
@@ -115,13 +333,14 @@ def edit(id):
 
 @reservations.route("/reservations/<int:id>", methods=["POST"])
 @login_required
+@idempotent
 def edit_post(id):
-    reservation = Reservation.query.filter_by(id=id).first()
+    reservation = get_reservation(id)
     if not reservation:
         flash(f"Reservation with id {id} doesn't exist!", category="error")
         return redirect(url_for("reservations.list"))
 
-    trip = Trip.query.filter_by(id=reservation.trip_id).first()
+    trip = reservation.trip
 
     try:
         num_of_tickets = (
@@ -134,78 +353,99 @@ def edit_post(id):
         )
 
         has_child = bool(request.form.get("has_child"))
-        card = TrainCard.query.filter_by(user_id=current_user.id).first()
+        card = current_user.train_card
         final_price = calculate_discount(trip, card, num_of_tickets, has_child)
 
         # update reservation
-        trip.available_seats += reservation.ticket_numbers
+        previous_tickets = reservation.ticket_numbers
         reservation.ticket_numbers = num_of_tickets
         reservation.has_child = has_child
         reservation.sum_price = final_price
 
         # update trip available seats
-        trip.available_seats -= num_of_tickets
+        if num_of_tickets > previous_tickets:
+            reserve_seats(
+                trip.id,
+                num_of_tickets - previous_tickets,
+                previous_tickets,
+                held_seats=get_hold_ledger().held_seats(trip.id),
+            )
+        elif num_of_tickets < previous_tickets:
+            release_seats(trip.id, previous_tickets - num_of_tickets)
 
         # update the reservation in the database
         db.session.commit()
+        bump_timetable_version()
     except ValueError as e:
         flash(str(e), category="error")
-        return redirect(url_for("reservations.edit", id=reservation.id, trip=trip))
+        return redirect(url_for("reservations.edit", id=id))
 
     flash("Reservation successfully updated", category="info")
-    return redirect(url_for("reservations.edit", id=reservation.id, trip=trip))
+    return redirect(url_for("reservations.edit", id=id))
 
 
 @reservations.route("/reservations/<int:id>/delete", methods=["POST"])
 @login_required
 def delete(id):
-    reservation = Reservation.query.filter_by(id=id).first()
+    reservation = get_reservation(id)
     if not reservation:
         flash(f"Reservation with id {id} doesn't exist!", category="error")
         return redirect(url_for("reservations.list"))
 
-    trip = Trip.query.filter_by(id=reservation.trip_id).first()
-    trip.available_seats += reservation.ticket_numbers
+    release_seats(reservation.trip_id, reservation.ticket_numbers)
 
     db.session.delete(reservation)
     db.session.commit()
+    bump_timetable_version()
     return redirect(url_for("reservations.list"))
 
 
 def calculate_discount(trip, card, num_of_tickets, has_child):
-    total_discount = 0
-    result_sum = 0
-    has_old_aged_card = False
-
-    # Time-based discounts
-    if (
-        trip.departure_datetime.time() >= datetime.time(9, 30, 0)
-        and trip.arrival_datetime.time() <= datetime.time(16, 0, 0)
-    ) or trip.departure_datetime.time() >= datetime.time(19, 30, 0):
-        total_discount += 0.05
-
-    # Card-based discounts
-    if card:
-        if card.card_type == SUPPORTED_CARD_TYPES[0]:
-            # card for old aged people
-            # discount only on the ticket of the user (who is old)
-            has_old_aged_card = True
-        elif card.card_type == SUPPORTED_CARD_TYPES[1]:
-            # family card -> discount on all tickets
-            discount = 0.5 if has_child else 0.1
-            total_discount += discount
-
-    if has_old_aged_card:
-        result_sum = (trip.base_ticket_price - (trip.base_ticket_price * 0.34)) + (
-            (num_of_tickets - 1)
-            * (trip.base_ticket_price - (trip.base_ticket_price * total_discount))
+    # the discounts come from the pricing rules, see pricing.py
+    return get_pricing_rules().fare(
+        trip.departure_datetime,
+        trip.arrival_datetime,
+        trip.base_ticket_price,
+        card.card_type if card else None,
+        num_of_tickets,
+        has_child,
+    )
+
+
+def reserve_seats(trip_id, num_of_tickets, already_reserved=0, held_seats=0):
+    # the seat check and the decrement are a single conditional UPDATE,
+    # so concurrent buyers can't both pass the check and oversell the trip.
+    # Seats held by other buyers are left for them.
+    while True:
+        result = db.session.execute(
+            db.update(Trip)
+            .where(
+                Trip.id == trip_id,
+                Trip.available_seats >= num_of_tickets + held_seats,
+            )
+            .values(available_seats=Trip.available_seats - num_of_tickets)
+            .execution_options(synchronize_session=False)
         )
-    else:
-        result_sum = (
-            trip.base_ticket_price - (trip.base_ticket_price * total_discount)
-        ) * num_of_tickets
+        if result.rowcount == 1:
+            return
 
-    return result_sum
+        # raises unless seats were freed up in the meantime, then try again
+        available_seats = db.session.execute(
+            db.select(Trip.available_seats).where(Trip.id == trip_id)
+        ).scalar()
+        validate_available_tickets(
+            num_of_tickets + already_reserved,
+            max((available_seats or 0) - held_seats, 0) + already_reserved,
+        )
+
+
+def release_seats(trip_id, num_of_tickets):
+    db.session.execute(
+        db.update(Trip)
+        .where(Trip.id == trip_id)
+        .values(available_seats=Trip.available_seats + num_of_tickets)
+        .execution_options(synchronize_session=False)
+    )
 
 
 def validate_available_tickets(num_of_tickets, available_seats):
@@ -213,3 +453,112 @@ def validate_available_tickets(num_of_tickets, available_seats):
         raise ValueError(
             f"Not enough available seats on the train - only {available_seats} available."
         )
+
+
+def sweep_expired_reservations(now=None, batch_size=SWEEP_BATCH_SIZE):
+    # deletes reservations unpaid for longer than RESERVATION_EXPIRY and gives
+    # their seats back to the trips. Every batch is its own transaction, so
+    # reservations aren't locked for the whole sweep.
+    expired = db.and_(
+        Reservation.is_paid_for.is_(False),
+        Reservation.created_at < (now or datetime.datetime.now()) - RESERVATION_EXPIRY,
+    )
+    deleted = 0
+    while True:
+        batch = db.session.execute(
+            db.select(Reservation.id, Reservation.trip_id)
+            .where(expired)
+            .order_by(Reservation.created_at)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        ids = [row.id for row in batch]
+        # the conditions are repeated, a reservation could have been paid
+        # for after the batch was selected
+        in_batch = db.and_(Reservation.id.in_(ids), expired)
+
+        released_seats = (
+            db.select(db.func.sum(Reservation.ticket_numbers))
+            .where(in_batch, Reservation.trip_id == Trip.id)
+            .scalar_subquery()
+        )
+        db.session.execute(
+            db.update(Trip)
+            .where(Trip.id.in_({row.trip_id for row in batch}))
+            .values(
+                available_seats=Trip.available_seats
+                + db.func.coalesce(released_seats, 0)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        deleted += db.session.execute(
+            db.delete(Reservation)
+            .where(in_batch)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+    if deleted:
+        bump_timetable_version()
+    return deleted
+
+
+def start_sweeper(app):
+    # sweeps expired reservations every RESERVATION_SWEEP_INTERVAL seconds
+    # in a daemon thread, so requests don't have to
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(app.config["RESERVATION_SWEEP_INTERVAL"]):
+            with app.app_context():
+                try:
+                    sweep_expired_reservations()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Sweeping expired reservations failed")
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=run, name="reservation-sweeper", daemon=True)
+    thread.start()
+    app.extensions["reservation_sweeper"] = stop
+    return thread
+
+
+@reservations.cli.command("sweep")
+@click.option(
+    "--batch-size",
+    default=SWEEP_BATCH_SIZE,
+    show_default=True,
+    help="How many reservations to delete per transaction.",
+)
+def sweep_command(batch_size):
+    """Delete reservations that were not paid for in time."""
+    deleted = sweep_expired_reservations(batch_size=batch_size)
+    click.echo(f"Deleted {deleted} expired reservations.")
+
+
+@reservations.cli.command("settle")
+@click.argument("ids", nargs=-1)
+@click.option(
+    "--file",
+    "path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="CSV or JSONL settlement file with a reservation_id per row.",
+)
+@click.option("--chunk-size", default=SETTLEMENT_CHUNK_SIZE, show_default=True)
+def settle_command(ids, path, chunk_size):
+    """Mark reservations as paid, by id or from a settlement file."""
+    from .settlement import read_settlement_file, settle_reservations
+
+    if path:
+        ids = itertools.chain(ids, read_settlement_file(path))
+    settlement = settle_reservations(ids, chunk_size)
+    click.echo(
+        f"Paid {len(settlement.paid)} reservations, "
+        f"{len(settlement.already_paid)} were paid already, "
+        f"{len(settlement.unknown)} unknown."
+    )
+    if settlement.unknown:
+        click.echo("Unknown: " + ", ".join(map(str, settlement.unknown)))
@@ -0,0 +1,225 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import (Blueprint, current_app, flash, redirect, render_template,
+                   request, url_for)
+from flask_login import current_user, login_required
+from sqlalchemy.exc import IntegrityError
+
+from . import DATETIME_FORMAT, db
+from .cache import bump_timetable_version
+from .journeys import get_timetable_graph
+from .models.schedule_template import WEEKDAYS, ScheduleTemplate
+from .models.trip import Trip
+from .replicas import on_primary
+
+# trips of recurring services are created this far ahead of time,
+# one extra day at a time so it happens about once a day per worker
+MATERIALIZE_HORIZON = timedelta(days=14)
+MATERIALIZE_STEP = timedelta(days=1)
+MAX_MATERIALIZE_HORIZON = timedelta(days=366)
+
+schedules = Blueprint("schedules", __name__)
+
+
+@schedules.route("/schedules/")
+@login_required
+def list():
+    if not current_user.is_admin:
+        raise PermissionError("Cannot manage schedules as user is not admin")
+
+    templates = ScheduleTemplate.query.order_by(ScheduleTemplate.id).all()
+    return render_template(
+        "/schedules/list.html", templates=templates, weekdays=WEEKDAYS
+    )
+
+
+@schedules.route("/schedules/create", methods=["POST"])
+@login_required
+def create_post():
+    if not current_user.is_admin:
+        raise PermissionError("Cannot create schedules as user is not admin")
+
+    try:
+        template = ScheduleTemplate(**parse_schedule_input(request.form))
+        db.session.add(template)
+        db.session.commit()
+    except ValueError as e:
+        flash(str(e), category="error")
+        return redirect(url_for("schedules.list"))
+
+    # make the new service visible right away
+    reset_materialized()
+    ensure_materialized()
+
+    flash("Schedule successfully created", category="info")
+    return redirect(url_for("schedules.list"))
+
+
+@schedules.route("/schedules/delete/<int:id>", methods=["POST"])
+@login_required
+def delete_post(id):
+    if not current_user.is_admin:
+        raise PermissionError("Cannot delete schedule as user is not admin")
+
+    template = ScheduleTemplate.query.filter_by(id=id).first()
+    if not template:
+        flash(f"Schedule with id {id} doesn't exist!", category="error")
+        return redirect(url_for("schedules.list"))
+
+    # trips that were already materialized stay, they may have reservations
+    db.session.execute(
+        db.update(Trip)
+        .where(Trip.schedule_template_id == id)
+        .values(schedule_template_id=None)
+    )
+    db.session.delete(template)
+    db.session.commit()
+    reset_materialized()
+
+    flash("Schedule successfully removed", category="info")
+    return redirect(url_for("schedules.list"))
+
+
+@schedules.route("/schedules/<int:id>/<departure>/reserve", methods=["GET", "POST"])
+@login_required
+def reserve(id, departure):
+    # reservations for a departure of a service that has no trip yet
+    # materialize it first, then continue to the regular reservation views
+    template = ScheduleTemplate.query.filter_by(id=id).first()
+    try:
+        departure = datetime.strptime(departure, DATETIME_FORMAT)
+        if not template or departure not in template.departures(
+            max(departure, datetime.now()), departure
+        ):
+            raise ValueError("Service doesn't run at that time!")
+    except ValueError as e:
+        flash(str(e), category="error")
+        return redirect(url_for("trips.list"))
+
+    materialize_trips(departure, departure, [template])
+    trip = Trip.query.filter_by(
+        schedule_template_id=id, departure_datetime=departure
+    ).first()
+
+    # 307 keeps the method and form, so a POST goes on to create_post
+    return redirect(url_for("reservations.create", trip_id=trip.id), code=307)
+
+
+def parse_schedule_input(inputs):
+    departure_city = inputs.get("departure_city")
+    arrival_city = inputs.get("arrival_city")
+    if not departure_city or not arrival_city:
+        raise ValueError("Enter the departure and arrival cities.")
+    if departure_city.lower() == arrival_city.lower():
+        raise ValueError("Trip departure and arrival cities cannot be the same.")
+
+    try:
+        return {
+            "departure_city": departure_city,
+            "arrival_city": arrival_city,
+            "departure_time": datetime.strptime(
+                inputs.get("departure_time", ""), "%H:%M"
+            ).time(),
+            "duration_minutes": int(inputs.get("duration_minutes", "")),
+            "weekday_mask": sum(
+                1 << i for i in range(len(WEEKDAYS)) if inputs.get(f"weekday_{i}")
+            ),
+            # valid_from has to be set before valid_until is validated
+            "valid_from": datetime.strptime(
+                inputs.get("valid_from", ""), "%Y-%m-%d"
+            ).date(),
+            "valid_until": datetime.strptime(
+                inputs.get("valid_until", ""), "%Y-%m-%d"
+            ).date(),
+            "two_way_trip": True if inputs.get("two_way_trip") else False,
+            "available_seats": int(inputs.get("available_seats", "")),
+            "base_ticket_price": float(inputs.get("base_ticket_price", "")),
+        }
+    except ValueError:
+        raise ValueError("Please fill in all schedule fields.")
+
+
+def materialize_trips(start, end, templates=None):
+    # creates the trips of recurring services departing between start and end
+    # that don't exist yet. Running it concurrently is safe, duplicates are
+    # rejected by the unique (schedule_template_id, departure_datetime) index.
+    start = max(start, datetime.now())
+    if templates is None:
+        templates = ScheduleTemplate.query.filter(
+            ScheduleTemplate.valid_from <= end.date(),
+            ScheduleTemplate.valid_until >= start.date(),
+        ).all()
+
+    for attempt in range(2):
+        existing = set(
+            db.session.execute(
+                db.select(Trip.schedule_template_id, Trip.departure_datetime).where(
+                    Trip.schedule_template_id.in_([t.id for t in templates]),
+                    Trip.departure_datetime.between(start, end),
+                )
+            ).all()
+        )
+        rows = [
+            {
+                "schedule_template_id": template.id,
+                "departure_city": template.departure_city,
+                "arrival_city": template.arrival_city,
+                "departure_datetime": departure,
+                "arrival_datetime": departure
+                + timedelta(minutes=template.duration_minutes),
+                "two_way_trip": template.two_way_trip,
+                "available_seats": template.available_seats,
+                "base_ticket_price": template.base_ticket_price,
+            }
+            for template in templates
+            for departure in template.departures(start, end)
+            if (template.id, departure) not in existing
+        ]
+        if not rows:
+            return 0
+
+        try:
+            db.session.execute(db.insert(Trip), rows)
+            db.session.commit()
+        except IntegrityError:
+            # another worker materialized some of them first, try again
+            db.session.rollback()
+            continue
+
+        get_timetable_graph().invalidate()
+        bump_timetable_version()
+        return len(rows)
+    return 0
+
+
+def ensure_materialized(until=None):
+    now = datetime.now()
+    until = min(until or now + MATERIALIZE_HORIZON, now + MAX_MATERIALIZE_HORIZON)
+
+    materialized_until = current_app.extensions.get("materialized_until")
+    if materialized_until and until <= materialized_until:
+        return
+
+    until += MATERIALIZE_STEP
+    # the trips that exist already have to be seen, even in read only views
+    with on_primary():
+        materialize_trips(materialized_until or now, until)
+    current_app.extensions["materialized_until"] = until
+
+
+def reset_materialized():
+    current_app.extensions.pop("materialized_until", None)
+
+
+@schedules.cli.command("materialize")
+@click.option(
+    "--days",
+    default=MATERIALIZE_HORIZON.days,
+    show_default=True,
+    help="How many days ahead to create trips for.",
+)
+def materialize_command(days):
+    """Create the trips of recurring services for the next days."""
+    created = materialize_trips(datetime.now(), datetime.now() + timedelta(days=days))
+    click.echo(f"Created {created} trips.")
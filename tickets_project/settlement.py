@@ -0,0 +1,71 @@
+from collections import namedtuple
+
+from . import SETTLEMENT_CHUNK_SIZE, db
+from .models.reservation import Reservation
+from .trip_import import read_file_rows, read_rows
+
+# ids of the reservations marked as paid, of the ones that were paid for
+# already and of the ones that don't exist (or aren't valid ids)
+Settlement = namedtuple("Settlement", ["paid", "already_paid", "unknown"])
+
+
+def settlement_file_ids(rows):
+    # settlement files are CSV or JSONL with a reservation_id per row
+    for _, row in rows:
+        yield row.get("reservation_id") if isinstance(row, dict) else row
+
+
+def read_settlement_file(path):
+    return settlement_file_ids(read_rows(path))
+
+
+def read_settlement_upload(f, filename):
+    return settlement_file_ids(
+        read_file_rows(f, filename.endswith((".jsonl", ".json")))
+    )
+
+
+def settle_reservations(ids, chunk_size=SETTLEMENT_CHUNK_SIZE):
+    # marks the reservations as paid, one transaction per chunk of ids.
+    # Settling the same ids again changes nothing, they're reported as paid
+    # already.
+    settlement = Settlement([], [], [])
+    chunk = set()
+
+    def flush():
+        ids = sorted(chunk)
+        paid = set(
+            db.session.execute(
+                db.update(Reservation)
+                .where(Reservation.id.in_(ids), Reservation.is_paid_for.is_(False))
+                .values(is_paid_for=True)
+                .returning(Reservation.id)
+                .execution_options(synchronize_session=False)
+            ).scalars()
+        )
+        existing = set(
+            db.session.execute(
+                db.select(Reservation.id).where(Reservation.id.in_(ids))
+            ).scalars()
+        )
+        db.session.commit()
+
+        settlement.paid.extend(id for id in ids if id in paid)
+        settlement.already_paid.extend(
+            id for id in ids if id in existing and id not in paid
+        )
+        settlement.unknown.extend(id for id in ids if id not in existing)
+        chunk.clear()
+
+    for id in ids:
+        try:
+            chunk.add(int(id))
+        except (TypeError, ValueError):
+            settlement.unknown.append(id)
+            continue
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    return settlement
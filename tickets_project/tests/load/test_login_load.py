@@ -0,0 +1,142 @@
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+from tickets_project.passwords import PasswordHasher
+
+ATTACKERS = 20
+FLOOD_SECONDS = 3
+TRIPS = 50
+
+logger = logging.getLogger(__name__)
+
+
+def p95(latencies):
+    return statistics.quantiles(latencies, n=20)[-1]
+
+
+# compares wall clock latencies, which a busy machine makes unreliable
+@unittest.skipUnless(
+    os.environ.get("RUN_TIMING_TESTS"), "set RUN_TIMING_TESTS=1 to run timing tests"
+)
+class TestLoginFloodLoad(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+                + os.path.join(self.tmp_dir.name, "load.db"),
+                "SQLALCHEMY_ENGINE_OPTIONS": {
+                    "connect_args": {"timeout": 30},
+                    "pool_size": ATTACKERS + 1,
+                },
+                "PASSWORD_HASH_WORKERS": 1,
+                "PASSWORD_HASH_MAX_PENDING": 4,
+                # the latencies are measured without logging or profiling
+                "REQUEST_LOG": False,
+                "PROFILE_SAMPLE_RATE": 0,
+            }
+        )
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password=PasswordHasher(workers=0).hash("strongpass"),
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            for i in range(TRIPS):
+                db.session.add(
+                    Trip(
+                        departure_city="Sofia",
+                        arrival_city="Varna",
+                        departure_datetime=datetime.now() + timedelta(days=1, hours=i),
+                        arrival_datetime=datetime.now()
+                        + timedelta(days=1, hours=i + 3),
+                        available_seats=100,
+                        base_ticket_price=12.5,
+                    )
+                )
+            db.session.commit()
+
+    def tearDown(self) -> None:
+        with self.app.app_context():
+            db.engine.dispose()
+        self.app.extensions["password_hasher"].shutdown()
+        self.tmp_dir.cleanup()
+
+    def list_trips(self, seconds):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+        latencies = []
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            response = client.get("/trips/")
+            latencies.append(time.perf_counter() - start)
+            self.assertEqual(200, response.status_code)
+        return latencies
+
+    def log_in(self, stop, statuses):
+        client = self.app.test_client()
+        while not stop.is_set():
+            response = client.post(
+                "/login", data={"username": "valid_username", "password": "wrongpass"}
+            )
+            statuses.append(response.status_code)
+            # clients that are turned away come back as they're told to
+            if response.status_code == 503:
+                time.sleep(float(response.headers["Retry-After"]))
+
+    def test_trip_listing_during_login_flood(self):
+        """
+        Verify that listing trips stays about as fast while a flood of logins
+        keeps the password hasher busy, and that the logins beyond its limit
+        are turned away instead of queueing up.
+        """
+        baseline = self.list_trips(1)
+
+        stop = threading.Event()
+        statuses = []
+        attackers = [
+            threading.Thread(target=self.log_in, args=(stop, statuses))
+            for _ in range(ATTACKERS)
+        ]
+        for attacker in attackers:
+            attacker.start()
+        try:
+            flooded = self.list_trips(FLOOD_SECONDS)
+        finally:
+            stop.set()
+            for attacker in attackers:
+                attacker.join()
+
+        checked = statuses.count(302)
+        report = (
+            f"trip listing p50/p95 {statistics.median(baseline) * 1000:.1f}/"
+            f"{p95(baseline) * 1000:.1f}ms alone, "
+            f"{statistics.median(flooded) * 1000:.1f}/{p95(flooded) * 1000:.1f}ms "
+            f"during {ATTACKERS} clients logging in: {checked} passwords checked, "
+            f"{statuses.count(503)} logins turned away"
+        )
+        logger.info(report)
+        self.assertGreater(checked, 0, report)
+        self.assertGreater(statuses.count(503), 0, report)
+        self.assertLess(p95(flooded), max(p95(baseline) * 5, 0.05), report)
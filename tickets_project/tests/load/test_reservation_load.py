@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.models.reservation import Reservation
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+
+BUYERS = 50
+ATTEMPTS_PER_BUYER = 6
+AVAILABLE_SEATS = 200
+
+
+class TestReservationLoad(unittest.TestCase):
+    config = {}
+
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        # the buyers need a real file, in-memory databases aren't shared
+        # between connections
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+                + os.path.join(self.tmp_dir.name, "load.db"),
+                "SQLALCHEMY_ENGINE_OPTIONS": {
+                    "connect_args": {"timeout": 30},
+                    "pool_size": BUYERS,
+                },
+                **self.config,
+                # the latencies are measured without logging or profiling
+                "REQUEST_LOG": False,
+                "PROFILE_SAMPLE_RATE": 0,
+            }
+        )
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            db.session.add(
+                Trip(
+                    departure_city="Sofia",
+                    arrival_city="Varna",
+                    departure_datetime=datetime.now() + timedelta(days=1),
+                    arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                    available_seats=AVAILABLE_SEATS,
+                    base_ticket_price=12.5,
+                )
+            )
+            db.session.commit()
+
+    def tearDown(self) -> None:
+        with self.app.app_context():
+            db.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def buy(self, buyer, barrier, errors):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+        barrier.wait()
+        try:
+            for attempt in range(ATTEMPTS_PER_BUYER):
+                client.post(
+                    "/trips/1/reserve",
+                    data={"ticket_numbers": str(1 + (buyer + attempt) % 3)},
+                )
+                # buyers also cancel reservations, which releases seats again
+                if attempt == 2:
+                    client.post(f"/reservations/{buyer * 3 + 1}/delete")
+        except Exception as e:
+            errors.append(e)
+
+    def test_concurrent_buyers_never_oversell(self):
+        """
+        Verify that concurrent buyers competing for the last seats never oversell a trip,
+        and that every sold ticket is accounted for.
+        """
+        barrier = threading.Barrier(BUYERS)
+        errors = []
+        buyers = [
+            threading.Thread(target=self.buy, args=(buyer, barrier, errors))
+            for buyer in range(BUYERS)
+        ]
+
+        start = time.perf_counter()
+        for buyer in buyers:
+            buyer.start()
+        for buyer in buyers:
+            buyer.join()
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual([], errors)
+        with self.app.app_context():
+            trip = db.session.get(Trip, 1)
+            sold = sum(r.ticket_numbers for r in Reservation.query.all())
+            self.assertGreaterEqual(trip.available_seats, 0)
+            self.assertEqual(AVAILABLE_SEATS, trip.available_seats + sold)
+            # there is more demand than seats, so the trip is sold out
+            self.assertLess(trip.available_seats, 3)
+
+        requests = BUYERS * ATTEMPTS_PER_BUYER
+        print(
+            f"\n{BUYERS} buyers, {requests} reservations in {elapsed:.2f}s "
+            f"({requests / elapsed:.0f} req/s), {sold} of {AVAILABLE_SEATS} seats sold"
+        )
+
+
+class TestGroupCommitReservationLoad(TestReservationLoad):
+    config = {"GROUP_COMMIT": True}
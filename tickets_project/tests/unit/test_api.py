@@ -0,0 +1,105 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from sqlalchemy import event
+
+from tickets_project import create_app, db
+from tickets_project.cache import bump_timetable_version
+from tickets_project.models.trip import Trip
+
+
+class TestTripsApi(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        with self.app.app_context():
+            for arrival_city in ["Varna", "Plovdiv", "Burgas"]:
+                db.session.add(
+                    Trip(
+                        departure_city="Sofia",
+                        arrival_city=arrival_city,
+                        departure_datetime=datetime.now() + timedelta(days=1),
+                        arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                        available_seats=10,
+                        base_ticket_price=12.5,
+                    )
+                )
+            db.session.commit()
+
+            self.statements = []
+            event.listen(
+                db.engine,
+                "before_cursor_execute",
+                lambda *args: self.statements.append(args[2]),
+            )
+
+        self.client = self.app.test_client()
+
+    def test_api_list_and_search(self):
+        """
+        Verify that trips are listed and searched as paginated JSON.
+        """
+        response = self.client.get("/api/v1/trips?page_size=2")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, len(response.json["trips"]))
+        self.assertEqual("Sofia", response.json["trips"][0]["departure_city"])
+
+        response = self.client.get(
+            "/api/v1/trips?after=" + response.json["next_cursor"]
+        )
+        self.assertEqual(1, len(response.json["trips"]))
+
+        response = self.client.get("/api/v1/trips/search?arrival_city=Varna")
+        self.assertEqual(["Varna"], [t["arrival_city"] for t in response.json["trips"]])
+
+        response = self.client.get("/api/v1/trips/search?min_seats=-1")
+        self.assertEqual(400, response.status_code)
+
+    def test_api_detail_and_availability(self):
+        """
+        Verify the single trip endpoints, including unknown trips.
+        """
+        response = self.client.get("/api/v1/trips/1")
+        self.assertEqual("Varna", response.json["arrival_city"])
+
+        response = self.client.get("/api/v1/trips/1/availability")
+        self.assertEqual({"id": 1, "available_seats": 10}, response.json)
+
+        self.assertEqual(404, self.client.get("/api/v1/trips/42").status_code)
+
+    @mock.patch("tickets_project.api.time")
+    def test_api_conditional_get(self, mock_time):
+        """
+        Verify that unchanged polls get a 304 without querying the database,
+        and that timetable changes produce a new ETag.
+        """
+        mock_time.time = mock.Mock(return_value=1711353600)
+        response = self.client.get("/api/v1/trips/1/availability")
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+
+        self.statements.clear()
+        response = self.client.get(
+            "/api/v1/trips/1/availability", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b"", response.data)
+        self.assertEqual([], self.statements)
+
+        response = self.client.get(
+            "/api/v1/trips/1/availability",
+            headers={"If-Modified-Since": last_modified},
+        )
+        self.assertEqual(304, response.status_code)
+
+        with self.app.app_context():
+            bump_timetable_version()
+        response = self.client.get(
+            "/api/v1/trips/1/availability", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers["ETag"])
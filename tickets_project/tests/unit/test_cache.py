@@ -0,0 +1,127 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.cache import LRUCache, SQLiteCache
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+
+
+class TestCache(unittest.TestCase):
+    def test_lru_cache_eviction(self):
+        """
+        Verify that the least recently used entries are evicted first.
+        """
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(1, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(3, cache.get("c"))
+
+    @mock.patch("tickets_project.cache.time")
+    def test_lru_cache_ttl(self, mock_time):
+        """
+        Verify that entries expire after their time to live.
+        """
+        mock_time.monotonic = mock.Mock(return_value=100)
+        cache = LRUCache(ttl=10)
+        cache.set("a", 1)
+
+        mock_time.monotonic.return_value = 109
+        self.assertEqual(1, cache.get("a"))
+        mock_time.monotonic.return_value = 110
+        self.assertIsNone(cache.get("a"))
+
+    def test_sqlite_cache_is_shared(self):
+        """
+        Verify that two caches using the same file see each other's entries and counters.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cache.db")
+            first, second = SQLiteCache(path), SQLiteCache(path)
+
+            first.set("trips", {"html": "<ul></ul>"})
+            self.assertEqual({"html": "<ul></ul>"}, second.get("trips"))
+
+            self.assertEqual(1, first.incr("version"))
+            self.assertEqual(2, second.incr("version"))
+            self.assertEqual(2, first.get_counter("version"))
+
+            second.delete("trips")
+            self.assertIsNone(first.get("trips"))
+
+            self.assertTrue(first.add("key", 1))
+            self.assertFalse(second.add("key", 2))
+            self.assertEqual(1, second.get("key"))
+
+    @mock.patch("tickets_project.cache.time")
+    def test_cache_add(self, mock_time):
+        """
+        Verify that add only sets keys that aren't set or have expired.
+        """
+        mock_time.monotonic = mock.Mock(return_value=100)
+        cache = LRUCache()
+        self.assertTrue(cache.add("a", 1, ttl=10))
+        self.assertFalse(cache.add("a", 2, ttl=10))
+        self.assertEqual(1, cache.get("a"))
+
+        mock_time.monotonic.return_value = 110
+        self.assertTrue(cache.add("a", 3, ttl=10))
+        self.assertEqual(3, cache.get("a"))
+
+
+class TestTripListCache(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            db.session.add(
+                Trip(
+                    departure_city="Sofia",
+                    arrival_city="Varna",
+                    departure_datetime=datetime.now() + timedelta(days=1),
+                    arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                    available_seats=10,
+                    base_ticket_price=12.5,
+                )
+            )
+            db.session.commit()
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+    def test_trip_list_invalidated_by_reservations(self):
+        """
+        Verify that the cached trip list is reused until seats change.
+        """
+        self.assertIn(b"Available seats: 10", self.client.get("/trips/").data)
+
+        # changes that bypass the endpoints are not visible...
+        with self.app.app_context():
+            db.session.execute(db.update(Trip).values(available_seats=8))
+            db.session.commit()
+        self.assertIn(b"Available seats: 10", self.client.get("/trips/").data)
+
+        # ...until a reservation changes the seat count
+        self.client.post("/trips/1/reserve", data={"ticket_numbers": "3"})
+        self.assertIn(b"Available seats: 5", self.client.get("/trips/").data)
@@ -2,13 +2,20 @@ import os
 import unittest
 from unittest import mock as mock
 
-from tickets_project import create_app
+from tickets_project import create_app, db
 from tickets_project.models.train_card import SUPPORTED_CARD_TYPES, TrainCard
+from tickets_project.models.user import User
 
 
 class TestCards(unittest.TestCase):
     @mock.patch.dict(
-        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+        os.environ,
+        {
+            "APP_SECRET": "UNIT_TEST",
+            "FLASK_APP": "tickets_project",
+            # not the bundled database.db, the tests would change it
+            "DATABASE_URL": "sqlite://",
+        },
     )
     def setUp(self) -> None:
         self.app = create_app()
@@ -31,3 +38,44 @@ class TestCards(unittest.TestCase):
         with self.app.app_context():
             with self.assertRaises(ValueError):
                 TrainCard(card_type="not_supported")
+
+
+class TestCardRegistration(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+
+    def test_card_register(self):
+        """
+        Verify that a user can register a new card, but not one for people of age while under 60.
+        """
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            db.session.commit()
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+        response = client.post(
+            "/cards/register",
+            data={"card_type": SUPPORTED_CARD_TYPES[0]},
+            follow_redirects=True,
+        )
+        self.assertIn(b"not available for people under 60", response.data)
+        with self.app.app_context():
+            self.assertIsNone(TrainCard.query.first())
+
+        client.post("/cards/register", data={"card_type": SUPPORTED_CARD_TYPES[1]})
+        with self.app.app_context():
+            self.assertEqual(SUPPORTED_CARD_TYPES[1], TrainCard.query.one().card_type)
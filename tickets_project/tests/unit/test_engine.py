@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.engine import engine_options
+
+
+class TestEngineOptions(unittest.TestCase):
+    def test_pool_options_from_environment(self):
+        """
+        Verify that the pool settings are taken from the environment.
+        """
+        environ = {
+            "DATABASE_POOL_SIZE": "20",
+            "DATABASE_MAX_OVERFLOW": "5",
+            "DATABASE_POOL_PRE_PING": "false",
+        }
+        self.assertEqual(
+            {"pool_size": 20, "max_overflow": 5, "pool_pre_ping": False},
+            engine_options("sqlite:////tmp/tickets.db", environ),
+        )
+        self.assertEqual({}, engine_options("sqlite:////tmp/tickets.db", {}))
+
+    def test_server_database_pre_ping(self):
+        """
+        Verify that connections to a database server are checked before use.
+        """
+        self.assertEqual(
+            {"pool_pre_ping": True},
+            engine_options("postgresql://tickets@localhost/tickets", {}),
+        )
+
+    def test_memory_database_has_no_pool(self):
+        """
+        Verify that pool sizes are left out for in-memory databases.
+        """
+        self.assertEqual({}, engine_options("sqlite://", {"DATABASE_POOL_SIZE": "20"}))
+
+
+class TestSQLitePragmas(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def create_app(self, engine_options=None):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+                + os.path.join(self.tmp_dir.name, "pragmas.db"),
+                "SQLALCHEMY_ENGINE_OPTIONS": engine_options or {},
+                "TESTING": True,
+            }
+        )
+        self.addCleanup(self.dispose, app)
+        return app
+
+    def dispose(self, app):
+        with app.app_context():
+            db.engine.dispose()
+
+    def pragma(self, name):
+        return db.session.execute(db.text(f"PRAGMA {name}")).scalar()
+
+    def test_pragmas_applied(self):
+        """
+        Verify that every connection uses WAL and the other tuned settings.
+        """
+        with self.create_app().app_context():
+            self.assertEqual("wal", self.pragma("journal_mode"))
+            # NORMAL
+            self.assertEqual(1, self.pragma("synchronous"))
+            self.assertEqual(5000, self.pragma("busy_timeout"))
+            self.assertEqual(256 * 1024 * 1024, self.pragma("mmap_size"))
+            self.assertEqual(-64 * 1024, self.pragma("cache_size"))
+
+    def test_longer_connect_timeout_kept(self):
+        """
+        Verify that a longer timeout given in the connect args isn't shortened.
+        """
+        app = self.create_app({"connect_args": {"timeout": 30}})
+        with app.app_context():
+            self.assertEqual(30000, self.pragma("busy_timeout"))
@@ -0,0 +1,87 @@
+import unittest
+from datetime import datetime, time, timedelta
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from tickets_project.fares import quote_fares, quote_trips
+from tickets_project.models.train_card import SUPPORTED_CARD_TYPES, TrainCard
+from tickets_project.models.trip import Trip
+from tickets_project.reservations import calculate_discount
+
+# departures right at the edges of the discount time windows are generated
+# more often than random ones would be
+departure_datetimes = st.one_of(
+    st.datetimes(min_value=datetime(2030, 1, 1), max_value=datetime(2040, 1, 1)),
+    st.builds(
+        datetime.combine,
+        st.dates(
+            min_value=datetime(2030, 1, 1).date(),
+            max_value=datetime(2040, 1, 1).date(),
+        ),
+        st.sampled_from([time(9, 30), time(9, 29, 59, 999999), time(19, 30)]),
+    ),
+)
+durations = st.one_of(
+    st.timedeltas(min_value=timedelta(minutes=1), max_value=timedelta(days=2)),
+    st.sampled_from([timedelta(hours=6, minutes=30), timedelta(hours=6, seconds=1)]),
+)
+quotes = st.lists(
+    st.tuples(
+        departure_datetimes,
+        durations,
+        st.floats(min_value=0.01, max_value=10000),
+        st.integers(min_value=1, max_value=100),
+        st.sampled_from([None, *SUPPORTED_CARD_TYPES]),
+        st.booleans(),
+    ),
+    min_size=1,
+    max_size=50,
+)
+
+
+class TestFares(unittest.TestCase):
+    @given(quotes)
+    def test_quote_fares_matches_calculate_discount(self, quotes):
+        """
+        Verify that batch quotes are identical to pricing every reservation on its own.
+        """
+        trips, cards, expected = [], [], []
+        for departure, duration, price, num_of_tickets, card_type, has_child in quotes:
+            trip = Trip(
+                departure_datetime=departure,
+                arrival_datetime=departure + duration,
+                base_ticket_price=price,
+            )
+            card = TrainCard(card_type=card_type) if card_type else None
+            trips.append(trip)
+            cards.append(card_type)
+            expected.append(calculate_discount(trip, card, num_of_tickets, has_child))
+
+        fares = quote_fares(
+            [trip.departure_datetime for trip in trips],
+            [trip.arrival_datetime for trip in trips],
+            [trip.base_ticket_price for trip in trips],
+            [quote[3] for quote in quotes],
+            cards,
+            [quote[5] for quote in quotes],
+        )
+        self.assertEqual(expected, fares.tolist())
+
+    def test_quote_trips(self):
+        """
+        Verify that the same reservation is quoted for every trip of a listing.
+        """
+        trips = [
+            Trip(
+                departure_datetime=datetime(2030, 3, 25, hour),
+                arrival_datetime=datetime(2030, 3, 25, hour, 30),
+                base_ticket_price=10,
+            )
+            for hour in (8, 10, 20)
+        ]
+        card = TrainCard(card_type=SUPPORTED_CARD_TYPES[1])
+
+        self.assertEqual([20, 19, 19], quote_trips(trips, num_of_tickets=2).tolist())
+        self.assertEqual([9, 8.5, 8.5], quote_trips(trips, card).tolist())
+        self.assertEqual([], quote_trips([], card).tolist())
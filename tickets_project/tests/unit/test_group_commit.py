@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from sqlalchemy import event
+
+from tickets_project import create_app, db
+from tickets_project.group_commit import GroupCommitWriter
+from tickets_project.models.reservation import Reservation
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+from tickets_project.reservations import write_reservation
+
+
+class TestGroupCommit(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        # the writer thread needs its own connection to the same database
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+                + os.path.join(self.tmp_dir.name, "group_commit.db"),
+                "TESTING": True,
+            }
+        )
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            db.session.add(
+                Trip(
+                    departure_city="Sofia",
+                    arrival_city="Varna",
+                    departure_datetime=datetime.now() + timedelta(days=1),
+                    arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                    available_seats=5,
+                    base_ticket_price=10,
+                )
+            )
+            db.session.commit()
+
+            self.commits = []
+            event.listen(db.engine, "commit", lambda *args: self.commits.append(1))
+
+    def tearDown(self) -> None:
+        with self.app.app_context():
+            db.engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def test_writes_share_commits(self):
+        """
+        Verify that queued reservations are committed together, and that each
+        request gets its own outcome.
+        """
+        writer = GroupCommitWriter(self.app, max_wait=0.2)
+        futures = [
+            writer.submit(
+                write_reservation,
+                {"ticket_numbers": 1, "sum_price": 10, "trip_id": 1, "user_id": 1},
+            )
+            for _ in range(8)
+        ]
+
+        errors = [future.exception(timeout=10) for future in futures]
+        self.assertEqual([None] * 5, errors[:5])
+        for error in errors[5:]:
+            self.assertIn("only 0 available", str(error))
+        self.assertLess(len(self.commits), 3)
+
+        with self.app.app_context():
+            self.assertEqual(5, Reservation.query.count())
+            self.assertEqual(0, db.session.get(Trip, 1).available_seats)
+
+    def test_group_commit_endpoint(self):
+        """
+        Verify that reservations made with group commit enabled are stored.
+        """
+        self.app.config["GROUP_COMMIT"] = True
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+        client.post("/trips/1/reserve", data={"ticket_numbers": "3"})
+        client.post("/trips/1/reserve", data={"ticket_numbers": "3"})
+        with self.app.app_context():
+            self.assertEqual([3], [r.ticket_numbers for r in Reservation.query.all()])
+            self.assertEqual(2, db.session.get(Trip, 1).available_seats)
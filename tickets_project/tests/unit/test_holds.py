@@ -0,0 +1,216 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.holds import (MemoryHoldLedger, SQLiteHoldLedger,
+                                   get_hold_ledger)
+from tickets_project.models.reservation import Reservation
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+
+
+class TestHoldLedger(unittest.TestCase):
+    def check_ledger(self, ledger, mock_time):
+        mock_time.time = mock.Mock(return_value=1000)
+
+        first = ledger.hold(1, 1, 6, False, available_seats=10, ttl=60)
+        self.assertEqual(6, first.seats)
+        self.assertIsNone(ledger.hold(1, 2, 5, False, available_seats=10, ttl=60))
+        second = ledger.hold(1, 2, 4, True, available_seats=10, ttl=120)
+        self.assertEqual(10, ledger.held_seats(1))
+        self.assertEqual(0, ledger.held_seats(2))
+        self.assertEqual(second, ledger.get(second.id))
+
+        # the first hold lapses and its seats can be held again
+        mock_time.time.return_value = 1060
+        self.assertIsNone(ledger.get(first.id))
+        self.assertEqual(4, ledger.held_seats(1))
+        self.assertIsNotNone(ledger.hold(1, 3, 6, False, available_seats=10, ttl=60))
+
+        self.assertTrue(ledger.release(second.id))
+        self.assertFalse(ledger.release(second.id))
+        self.assertEqual(6, ledger.held_seats(1))
+
+        ledger.restore(second)
+        self.assertEqual(second, ledger.get(second.id))
+        self.assertEqual(10, ledger.held_seats(1))
+
+    @mock.patch("tickets_project.holds.time")
+    def test_memory_hold_ledger(self, mock_time):
+        """
+        Verify that in-memory holds never exceed the available seats and lapse on time.
+        """
+        self.check_ledger(MemoryHoldLedger(), mock_time)
+
+    @mock.patch("tickets_project.holds.time")
+    def test_sqlite_hold_ledger(self, mock_time):
+        """
+        Verify that holds in SQLite never exceed the available seats and lapse on time.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.check_ledger(
+                SQLiteHoldLedger(os.path.join(tmp_dir, "holds.db")), mock_time
+            )
+
+
+class TestSeatHolds(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        with self.app.app_context():
+            for username in ["first_buyer", "second_buyer"]:
+                db.session.add(
+                    User(
+                        email=f"{username}@email.bg",
+                        username=username,
+                        password="strongpass",
+                        firstname="test",
+                        lastname="test",
+                        age=30,
+                    )
+                )
+            db.session.add(
+                Trip(
+                    departure_city="Sofia",
+                    arrival_city="Varna",
+                    departure_datetime=datetime.now() + timedelta(days=1),
+                    arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                    available_seats=10,
+                    base_ticket_price=10,
+                )
+            )
+            db.session.commit()
+
+        self.first, self.second = self.app.test_client(), self.app.test_client()
+        for user_id, client in [("1", self.first), ("2", self.second)]:
+            with client.session_transaction() as session:
+                session["_user_id"] = user_id
+
+    def test_hold_and_confirm(self):
+        """
+        Verify that held seats are shown to other buyers and turn into a reservation.
+        """
+        response = self.first.post("/trips/1/hold", data={"ticket_numbers": "7"})
+        hold_url = response.headers["Location"]
+        self.assertIn(b"Your seats are held", self.first.get(hold_url).data)
+
+        # the trip row isn't changed by the hold
+        with self.app.app_context():
+            self.assertEqual(10, db.session.get(Trip, 1).available_seats)
+
+        page = self.second.get("/trips/1/reserve").data
+        self.assertIn(b"Available seats: 3", page)
+        self.assertIn(b"Seats on hold: 7", page)
+        # the held seats can't be taken by anyone else
+        self.second.post("/trips/1/hold", data={"ticket_numbers": "4"})
+        self.second.post("/trips/1/reserve", data={"ticket_numbers": "4"})
+        self.second.post(hold_url + "/confirm")
+        with self.app.app_context():
+            self.assertEqual(0, Reservation.query.count())
+
+        self.first.post(hold_url + "/confirm")
+        with self.app.app_context():
+            self.assertEqual(3, db.session.get(Trip, 1).available_seats)
+            self.assertEqual([7], [r.ticket_numbers for r in Reservation.query.all()])
+
+        # a hold is only turned into a reservation once
+        self.first.post(hold_url + "/confirm")
+        with self.app.app_context():
+            self.assertEqual(1, Reservation.query.count())
+
+    def test_confirm_same_hold_twice(self):
+        """
+        Verify that two confirms of the same hold that both found it only reserve its seats once.
+        """
+        response = self.first.post("/trips/1/hold", data={"ticket_numbers": "7"})
+        hold_url = response.headers["Location"]
+        with self.app.app_context():
+            ledger = get_hold_ledger()
+            hold = ledger.get(hold_url.rsplit("/", 1)[-1])
+
+            # both confirms read the hold before either of them released it
+            with mock.patch.object(ledger, "get", return_value=hold):
+                self.first.post(hold_url + "/confirm")
+                self.first.post(hold_url + "/confirm")
+
+            self.assertEqual(3, db.session.get(Trip, 1).available_seats)
+            self.assertEqual(1, Reservation.query.count())
+
+    def test_failed_confirm_keeps_hold(self):
+        """
+        Verify that the seats stay held when the reservation can't be created.
+        """
+        response = self.first.post("/trips/1/hold", data={"ticket_numbers": "7"})
+        hold_url = response.headers["Location"]
+
+        with mock.patch(
+            "tickets_project.reservations.create_reservation",
+            side_effect=ValueError("Not enough seats"),
+        ):
+            self.first.post(hold_url + "/confirm")
+
+        with self.app.app_context():
+            self.assertEqual(0, Reservation.query.count())
+            self.assertEqual(7, get_hold_ledger().held_seats(1))
+        self.assertIn(b"Your seats are held", self.first.get(hold_url).data)
+
+    def hold_and_delete_trip(self):
+        response = self.first.post("/trips/1/hold", data={"ticket_numbers": "7"})
+        with self.app.app_context():
+            db.session.delete(db.session.get(Trip, 1))
+            db.session.commit()
+        return response.headers["Location"]
+
+    def test_trip_deleted_while_held(self):
+        """
+        Verify that a hold on a deleted trip is released when it's shown.
+        """
+        hold_url = self.hold_and_delete_trip()
+
+        response = self.first.get(hold_url, follow_redirects=True)
+        self.assertIn(b"Trip with id 1 doesn&#39;t exist!", response.data)
+        with self.app.app_context():
+            self.assertEqual(0, get_hold_ledger().held_seats(1))
+
+    def test_confirm_deleted_trip(self):
+        """
+        Verify that confirming a hold on a deleted trip releases it instead of failing the request.
+        """
+        hold_url = self.hold_and_delete_trip()
+
+        response = self.first.post(hold_url + "/confirm", follow_redirects=True)
+        self.assertIn(b"Trip with id 1 doesn&#39;t exist!", response.data)
+        with self.app.app_context():
+            self.assertEqual(0, get_hold_ledger().held_seats(1))
+            self.assertEqual(0, Reservation.query.count())
+
+    def test_hold_unknown_trip(self):
+        """
+        Verify that holding seats of a trip that doesn't exist names the trip.
+        """
+        response = self.first.post(
+            "/trips/42/hold", data={"ticket_numbers": "1"}, follow_redirects=True
+        )
+        self.assertIn(b"Trip with id 42 doesn&#39;t exist!", response.data)
+
+    def test_lapsed_hold(self):
+        """
+        Verify that seats of a lapsed hold are free again and the hold can't be confirmed.
+        """
+        response = self.first.post("/trips/1/hold", data={"ticket_numbers": "7"})
+        hold_url = response.headers["Location"]
+
+        with mock.patch("tickets_project.holds.time") as mock_time:
+            mock_time.time = mock.Mock(return_value=datetime.now().timestamp() + 301)
+            self.assertIn(
+                b"Available seats: 10", self.second.get("/trips/1/reserve").data
+            )
+            self.first.post(hold_url + "/confirm")
+
+        with self.app.app_context():
+            self.assertEqual(0, Reservation.query.count())
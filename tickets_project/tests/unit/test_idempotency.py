@@ -0,0 +1,130 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from sqlalchemy import event
+
+from tickets_project import create_app, db
+from tickets_project.idempotency import (get_idempotency_store,
+                                         request_fingerprint)
+from tickets_project.models.reservation import Reservation
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+
+
+class TestIdempotency(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            db.session.add(
+                Trip(
+                    departure_city="Sofia",
+                    arrival_city="Varna",
+                    departure_datetime=datetime.now() + timedelta(days=1),
+                    arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                    available_seats=10,
+                    base_ticket_price=10,
+                )
+            )
+            db.session.commit()
+
+            self.statements = []
+            event.listen(
+                db.engine,
+                "before_cursor_execute",
+                lambda *args: self.statements.append(args[2]),
+            )
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+    def test_retried_reservation_replayed(self):
+        """
+        Verify that a retried reservation gets the first response without touching trips or reservations.
+        """
+        headers = {"Idempotency-Key": "retry-1"}
+        first = self.client.post(
+            "/trips/1/reserve", data={"ticket_numbers": "2"}, headers=headers
+        )
+
+        self.statements.clear()
+        retry = self.client.post(
+            "/trips/1/reserve", data={"ticket_numbers": "2"}, headers=headers
+        )
+        self.assertEqual(first.status_code, retry.status_code)
+        self.assertEqual(first.headers["Location"], retry.headers["Location"])
+        # the user comes from the cache, nothing touches the database
+        self.assertEqual([], self.statements)
+
+        # the key also works as a form field, and other keys aren't affected
+        for key in ["retry-2", "retry-2", "retry-3"]:
+            self.client.post(
+                "/trips/1/reserve",
+                data={"ticket_numbers": "2", "idempotency_key": key},
+            )
+        with self.app.app_context():
+            self.assertEqual(3, Reservation.query.count())
+            self.assertEqual(4, db.session.get(Trip, 1).available_seats)
+
+    def test_retried_payment_replayed(self):
+        """
+        Verify that a payment is replayed as well, and that keys are per user.
+        """
+        self.client.post("/trips/1/reserve", data={"ticket_numbers": "2"})
+        headers = {"Idempotency-Key": "pay-1"}
+        self.assertEqual(
+            302, self.client.post("/reservations/1/pay", headers=headers).status_code
+        )
+        self.statements.clear()
+        self.assertEqual(
+            302, self.client.post("/reservations/1/pay", headers=headers).status_code
+        )
+        self.assertEqual([], self.statements)
+
+        with self.app.app_context():
+            store = get_idempotency_store()
+            self.assertIsNotNone(store.get("idempotency:1:pay-1"))
+            self.assertIsNone(store.get("idempotency:2:pay-1"))
+
+    def test_conflicting_requests(self):
+        """
+        Verify that a key reused for another request is rejected, and that a
+        retry of a request that's still running gets a 409.
+        """
+        headers = {"Idempotency-Key": "conflict"}
+        self.client.post(
+            "/trips/1/reserve", data={"ticket_numbers": "2"}, headers=headers
+        )
+        response = self.client.post(
+            "/trips/1/reserve", data={"ticket_numbers": "3"}, headers=headers
+        )
+        self.assertEqual(422, response.status_code)
+
+        with self.app.app_context():
+            with self.app.test_request_context("/reservations/1/pay", method="POST"):
+                fingerprint = request_fingerprint()
+            get_idempotency_store().add(
+                "idempotency:1:running",
+                {"in_flight": True, "fingerprint": fingerprint},
+            )
+        response = self.client.post(
+            "/reservations/1/pay", headers={"Idempotency-Key": "running"}
+        )
+        self.assertEqual(409, response.status_code)
+        with self.app.app_context():
+            self.assertFalse(db.session.get(Reservation, 1).is_paid_for)
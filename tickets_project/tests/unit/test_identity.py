@@ -0,0 +1,112 @@
+import os
+import unittest
+from unittest import mock as mock
+
+from sqlalchemy import event
+
+from tickets_project import create_app, db
+from tickets_project.identity import load_identity
+from tickets_project.models.train_card import SUPPORTED_CARD_TYPES
+from tickets_project.models.user import User
+
+
+class TestUserIdentity(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        with self.app.app_context():
+            for username, is_admin in [("admin", True), ("valid_username", False)]:
+                db.session.add(
+                    User(
+                        email=f"{username}@email.bg",
+                        username=username,
+                        password="strongpass",
+                        firstname="test",
+                        lastname="test",
+                        age=30,
+                        is_admin=is_admin,
+                    )
+                )
+            db.session.commit()
+
+            self.user_queries = []
+            event.listen(
+                db.engine,
+                "before_cursor_execute",
+                lambda *args: "FROM user" in args[2]
+                and self.user_queries.append(args[2]),
+            )
+
+    def client(self, user_id):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+        return client
+
+    def test_user_loaded_once(self):
+        """
+        Verify that the logged in user is queried on the first request only.
+        """
+        client = self.client(2)
+        for _ in range(3):
+            self.assertEqual(200, client.get("/trips/").status_code)
+            self.assertEqual(200, client.get("/cards/").status_code)
+
+        self.assertEqual(1, len(self.user_queries))
+
+    def test_card_changes_invalidate(self):
+        """
+        Verify that registering and removing a card are seen by the next request.
+        """
+        client = self.client(2)
+        client.get("/trips/")
+        client.post("/cards/register", data={"card_type": SUPPORTED_CARD_TYPES[1]})
+
+        with self.app.test_request_context():
+            self.assertEqual(
+                SUPPORTED_CARD_TYPES[1], load_identity(2).train_card.card_type
+            )
+
+            client.post("/cards/remove")
+            self.assertIsNone(load_identity(2).train_card)
+
+    def test_user_edit_invalidates(self):
+        """
+        Verify that a user who is made admin can manage users on their next request.
+        """
+        user = self.client(2)
+        user.get("/trips/")
+        with self.assertRaises(PermissionError):
+            user.get("/users/")
+
+        self.client(1).post(
+            "/users/2",
+            data={
+                "email": "valid_username@email.bg",
+                "username": "valid_username",
+                "firstname": "test",
+                "lastname": "test",
+                "age": "30",
+                "is_admin": "on",
+            },
+        )
+        self.assertEqual(200, user.get("/users/").status_code)
+
+    def test_admin_revoked_elsewhere(self):
+        """
+        Verify that revoked admin rights apply on the next request, even though the cached identity wasn't invalidated.
+        """
+        admin = self.client(1)
+        self.assertEqual(200, admin.get("/users/").status_code)
+
+        # as another worker with its own cache would do it
+        with self.app.app_context():
+            db.session.get(User, 1).is_admin = False
+            db.session.commit()
+
+        with self.assertRaises(PermissionError):
+            admin.get("/users/")
+        with self.app.test_request_context():
+            self.assertFalse(load_identity(1).is_admin)
@@ -0,0 +1,117 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.models.user import User
+
+
+class TestInstrumentation(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+        self.app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite://",
+                "TESTING": True,
+                "PROFILE_DIR": self.profile_dir.name,
+                "PROFILE_SAMPLE_RATE": 0,
+            }
+        )
+        with self.app.app_context():
+            for username, is_admin in [("admin", True), ("valid_username", False)]:
+                db.session.add(
+                    User(
+                        email=f"{username}@email.bg",
+                        username=username,
+                        password="strongpass",
+                        firstname="test",
+                        lastname="test",
+                        age=30,
+                        is_admin=is_admin,
+                    )
+                )
+            db.session.commit()
+
+    def client(self, user_id):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user_id)
+        return client
+
+    def profiles(self):
+        return os.listdir(self.profile_dir.name)
+
+    def test_server_timing(self):
+        """
+        Verify that the Server-Timing header reports the SQL, template and
+        total time of a request.
+        """
+        response = self.client(2).get("/cards/")
+
+        self.assertEqual(200, response.status_code)
+        timing = {
+            metric.split(";")[0]: metric
+            for metric in response.headers["Server-Timing"].split(", ")
+        }
+        self.assertEqual({"sql", "template", "hash", "total"}, set(timing))
+        self.assertRegex(timing["sql"], r'^sql;dur=[\d.]+;desc="[1-9]\d* queries"$')
+        self.assertRegex(timing["total"], r"^total;dur=[\d.]+$")
+
+    def test_server_timing_disabled(self):
+        """
+        Verify that no Server-Timing header is sent when it is switched off.
+        """
+        self.app.config["SERVER_TIMING"] = False
+
+        response = self.client(2).get("/cards/")
+
+        self.assertNotIn("Server-Timing", response.headers)
+
+    def test_request_logged(self):
+        """
+        Verify that with the request log on every request logs a JSON line with its timings.
+        """
+        with self.assertNoLogs("tickets_project.requests", "INFO"):
+            self.client(2).get("/cards/")
+
+        self.app.config["REQUEST_LOG"] = True
+        with self.assertLogs("tickets_project.requests", "INFO") as logs:
+            self.client(2).get("/cards/")
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual("cards.manage", line["endpoint"])
+        self.assertEqual(200, line["status"])
+        self.assertGreater(line["sql_count"], 0)
+        self.assertGreater(line["total_ms"], 0)
+        self.assertIsNone(line["profile"])
+
+    def test_admin_requests_profile(self):
+        """
+        Verify that an admin gets a profile of the request with the profile
+        header and that other users don't.
+        """
+        response = self.client(2).get("/cards/", headers={"X-Profile": "1"})
+        self.assertNotIn("X-Profile-File", response.headers)
+        self.assertEqual([], self.profiles())
+
+        response = self.client(1).get("/cards/", headers={"X-Profile": "1"})
+        self.assertEqual([response.headers["X-Profile-File"]], self.profiles())
+
+    def test_sampled_profiles_keep_slowest(self):
+        """
+        Verify that only the profiles of the slowest sampled requests are kept.
+        """
+        self.app.config["PROFILE_SAMPLE_RATE"] = 1
+        self.app.extensions["profile_store"].keep = 2
+        client = self.client(2)
+
+        for _ in range(5):
+            client.get("/cards/")
+
+        self.assertEqual(2, len(self.profiles()))
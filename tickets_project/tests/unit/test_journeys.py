@@ -0,0 +1,90 @@
+import unittest
+from datetime import datetime, timedelta
+
+from tickets_project.journeys import Leg, TimetableGraph
+
+
+class TestJourneys(unittest.TestCase):
+    def setUp(self) -> None:
+        self.start = datetime(2024, 3, 25, 8, 0)
+        self.graph = TimetableGraph()
+        self.graph.load(
+            [
+                # direct, but slow and expensive
+                self.leg(1, "Sofia", "Varna", 0, 8, 60),
+                # fast connection through Plovdiv
+                self.leg(2, "Sofia", "Plovdiv", 0, 2, 15),
+                self.leg(3, "Plovdiv", "Varna", 2.5, 5, 15),
+                # connection that leaves no time for a transfer
+                self.leg(4, "Plovdiv", "Varna", 2.1, 4, 5),
+                # cheap, but slow connection through Ruse
+                self.leg(5, "Sofia", "Ruse", 1, 4, 10),
+                self.leg(6, "Ruse", "Varna", 5, 9, 10),
+            ]
+        )
+
+    def leg(self, id, departure_city, arrival_city, departs, arrives, price):
+        return Leg(
+            id,
+            departure_city,
+            arrival_city,
+            self.start + timedelta(hours=departs),
+            self.start + timedelta(hours=arrives),
+            price,
+        )
+
+    def price(self, leg):
+        return leg.base_ticket_price
+
+    def ids(self, legs):
+        return [leg.id for leg in legs]
+
+    def test_journey_earliest_arrival(self):
+        """
+        Verify that the earliest arriving connection is found,
+        respecting the minimum transfer time.
+        """
+        legs = self.graph.earliest_arrival("Sofia", "Varna", self.start)
+        self.assertEqual([2, 3], self.ids(legs))
+
+        legs = self.graph.earliest_arrival(
+            "Sofia", "Varna", self.start, min_transfer=timedelta(0)
+        )
+        self.assertEqual([2, 4], self.ids(legs))
+
+    def test_journey_cheapest(self):
+        """
+        Verify that the cheapest connection is found.
+        """
+        legs = self.graph.cheapest("Sofia", "Varna", self.start, self.price)
+        self.assertEqual([5, 6], self.ids(legs))
+
+        legs = self.graph.cheapest("Sofia", "Varna", self.start, self.price, max_legs=1)
+        self.assertEqual([1], self.ids(legs))
+
+    def test_journey_no_connection(self):
+        """
+        Verify that no journey is returned when the cities are not connected.
+        """
+        self.assertIsNone(self.graph.earliest_arrival("Varna", "Sofia", self.start))
+        self.assertIsNone(
+            self.graph.cheapest(
+                "Sofia", "Varna", self.start + timedelta(hours=6), self.price
+            )
+        )
+
+    def test_journey_incremental_updates(self):
+        """
+        Verify that trip changes are reflected without reloading the graph.
+        """
+        self.graph.remove_trip(3)
+        legs = self.graph.earliest_arrival("Sofia", "Varna", self.start)
+        self.assertEqual([1], self.ids(legs))
+
+        self.graph.add_trip(self.leg(7, "plovdiv", "varna", 2.5, 3, 1))
+        legs = self.graph.earliest_arrival("Sofia", "Varna", self.start)
+        self.assertEqual([2, 7], self.ids(legs))
+
+        self.graph.update_trip(self.leg(7, "Plovdiv", "Varna", 2.5, 10, 1))
+        legs = self.graph.earliest_arrival("Sofia", "Varna", self.start)
+        self.assertEqual([1], self.ids(legs))
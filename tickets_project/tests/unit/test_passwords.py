@@ -0,0 +1,115 @@
+import os
+import unittest
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.models.user import User
+from tickets_project.passwords import (PasswordHasher, PasswordServiceBusy,
+                                       get_password_hasher)
+
+
+class TestPasswordHasher(unittest.TestCase):
+    def test_hash_and_check(self):
+        """
+        Verify that a hashed password is accepted and any other password isn't.
+        """
+        hasher = PasswordHasher(workers=0, rounds=4)
+        hashed = hasher.hash("strongpass")
+
+        self.assertNotEqual(b"strongpass", hashed)
+        self.assertTrue(hasher.check("strongpass", hashed))
+        self.assertTrue(hasher.check("strongpass", hashed.decode("utf-8")))
+        self.assertFalse(hasher.check("wrongpass", hashed))
+
+    def test_check_not_a_hash(self):
+        """
+        Verify that a password stored without hashing never matches.
+        """
+        hasher = PasswordHasher(workers=0, rounds=4)
+        self.assertFalse(hasher.check("strongpass", "strongpass"))
+
+    def test_worker_processes(self):
+        """
+        Verify that hashes made in the worker processes can be checked, and
+        that the workers aren't forked from the threaded server.
+        """
+        hasher = PasswordHasher(workers=1, rounds=4)
+        try:
+            self.assertNotEqual("fork", hasher._executor._mp_context.get_start_method())
+            self.assertTrue(hasher.check("strongpass", hasher.hash("strongpass")))
+        finally:
+            hasher.shutdown()
+
+    def test_busy(self):
+        """
+        Verify that hashes beyond the pending limit are turned away.
+        """
+        hasher = PasswordHasher(workers=0, max_pending=1, rounds=4)
+        hasher._slots.acquire()
+
+        with self.assertRaises(PasswordServiceBusy):
+            hasher.hash("strongpass")
+
+        hasher._slots.release()
+        self.assertTrue(hasher.hash("strongpass"))
+
+
+class TestLogin(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite://",
+                "TESTING": True,
+                "PASSWORD_HASH_WORKERS": 0,
+                "PASSWORD_HASH_ROUNDS": 4,
+            }
+        )
+        self.client = self.app.test_client()
+
+    def signup(self):
+        return self.client.post(
+            "/signup",
+            data={
+                "email": "valid@email.bg",
+                "username": "valid_username",
+                "password": "strongpass",
+                "firstname": "test",
+                "lastname": "test",
+                "age": "30",
+            },
+        )
+
+    def test_signup_and_login(self):
+        """
+        Verify that a signed up user can log in with their password only.
+        """
+        self.signup()
+        with self.app.app_context():
+            self.assertNotEqual(b"strongpass", db.session.get(User, 1).password)
+
+        response = self.client.post(
+            "/login", data={"username": "valid_username", "password": "wrongpass"}
+        )
+        self.assertTrue(response.location.endswith("/login"))
+
+        response = self.client.post(
+            "/login", data={"username": "valid_username", "password": "strongpass"}
+        )
+        self.assertTrue(response.location.endswith("/trips/"))
+
+    def test_login_busy(self):
+        """
+        Verify that logins are answered with 503 while the hasher is full.
+        """
+        self.signup()
+        with self.app.app_context():
+            get_password_hasher()._slots = mock.Mock(**{"acquire.return_value": False})
+
+        response = self.client.post(
+            "/login", data={"username": "valid_username", "password": "strongpass"}
+        )
+        self.assertEqual(503, response.status_code)
+        self.assertEqual("1", response.headers["Retry-After"])
@@ -0,0 +1,190 @@
+import os
+import unittest
+from datetime import datetime, time
+from unittest import mock as mock
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from tickets_project import create_app, db
+from tickets_project.fares import quote_fares
+from tickets_project.models.pricing_rule import CARD, OFF_PEAK, PricingRule
+from tickets_project.models.train_card import SUPPORTED_CARD_TYPES, TrainCard
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+from tickets_project.pricing import (PricingRules, bump_pricing_version,
+                                     get_pricing_rules)
+from tickets_project.reservations import calculate_discount
+
+times = st.one_of(st.none(), st.times())
+rules = st.lists(
+    st.one_of(
+        st.builds(
+            PricingRule,
+            kind=st.just(OFF_PEAK),
+            departs_from=times,
+            departs_until=times,
+            arrives_until=times,
+            discount=st.floats(min_value=0.01, max_value=1),
+        ),
+        st.builds(
+            PricingRule,
+            kind=st.just(CARD),
+            card_type=st.sampled_from(SUPPORTED_CARD_TYPES),
+            with_child=st.sampled_from([None, True, False]),
+            owner_ticket_only=st.booleans(),
+            discount=st.floats(min_value=0.01, max_value=1),
+        ),
+    ),
+    max_size=6,
+)
+
+
+class TestPricingRules(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.trip = Trip(
+            departure_datetime=datetime(2030, 3, 25, 10),
+            arrival_datetime=datetime(2030, 3, 25, 12),
+            base_ticket_price=10,
+        )
+
+    def test_default_rules_without_database(self):
+        """
+        Verify that the default rules are used outside of the app and while no rules are stored.
+        """
+        self.assertEqual(9.5, calculate_discount(self.trip, None, 1, False))
+        with self.app.app_context():
+            self.assertEqual(9.5, calculate_discount(self.trip, None, 1, False))
+            self.assertEqual(
+                4.5,
+                calculate_discount(
+                    self.trip, TrainCard(card_type=SUPPORTED_CARD_TYPES[1]), 1, True
+                ),
+            )
+
+    def test_rules_reloaded_on_version_change(self):
+        """
+        Verify that the compiled rules are reused until the pricing version changes.
+        """
+        with self.app.app_context():
+            rules = get_pricing_rules()
+            self.assertIs(rules, get_pricing_rules())
+
+            db.session.add(
+                PricingRule(kind=OFF_PEAK, departs_from=time(8), discount=0.2)
+            )
+            db.session.commit()
+            self.assertEqual(9.5, calculate_discount(self.trip, None, 1, False))
+
+            bump_pricing_version()
+            self.assertIsNot(rules, get_pricing_rules())
+            self.assertEqual(8, calculate_discount(self.trip, None, 1, False))
+            # only the stored rule applies, there's no card discount anymore
+            self.assertEqual(
+                8,
+                calculate_discount(
+                    self.trip, TrainCard(card_type=SUPPORTED_CARD_TYPES[1]), 1, True
+                ),
+            )
+
+    def test_rules_reloaded_after_ttl(self):
+        """
+        Verify that the compiled rules expire, as other workers' changes to the
+        pricing version aren't seen without a shared cache.
+        """
+        with self.app.app_context():
+            rules = get_pricing_rules()
+            db.session.add(
+                PricingRule(kind=OFF_PEAK, departs_from=time(8), discount=0.2)
+            )
+            db.session.commit()
+
+            rules.compiled_at -= self.app.config["CACHE_TTL"]
+            self.assertIsNot(rules, get_pricing_rules())
+            self.assertEqual(8, calculate_discount(self.trip, None, 1, False))
+
+    def test_time_window_memoized(self):
+        """
+        Verify that the time windows are checked once per departure and arrival time.
+        """
+        with self.app.app_context():
+            rules = get_pricing_rules()
+            for num_of_tickets in range(1, 6):
+                calculate_discount(self.trip, None, num_of_tickets, False)
+            self.assertEqual(1, rules.time_discount.cache_info().misses)
+            self.assertEqual(4, rules.time_discount.cache_info().hits)
+
+    def test_pricing_admin_keeps_defaults(self):
+        """
+        Verify that adding the first rule keeps the default rules, and that it applies right away.
+        """
+        with self.app.app_context():
+            user = User(
+                email="valid@email.bg",
+                username="valid_username",
+                password="strongpass",
+                firstname="test",
+                lastname="test",
+                age=30,
+            )
+            user.is_admin = True
+            db.session.add(user)
+            db.session.commit()
+
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+        client.post(
+            "/pricing/create",
+            data={
+                "kind": "card",
+                "card_type": "family",
+                "with_child": "yes",
+                "discount": "60",
+            },
+        )
+        with self.app.app_context():
+            self.assertEqual(6, PricingRule.query.count())
+            self.assertEqual(
+                3.5,
+                calculate_discount(
+                    self.trip, TrainCard(card_type=SUPPORTED_CARD_TYPES[1]), 1, True
+                ),
+            )
+        self.assertIn(b"60.0% off all tickets", client.get("/pricing/").data)
+
+        response = client.post(
+            "/pricing/create", data={"kind": "card", "discount": "x"}
+        )
+        self.assertEqual(302, response.status_code)
+        with self.app.app_context():
+            self.assertEqual(6, PricingRule.query.count())
+
+    @given(rules, st.datetimes(), st.datetimes(), st.integers(1, 10), st.booleans())
+    def test_quote_fares_with_custom_rules(
+        self, rules, departure, arrival, num_of_tickets, has_child
+    ):
+        """
+        Verify that batch quotes follow any rule set exactly like single quotes.
+        """
+        rules = PricingRules(rules)
+        card_types = [None, *SUPPORTED_CARD_TYPES]
+        expected = [
+            rules.fare(departure, arrival, 12.3, card_type, num_of_tickets, has_child)
+            for card_type in card_types
+        ]
+        fares = quote_fares(
+            [departure] * 3,
+            [arrival] * 3,
+            12.3,
+            num_of_tickets,
+            card_types,
+            has_child,
+            rules=rules,
+        )
+        self.assertEqual(expected, fares.tolist())
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from sqlalchemy import event
+
+from tickets_project import create_app, db
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+from tickets_project.replicas import PRIMARY_UNTIL, sync_sqlite_replicas
+
+
+class TestReadReplicas(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        # a SQLite copy of the database, synced with the backup API, stands in
+        # for a replica
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite:///"
+                + os.path.join(self.tmp_dir.name, "primary.db"),
+                "SQLALCHEMY_BINDS": {
+                    "replica": "sqlite:///"
+                    + os.path.join(self.tmp_dir.name, "replica.db")
+                },
+                "READ_REPLICAS": ["replica"],
+                "TESTING": True,
+            }
+        )
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            self.add_trip("Varna")
+            db.session.commit()
+            self.assertEqual(["replica"], sync_sqlite_replicas())
+
+            # a trip the replica doesn't have yet
+            self.add_trip("Burgas")
+            db.session.commit()
+
+            self.statements = {"primary": [], "replica": []}
+            for key, engine in [(None, "primary"), ("replica", "replica")]:
+                event.listen(
+                    db.engines[key],
+                    "before_cursor_execute",
+                    lambda *args, engine=engine: self.statements[engine].append(
+                        args[2]
+                    ),
+                )
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+    def tearDown(self) -> None:
+        with self.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        self.tmp_dir.cleanup()
+
+    def add_trip(self, arrival_city):
+        db.session.add(
+            Trip(
+                departure_city="Sofia",
+                arrival_city=arrival_city,
+                departure_datetime=datetime.now() + timedelta(days=1),
+                arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                available_seats=10,
+                base_ticket_price=10,
+            )
+        )
+
+    def get(self, url):
+        for statements in self.statements.values():
+            statements.clear()
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        return response.get_data(as_text=True)
+
+    def test_read_only_views_use_replica(self):
+        """
+        Verify that read only views query the replica and other views the primary.
+        """
+        page = self.get("/trips/")
+        self.assertIn("Varna", page)
+        self.assertNotIn("Burgas", page)
+        self.assertTrue(
+            any("FROM trip" in s for s in self.statements["replica"]),
+            self.statements,
+        )
+
+        self.get("/reservations/")
+        self.assertEqual([], self.statements["primary"])
+
+        self.get("/cards/")
+        self.assertEqual([], self.statements["replica"])
+
+    def test_reads_after_write_use_primary(self):
+        """
+        Verify that a client that wrote reads from the primary for a while.
+        """
+        self.client.post("/trips/2/reserve", data={"ticket_numbers": "1"})
+
+        self.get("/reservations/")
+        self.assertEqual([], self.statements["replica"])
+        self.assertIn("Burgas", self.get("/trips/"))
+
+        with self.client.session_transaction() as session:
+            self.assertGreater(session[PRIMARY_UNTIL], time.time())
+            session[PRIMARY_UNTIL] = time.time() - 1
+        self.get("/reservations/")
+        self.assertEqual([], self.statements["primary"])
+
+    def test_sync_replicas_command(self):
+        """
+        Verify that syncing copies the primary's latest writes to the replica.
+        """
+        result = self.app.test_cli_runner().invoke(args=["sync-replicas"])
+        self.assertIn("Synced 1 replicas.", result.output)
+
+        self.assertIn("Burgas", self.get("/trips/"))
+        self.assertTrue(any("FROM trip" in s for s in self.statements["replica"]))
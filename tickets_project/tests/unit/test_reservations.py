@@ -1,20 +1,31 @@
 import os
 import unittest
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from unittest import mock as mock
 
-from tickets_project import create_app
+from sqlalchemy import event
+
+from tickets_project import create_app, db
 from tickets_project.models.reservation import Reservation
 from tickets_project.models.train_card import SUPPORTED_CARD_TYPES, TrainCard
 from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+from tickets_project.pricing import get_pricing_rules
 from tickets_project.reservations import (calculate_discount,
+                                          sweep_expired_reservations,
                                           validate_available_tickets)
 from tickets_project.trips import DATETIME_FORMAT
 
 
 class TestReservations(unittest.TestCase):
     @mock.patch.dict(
-        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+        os.environ,
+        {
+            "APP_SECRET": "UNIT_TEST",
+            "FLASK_APP": "tickets_project",
+            # not the bundled database.db, the tests would change it
+            "DATABASE_URL": "sqlite://",
+        },
     )
     def setUp(self) -> None:
         self.app = create_app()
@@ -207,3 +218,170 @@ class TestReservations(unittest.TestCase):
                 has_child=True,
             ),
         )
+
+
+class TestReservationSweeper(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            for arrival_city in ["Varna", "Burgas"]:
+                db.session.add(
+                    Trip(
+                        departure_city="Sofia",
+                        arrival_city=arrival_city,
+                        departure_datetime=datetime.now() + timedelta(days=30),
+                        arrival_datetime=datetime.now() + timedelta(days=30, hours=3),
+                        available_seats=10,
+                        base_ticket_price=10,
+                    )
+                )
+            old = datetime.now() - timedelta(days=8)
+            for trip_id, created_at, is_paid_for in [
+                (1, old, False),
+                (1, old, False),
+                (2, old, False),
+                (1, old, True),
+                (2, datetime.now(), False),
+            ]:
+                db.session.add(
+                    Reservation(
+                        ticket_numbers=2,
+                        sum_price=20,
+                        trip_id=trip_id,
+                        user_id=1,
+                        created_at=created_at,
+                        is_paid_for=is_paid_for,
+                    )
+                )
+            db.session.commit()
+
+    def test_reservation_created_at_default(self):
+        """
+        Verify that every reservation gets its own creation time.
+        """
+        with self.app.app_context():
+            db.session.add(
+                Reservation(ticket_numbers=1, sum_price=10, trip_id=1, user_id=1)
+            )
+            db.session.commit()
+            newest = Reservation.query.order_by(Reservation.id.desc()).first()
+            self.assertGreater(newest.created_at, datetime.now() - timedelta(minutes=1))
+
+    def test_reservation_sweep_restores_seats(self):
+        """
+        Verify that only reservations unpaid for more than a week are deleted,
+        and that their seats are available again.
+        """
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+        # listing hides expired reservations, but doesn't delete them
+        self.assertEqual(2, client.get("/reservations/").data.count(b"Reservation #"))
+
+        with self.app.app_context():
+            self.assertEqual(5, Reservation.query.count())
+            self.assertEqual(3, sweep_expired_reservations(batch_size=2))
+            self.assertEqual(0, sweep_expired_reservations())
+
+            self.assertEqual([4, 5], [r.id for r in Reservation.query.all()])
+            self.assertEqual(14, db.session.get(Trip, 1).available_seats)
+            self.assertEqual(12, db.session.get(Trip, 2).available_seats)
+
+
+class TestReservationQueries(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="valid@email.bg",
+                    username="valid_username",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                )
+            )
+            db.session.add(TrainCard(card_type=SUPPORTED_CARD_TYPES[1], user_id=1))
+            for arrival_city in ["Varna", "Burgas", "Plovdiv", "Ruse", "Pleven"]:
+                db.session.add(
+                    Trip(
+                        departure_city="Sofia",
+                        arrival_city=arrival_city,
+                        departure_datetime=datetime.now() + timedelta(days=1),
+                        arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                        available_seats=1000,
+                        base_ticket_price=10,
+                    )
+                )
+            for i in range(100):
+                db.session.add(
+                    Reservation(
+                        ticket_numbers=1, sum_price=10, trip_id=i % 5 + 1, user_id=1
+                    )
+                )
+            db.session.commit()
+            # the pricing rules are compiled once per app, not per request
+            get_pricing_rules()
+
+            self.statements = []
+            event.listen(
+                db.engine,
+                "before_cursor_execute",
+                lambda *args: self.statements.append(args[2]),
+            )
+
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+    def count_statements(self, method, url, **kwargs):
+        self.statements.clear()
+        response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return len(self.statements)
+
+    def test_reservation_statement_counts(self):
+        """
+        Verify the number of SQL statements of each reservation endpoint,
+        which must not grow with the number of reservations shown.
+        """
+        # the user with their train card, then the reservations with their trips
+        self.assertEqual(2, self.count_statements("get", "/reservations/?page_size=10"))
+        # the user is taken from the cache from now on
+        self.assertEqual(
+            1, self.count_statements("get", "/reservations/?page_size=100")
+        )
+        self.assertEqual(1, self.count_statements("get", "/reservations/5"))
+        # ... plus the reservation and seat UPDATEs
+        self.assertEqual(
+            3,
+            self.count_statements(
+                "post", "/reservations/5", data={"ticket_numbers": "3"}
+            ),
+        )
+        # the trip, the seat UPDATE and the INSERT
+        self.assertEqual(
+            3,
+            self.count_statements(
+                "post", "/trips/1/reserve", data={"ticket_numbers": "2"}
+            ),
+        )
+        # the reservation, the seat UPDATE and the DELETE
+        self.assertEqual(3, self.count_statements("post", "/reservations/5/delete"))
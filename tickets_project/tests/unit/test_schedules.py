@@ -0,0 +1,95 @@
+import os
+import unittest
+from datetime import date, datetime, time, timedelta
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.models.schedule_template import ScheduleTemplate
+from tickets_project.models.trip import Trip
+from tickets_project.schedules import ensure_materialized, materialize_trips
+
+
+class TestSchedules(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.today = date.today()
+
+    def create_template(self, **kwargs):
+        values = dict(
+            departure_city="Sofia",
+            arrival_city="Plovdiv",
+            departure_time=time(7, 30),
+            duration_minutes=150,
+            weekday_mask=0b0011111,  # weekdays only
+            valid_from=self.today,
+            valid_until=self.today + timedelta(days=90),
+            available_seats=100,
+            base_ticket_price=15,
+        )
+        values.update(kwargs)
+        return ScheduleTemplate(**values)
+
+    def test_schedule_departures(self):
+        """
+        Verify that a service only departs on its days of the week,
+        within its validity period.
+        """
+        with self.app.app_context():
+            template = self.create_template(
+                valid_from=date(2024, 3, 25), valid_until=date(2099, 1, 1)
+            )
+            # Monday 25.03.2024 to Monday 01.04.2024
+            departures = [
+                *template.departures(datetime(2024, 3, 25), datetime(2024, 4, 1, 23))
+            ]
+            self.assertEqual(
+                [datetime(2024, 3, day, 7, 30) for day in range(25, 30)]
+                + [datetime(2024, 4, 1, 7, 30)],
+                departures,
+            )
+
+            with self.assertRaises(ValueError):
+                self.create_template(weekday_mask=0)
+            with self.assertRaises(ValueError):
+                self.create_template(valid_until=self.today - timedelta(days=1))
+
+    def test_schedule_materialize_trips_once(self):
+        """
+        Verify that materializing the same period twice doesn't create duplicates.
+        """
+        with self.app.app_context():
+            template = self.create_template(weekday_mask=0b1111111)
+            db.session.add(template)
+            db.session.commit()
+
+            end = datetime.now() + timedelta(days=10)
+            created = materialize_trips(datetime.now(), end)
+            self.assertIn(created, (10, 11))
+            self.assertEqual(0, materialize_trips(datetime.now(), end))
+            self.assertEqual(created, Trip.query.count())
+
+            trip = Trip.query.first()
+            self.assertEqual(template.id, trip.schedule_template_id)
+            self.assertEqual(
+                trip.departure_datetime + timedelta(minutes=150), trip.arrival_datetime
+            )
+
+    def test_schedule_lazy_materialization(self):
+        """
+        Verify that trips are only created up to the requested horizon.
+        """
+        with self.app.app_context():
+            db.session.add(self.create_template(weekday_mask=0b1111111))
+            db.session.commit()
+
+            ensure_materialized(datetime.now() + timedelta(days=3))
+            self.assertLessEqual(Trip.query.count(), 5)
+
+            ensure_materialized(datetime.now() + timedelta(days=30))
+            last = Trip.query.order_by(Trip.departure_datetime.desc()).first()
+            self.assertGreater(
+                last.departure_datetime, datetime.now() + timedelta(days=29)
+            )
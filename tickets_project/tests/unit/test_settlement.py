@@ -0,0 +1,126 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from tickets_project import create_app, db
+from tickets_project.models.reservation import Reservation
+from tickets_project.models.trip import Trip
+from tickets_project.models.user import User
+from tickets_project.settlement import (read_settlement_file,
+                                        settle_reservations)
+
+
+class TestSettlement(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        with self.app.app_context():
+            user = User(
+                email="valid@email.bg",
+                username="valid_username",
+                password="strongpass",
+                firstname="test",
+                lastname="test",
+                age=30,
+            )
+            user.is_admin = True
+            db.session.add(user)
+            db.session.add(
+                Trip(
+                    departure_city="Sofia",
+                    arrival_city="Varna",
+                    departure_datetime=datetime.now() + timedelta(days=1),
+                    arrival_datetime=datetime.now() + timedelta(days=1, hours=3),
+                    available_seats=100,
+                    base_ticket_price=10,
+                )
+            )
+            for i in range(10):
+                db.session.add(
+                    Reservation(
+                        ticket_numbers=1,
+                        sum_price=10,
+                        trip_id=1,
+                        user_id=1,
+                        is_paid_for=i == 0,
+                    )
+                )
+            db.session.commit()
+
+    def test_settle_reservations_in_chunks(self):
+        """
+        Verify that reservations are paid in chunks, and that settling again changes nothing.
+        """
+        with self.app.app_context():
+            settlement = settle_reservations(
+                [1, 2, "3", 3, 4, 42, "x", 5], chunk_size=2
+            )
+            self.assertEqual([2, 3, 4, 5], sorted(settlement.paid))
+            self.assertEqual([1], settlement.already_paid)
+            self.assertEqual(["x", 42], settlement.unknown)
+            self.assertEqual(5, Reservation.query.filter_by(is_paid_for=True).count())
+
+            settlement = settle_reservations(range(1, 6))
+            self.assertEqual([], settlement.paid)
+            self.assertEqual([1, 2, 3, 4, 5], settlement.already_paid)
+
+    def test_settlement_file(self):
+        """
+        Verify that CSV and JSONL settlement files are read.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, "settlement.csv")
+            with open(csv_path, "w") as f:
+                f.write("reservation_id,amount\n2,10\n3,10\n")
+            jsonl_path = os.path.join(tmp_dir, "settlement.jsonl")
+            with open(jsonl_path, "w") as f:
+                f.write('{"reservation_id": 4}\nnot json\n')
+
+            self.assertEqual(["2", "3"], [*read_settlement_file(csv_path)])
+            self.assertEqual([4, "not json"], [*read_settlement_file(jsonl_path)])
+
+    def test_settle_endpoint(self):
+        """
+        Verify that admins can settle reservations by id or with an uploaded file.
+        """
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+        response = client.post(
+            "/reservations/settle", json={"reservation_ids": [1, 2, 3, 99]}
+        )
+        self.assertEqual(
+            {"paid": 2, "already_paid": [1], "unknown": [99]}, response.json
+        )
+
+        response = client.post(
+            "/reservations/settle",
+            data={
+                "settlement_file": (
+                    io.BytesIO(b"reservation_id\n3\n4\n"),
+                    "settlement.csv",
+                )
+            },
+        )
+        self.assertEqual({"paid": 1, "already_paid": [3], "unknown": []}, response.json)
+
+        response = client.post("/reservations/settle", json={"reservation_ids": 3})
+        self.assertEqual(400, response.status_code)
+
+    def test_settle_command(self):
+        """
+        Verify that reservations are settled from the command line.
+        """
+        result = self.app.test_cli_runner().invoke(
+            args=["reservations", "settle", "2", "3", "77"]
+        )
+        self.assertIn(
+            "Paid 2 reservations, 0 were paid already, 1 unknown.", result.output
+        )
+        self.assertIn("Unknown: 77", result.output)
@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock as mock
+
+from tickets_project import create_app
+from tickets_project.models.trip import Trip
+from tickets_project.trips import DATETIME_FORMAT
+
+
+class TestTripImport(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+        tomorrow = datetime.now() + timedelta(days=1)
+        self.departure = datetime.strftime(tomorrow, DATETIME_FORMAT)
+        self.arrival = datetime.strftime(tomorrow + timedelta(hours=2), DATETIME_FORMAT)
+        self.past = datetime.strftime(tomorrow - timedelta(days=2), DATETIME_FORMAT)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path):
+        return self.app.test_cli_runner().invoke(
+            args=["trips", "import", path, "--batch-size", "2"]
+        )
+
+    def test_trip_import_csv(self):
+        """
+        Verify that valid CSV rows are imported and invalid ones are reported.
+        """
+        path = self.write_file(
+            "timetable.csv",
+            "departure_city,arrival_city,departure_datetime,arrival_datetime,"
+            "two_way_trip,available_seats,base_ticket_price\n"
+            f"Sofia,Varna,{self.departure},{self.arrival},true,100,12.5\n"
+            f"Sofia,Plovdiv,{self.departure},{self.arrival},,50,10\n"
+            f"Varna,Ruse,{self.departure},{self.arrival},false,20,7\n"
+            # same cities, arrival before departure, past departure, negative seats
+            f"Sofia,sofia,{self.departure},{self.arrival},false,20,7\n"
+            f"Sofia,Varna,{self.arrival},{self.departure},false,20,7\n"
+            f"Sofia,Varna,{self.past},{self.arrival},false,20,7\n"
+            f"Sofia,Varna,{self.departure},{self.arrival},false,-1,7\n",
+        )
+
+        result = self.run_import(path)
+        self.assertIn("Imported 3 trips, rejected 4.", result.output)
+
+        with self.app.app_context():
+            self.assertEqual(
+                [("Sofia", "Varna", True), ("Sofia", "Plovdiv", False)],
+                [
+                    (trip.departure_city, trip.arrival_city, trip.two_way_trip)
+                    for trip in Trip.query.order_by(Trip.id).limit(2)
+                ],
+            )
+
+        with open(path + ".rejects.jsonl") as f:
+            rejects = [json.loads(line) for line in f]
+        self.assertEqual([5, 6, 7, 8], [reject["line"] for reject in rejects])
+
+    def test_trip_import_jsonl(self):
+        """
+        Verify that JSONL timetables are imported, and malformed lines rejected.
+        """
+        row = {
+            "departure_city": "Sofia",
+            "arrival_city": "Varna",
+            "departure_datetime": self.departure,
+            "arrival_datetime": self.arrival,
+            "available_seats": 100,
+            "base_ticket_price": 12.5,
+        }
+        path = self.write_file(
+            "timetable.jsonl",
+            f"{json.dumps(row)}\nnot json\n{json.dumps({'departure_city': 'Sofia'})}\n",
+        )
+
+        result = self.run_import(path)
+        self.assertIn("Imported 1 trips, rejected 2.", result.output)
+        with self.app.app_context():
+            self.assertEqual(1, Trip.query.count())
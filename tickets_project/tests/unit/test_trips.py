@@ -3,16 +3,24 @@ import unittest
 from datetime import datetime, timedelta
 from unittest import mock as mock
 
-from tickets_project import create_app
+from tickets_project import create_app, db
 from tickets_project.models.reservation import Reservation
 from tickets_project.models.trip import Trip
-from tickets_project.trips import (DATETIME_FORMAT, filter_trips,
-                                   validate_trip_input)
+from tickets_project.pagination import paginate
+from tickets_project.trips import (DATETIME_FORMAT, TRIP_PAGE_KEY,
+                                   build_search_query, build_trips_query,
+                                   filter_trips, validate_trip_input)
 
 
 class TestTrips(unittest.TestCase):
     @mock.patch.dict(
-        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+        os.environ,
+        {
+            "APP_SECRET": "UNIT_TEST",
+            "FLASK_APP": "tickets_project",
+            # not the bundled database.db, the tests would change it
+            "DATABASE_URL": "sqlite://",
+        },
     )
     def setUp(self) -> None:
         self.app = create_app()
@@ -181,3 +189,174 @@ class TestTrips(unittest.TestCase):
         trips = self.create_test_trips()
         self.assertEqual([trips[0], trips[1]], filter_trips(trips, "two_way", ""))
         self.assertEqual([trips[2]], filter_trips(trips, "one_way", ""))
+
+
+class TestTripQueries(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        now = datetime.now()
+        with self.app.app_context():
+            db.session.add_all(
+                [
+                    Trip(
+                        departure_city=departure_city,
+                        arrival_city=arrival_city,
+                        departure_datetime=now + timedelta(days=days),
+                        arrival_datetime=now + timedelta(days=days, hours=3),
+                        available_seats=5,
+                        base_ticket_price=12.5,
+                        two_way_trip=two_way_trip,
+                    )
+                    for departure_city, arrival_city, days, two_way_trip in [
+                        ("Sofia", "Varna", 3, True),
+                        ("Sofia", "Pleven", 2, True),
+                        ("Pleven", "Varna", 1, False),
+                    ]
+                ]
+            )
+            db.session.commit()
+
+            # bypass the validator to get a trip that has already departed
+            past_trip = Trip.query.filter_by(arrival_city="Pleven").first()
+            db.session.execute(
+                db.update(Trip)
+                .where(Trip.id == past_trip.id)
+                .values(departure_datetime=now - timedelta(days=1))
+            )
+            db.session.commit()
+
+    def routes(self, trips):
+        return [(trip.departure_city, trip.arrival_city) for trip in trips]
+
+    def test_trip_query_filters(self):
+        """
+        Verify that the SQL query builder applies the same filters as filter_trips.
+        """
+        with self.app.app_context():
+            self.assertEqual(
+                [("Sofia", "Pleven"), ("Sofia", "Varna")],
+                self.routes(build_trips_query("dep_city", "Sofia").all()),
+            )
+            self.assertEqual(
+                [("Pleven", "Varna"), ("Sofia", "Varna")],
+                self.routes(build_trips_query("arr_city", "Varna").all()),
+            )
+            self.assertEqual(
+                [("Pleven", "Varna")],
+                self.routes(build_trips_query("one_way", "").all()),
+            )
+            self.assertEqual(
+                [("Sofia", "Pleven"), ("Sofia", "Varna")],
+                self.routes(build_trips_query("two_way", "").all()),
+            )
+
+            with self.assertRaises(ValueError):
+                build_trips_query("not_supported", "")
+            with self.assertRaises(ValueError):
+                build_trips_query("dep_city", "")
+
+    def test_trip_query_future_only(self):
+        """
+        Verify that trips that have already departed are excluded for regular users.
+        """
+        with self.app.app_context():
+            self.assertEqual(3, build_trips_query().count())
+            self.assertEqual(
+                ["Varna", "Varna"],
+                [t.arrival_city for t in build_trips_query(future_only=True)],
+            )
+
+    def test_trip_keyset_pagination(self):
+        """
+        Verify that trips can be paged forwards and backwards with cursors.
+        """
+        with self.app.app_context():
+            query = build_trips_query()
+
+            first = paginate(query, TRIP_PAGE_KEY, page_size=2)
+            self.assertEqual(
+                [("Sofia", "Pleven"), ("Pleven", "Varna")], self.routes(first.items)
+            )
+            self.assertIsNone(first.prev_cursor)
+
+            second = paginate(
+                query, TRIP_PAGE_KEY, after=first.next_cursor, page_size=2
+            )
+            self.assertEqual([("Sofia", "Varna")], self.routes(second.items))
+            self.assertIsNone(second.next_cursor)
+
+            back = paginate(
+                query, TRIP_PAGE_KEY, before=second.prev_cursor, page_size=2
+            )
+            self.assertEqual(first.items, back.items)
+            self.assertIsNone(back.prev_cursor)
+
+            with self.assertRaises(ValueError):
+                paginate(query, TRIP_PAGE_KEY, after="not-a-cursor")
+
+    def test_trip_compound_search(self):
+        """
+        Verify that all search criteria are combined into a single query.
+        """
+        with self.app.app_context():
+            tomorrow = datetime.now() + timedelta(days=1)
+            departure_from = datetime.strftime(tomorrow, DATETIME_FORMAT)
+
+            self.assertEqual(
+                [("Sofia", "Varna")],
+                self.routes(
+                    build_search_query(
+                        departure_city="Sofia",
+                        departure_from=departure_from,
+                        min_seats="3",
+                        max_price="40",
+                    )
+                ),
+            )
+            self.assertEqual(
+                [],
+                self.routes(build_search_query(departure_city="Sofia", max_price="10")),
+            )
+            self.assertEqual(
+                [("Pleven", "Varna")],
+                self.routes(
+                    build_search_query(
+                        arrival_city="Varna",
+                        departure_to=datetime.strftime(
+                            tomorrow + timedelta(hours=1), DATETIME_FORMAT
+                        ),
+                        future_only=True,
+                    )
+                ),
+            )
+
+            with self.assertRaises(ValueError):
+                build_search_query()
+            with self.assertRaises(ValueError):
+                build_search_query(departure_city="Sofia", min_seats="-1")
+            with self.assertRaises(ValueError):
+                build_search_query(
+                    departure_from=datetime.strftime(tomorrow, DATETIME_FORMAT),
+                    departure_to=datetime.strftime(datetime.now(), DATETIME_FORMAT),
+                )
+
+    def test_trip_search_uses_route_index(self):
+        """
+        Verify that route + departure window searches are index range scans.
+        """
+        with self.app.app_context():
+            query = build_search_query(
+                departure_city="Sofia",
+                arrival_city="Varna",
+                departure_from=datetime.strftime(datetime.now(), DATETIME_FORMAT),
+            )
+            statement = query.statement.compile(
+                db.engine, compile_kwargs={"literal_binds": True}
+            )
+            plan = db.session.execute(
+                db.text(f"EXPLAIN QUERY PLAN {statement}")
+            ).fetchall()
+            self.assertIn("ix_trip_route_departure", str(plan))
@@ -0,0 +1,162 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock as mock
+
+from sqlalchemy import event
+
+from tickets_project import create_app, db
+from tickets_project.models.user import User
+from tickets_project.passwords import PasswordHasher
+
+HEADER = "email,username,password,firstname,lastname,age,is_admin\n"
+ROWS = [
+    # a user already in the database
+    "taken@email.bg,someone,pass1,Ivan,Ivanov,30,\n",
+    "ivan@email.bg,ivan,pass2,Ivan,Ivanov,30,\n",
+    "maria@email.bg,maria,pass3,Maria,Petrova,41,yes\n",
+    # the same username as a row before it
+    "other@email.bg,ivan,pass4,Ivan,Georgiev,30,\n",
+    "not an email,petar,pass5,Petar,Petrov,30,\n",
+    "georgi@email.bg,georgi,pass6,Georgi,Georgiev,-3,\n",
+    "elena@email.bg,elena,,Elena,Dimitrova,25,\n",
+    "nikola@email.bg,nikola,pass8,Nikola,Nikolov,52,\n",
+]
+
+
+class TestUserImport(unittest.TestCase):
+    @mock.patch.dict(
+        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+    )
+    def setUp(self) -> None:
+        self.app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": "sqlite://",
+                "TESTING": True,
+                "PASSWORD_HASH_WORKERS": 0,
+                "PASSWORD_HASH_ROUNDS": 4,
+            }
+        )
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+        with self.app.app_context():
+            db.session.add(
+                User(
+                    email="taken@email.bg",
+                    username="admin",
+                    password="strongpass",
+                    firstname="test",
+                    lastname="test",
+                    age=30,
+                    is_admin=True,
+                )
+            )
+            db.session.commit()
+
+            self.statements = []
+            event.listen(
+                db.engine,
+                "before_cursor_execute",
+                lambda *args: self.statements.append(args[2]),
+            )
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def assert_imported(self):
+        with self.app.app_context():
+            users = {user.username: user for user in User.query.all()}
+            self.assertEqual({"admin", "ivan", "maria", "nikola"}, set(users))
+            self.assertTrue(users["maria"].is_admin)
+            self.assertFalse(users["ivan"].is_admin)
+            self.assertEqual("Ivanov", users["ivan"].lastname)
+            hasher = PasswordHasher(workers=0)
+            self.assertTrue(hasher.check("pass3", users["maria"].password))
+            self.assertFalse(hasher.check("pass2", users["maria"].password))
+
+    def test_user_import_command(self):
+        """
+        Verify that valid rows are imported, checking uniqueness once per batch,
+        and that the others are reported without their passwords.
+        """
+        path = self.write_file("users.csv", HEADER + "".join(ROWS))
+        result = self.app.test_cli_runner().invoke(
+            args=["users", "import", path, "--batch-size", "4", "--workers", "0"]
+        )
+
+        self.assertEqual(0, result.exit_code, result.output)
+        self.assertIn("Imported 3 users, rejected 5.", result.output)
+        # a lookup and an INSERT for each of the two batches
+        selects = [s for s in self.statements if s.startswith("SELECT")]
+        inserts = [s for s in self.statements if s.startswith("INSERT")]
+        self.assertEqual(2, len(selects))
+        self.assertEqual(2, len(inserts))
+        self.assert_imported()
+
+        with open(path + ".rejects.jsonl") as f:
+            rejects = [json.loads(line) for line in f]
+        self.assertEqual([2, 5, 6, 7, 8], [reject["line"] for reject in rejects])
+        self.assertEqual("Email address is already in use", rejects[0]["error"])
+        self.assertEqual("Username is already in use", rejects[1]["error"])
+        self.assertEqual("Please enter a valid email", rejects[2]["error"])
+        self.assertEqual("Age cannot be negative", rejects[3]["error"])
+        self.assertEqual("Missing password", rejects[4]["error"])
+        self.assertTrue(all("password" not in reject["row"] for reject in rejects))
+
+    def test_user_import_endpoint(self):
+        """
+        Verify that admins can upload a users file, and other users can't.
+        """
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+        response = client.post(
+            "/users/import",
+            data={
+                "users_file": (
+                    io.BytesIO((HEADER + "".join(ROWS)).encode()),
+                    "users.csv",
+                )
+            },
+        )
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, response.json["imported"])
+        self.assertEqual(5, len(response.json["rejected"]))
+        self.assert_imported()
+
+        self.assertEqual(400, client.post("/users/import").status_code)
+
+        with client.session_transaction() as session:
+            session["_user_id"] = "2"
+        with self.assertRaises(PermissionError):
+            client.post("/users/import")
+
+    def test_user_import_endpoint_limit(self):
+        """
+        Verify that an upload with more rows than allowed is turned away without importing any of them.
+        """
+        self.app.config["USER_IMPORT_MAX_ROWS"] = len(ROWS) - 1
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+
+        response = client.post(
+            "/users/import",
+            data={
+                "users_file": (
+                    io.BytesIO((HEADER + "".join(ROWS)).encode()),
+                    "users.csv",
+                )
+            },
+        )
+        self.assertEqual(413, response.status_code)
+        self.assertIn("flask users import", response.json["error"])
+        with self.app.app_context():
+            self.assertEqual(1, User.query.count())
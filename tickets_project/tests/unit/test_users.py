@@ -10,7 +10,13 @@ from tickets_project.models.user import User
 
 class TestUsers(unittest.TestCase):
     @mock.patch.dict(
-        os.environ, {"APP_SECRET": "UNIT_TEST", "FLASK_APP": "tickets_project"}
+        os.environ,
+        {
+            "APP_SECRET": "UNIT_TEST",
+            "FLASK_APP": "tickets_project",
+            # not the bundled database.db, the tests would change it
+            "DATABASE_URL": "sqlite://",
+        },
     )
     def setUp(self) -> None:
         self.app = create_app()
@@ -0,0 +1,128 @@
+import csv
+import json
+from datetime import datetime
+
+from . import DATETIME_FORMAT, IMPORT_BATCH_SIZE, db
+from .cache import bump_timetable_version
+from .journeys import get_timetable_graph
+from .models.trip import Trip
+from .trips import check_trip_sanity
+
+REQUIRED_TRIP_FIELDS = [
+    "departure_city",
+    "arrival_city",
+    "departure_datetime",
+    "arrival_datetime",
+    "available_seats",
+    "base_ticket_price",
+]
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+
+
+def read_rows(path):
+    # rows are read lazily, so the whole file is never held in memory
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from read_file_rows(f, path.endswith((".jsonl", ".json")))
+
+
+def read_file_rows(f, jsonl):
+    if jsonl:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    # rejected as malformed by parse_trip_row
+                    yield line_number, line.rstrip("\n")
+    else:
+        # header is line 1
+        for line_number, row in enumerate(csv.DictReader(f), start=2):
+            yield line_number, row
+
+
+def parse_datetime(value):
+    # fromisoformat is a lot faster than strptime, the checks keep it
+    # from accepting anything DATETIME_FORMAT wouldn't
+    if not isinstance(value, str) or len(value) != 16 or value[10] != "T":
+        raise ValueError(
+            f"time data {value!r} does not match format {DATETIME_FORMAT!r}"
+        )
+    return datetime.fromisoformat(value)
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+def parse_trip_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("Malformed row")
+    missing = [field for field in REQUIRED_TRIP_FIELDS if row.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    values = {
+        "departure_city": str(row["departure_city"]),
+        "arrival_city": str(row["arrival_city"]),
+        "departure_datetime": parse_datetime(row["departure_datetime"]),
+        "arrival_datetime": parse_datetime(row["arrival_datetime"]),
+        "two_way_trip": parse_bool(row.get("two_way_trip")),
+        "available_seats": int(row["available_seats"]),
+        "base_ticket_price": float(row["base_ticket_price"]),
+    }
+    check_trip_sanity(
+        values["departure_city"],
+        values["arrival_city"],
+        values["departure_datetime"],
+        values["arrival_datetime"],
+    )
+
+    # the rows are inserted without creating Trip objects,
+    # so the model validators are run on the values directly
+    for key, (validator, _) in Trip.__mapper__.validators.items():
+        values[key] = validator(None, key, values[key])
+    return values
+
+
+def import_trips(path, rejects_path, batch_size=IMPORT_BATCH_SIZE):
+    imported = rejected = 0
+    rejects = None
+    batch = []
+
+    def flush():
+        # one executemany per batch, committed in its own transaction
+        db.session.execute(db.insert(Trip), batch)
+        db.session.commit()
+        batch.clear()
+
+    try:
+        for line_number, row in read_rows(path):
+            try:
+                batch.append(parse_trip_row(row))
+            except (ValueError, TypeError) as e:
+                if rejects is None:
+                    rejects = open(rejects_path, "w", encoding="utf-8")
+                rejects.write(
+                    json.dumps({"line": line_number, "row": row, "error": str(e)})
+                    + "\n"
+                )
+                rejected += 1
+                continue
+
+            if len(batch) >= batch_size:
+                imported += len(batch)
+                flush()
+
+        if batch:
+            imported += len(batch)
+            flush()
+    finally:
+        if rejects is not None:
+            rejects.close()
+
+    # the journey planner graph is rebuilt on its next use
+    get_timetable_graph().invalidate()
+    bump_timetable_version()
+    return imported, rejected
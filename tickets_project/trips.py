@@ -1,43 +1,132 @@
+import json
 from datetime import datetime
 
+import click
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from markupsafe import Markup
 
-from . import DATETIME_FORMAT, SUPPORTED_TRIP_FILTER_TYPES, db
+from . import (DATETIME_FORMAT, IMPORT_BATCH_SIZE, SUPPORTED_TRIP_FILTER_TYPES,
+               db)
+from .cache import bump_timetable_version, get_cache, get_timetable_version
+from .journeys import get_timetable_graph
 from .models.trip import Trip
+from .pagination import paginate_request
+from .replicas import read_only
+from .schedules import ensure_materialized
 
 DATETIME_FORMAT = "%Y-%m-%dT%H:%M"
 
 trips = Blueprint("trips", __name__)
 
+SEARCH_CRITERIA = [
+    "departure_city",
+    "arrival_city",
+    "departure_from",
+    "departure_to",
+    "min_seats",
+    "max_price",
+]
+TRIP_PAGE_KEY = (Trip.departure_datetime, Trip.id)
+
 
 @trips.route("/trips/")
 @login_required
+@read_only
 def list():
-    trips = Trip.query.all()
-
-    if not current_user.is_admin:
-        trips = [trip for trip in trips if trip.departure_datetime >= datetime.now()]
-    return render_template("/trips/trips.html", trips=trips)
+    # filters are passed as query arguments when paging through filter results
+    filters = {
+        "filter_type": request.args.get("filter_type"),
+        "filter_data": request.args.get("filter_data"),
+    }
+    return render_trips_page(filters, request.args)
 
 
 @trips.route("/trips/filter", methods=["POST"])
 @login_required
+@read_only
 def filter():
-    trips = Trip.query.all()
+    filters = {
+        "filter_type": request.form.get("filter_type", ""),
+        "filter_data": request.form.get("filter_data"),
+    }
+    return render_trips_page(filters, {})
+
+
+@trips.route("/trips/search")
+@login_required
+@read_only
+def search():
+    # only the criteria that were filled in are kept, so they can be
+    # carried over to the next/previous page links as they are
+    criteria = {
+        name: request.args.get(name)
+        for name in SEARCH_CRITERIA
+        if request.args.get(name)
+    }
+
+    # trips of recurring services are only created some time ahead,
+    # searches further into the future create them on demand
     try:
-        trips = filter_trips(
-            trips, request.form.get("filter_type"), request.form.get("filter_data")
-        )
-    except ValueError as e:
-        flash(str(e), category="error")
+        if criteria.get("departure_to"):
+            ensure_materialized(
+                datetime.strptime(criteria["departure_to"], DATETIME_FORMAT)
+            )
+    except ValueError:
+        pass  # reported by build_search_query
+
+    return render_trips_page(
+        criteria, request.args, build_query=build_search_query, endpoint="trips.search"
+    )
 
-    if not current_user.is_admin:
-        trips = [trip for trip in trips if trip.departure_datetime >= datetime.now()]
-    return render_template("/trips/trips.html", trips=trips)
+
+def render_trips_page(filters, page_args, build_query=None, endpoint="trips.list"):
+    build_query = build_query or build_trips_query
+    ensure_materialized()
+    filters = {key: value for key, value in filters.items() if value is not None}
+
+    # the trip list is cached per timetable version, so any change to the
+    # trips or their seats makes every previously cached list unreachable
+    cache = get_cache()
+    cache_key = "trips:%s:%s:%s:%s:%s" % (
+        get_timetable_version(),
+        "admin" if current_user.is_admin else "user",
+        endpoint,
+        json.dumps(filters, sort_keys=True),
+        json.dumps([page_args.get(arg) for arg in ["after", "before", "page_size"]]),
+    )
+    trip_list = cache.get(cache_key)
+    if trip_list is None:
+        try:
+            trip_list = render_trip_list(filters, page_args, build_query, endpoint)
+            cache.set(cache_key, trip_list)
+        except ValueError as e:
+            # errors are not cached, the unfiltered list is shown instead
+            flash(str(e), category="error")
+            filters = {}
+            trip_list = render_trip_list({}, {}, build_trips_query, "trips.list")
+
+    return render_template(
+        "/trips/trips.html", trip_list=Markup(trip_list), filters=filters
+    )
 
 
-def filter_trips(trips, filter_type, filter_data):
+def render_trip_list(filters, page_args, build_query, endpoint):
+    page = paginate_request(
+        build_query(**filters, future_only=not current_user.is_admin),
+        TRIP_PAGE_KEY,
+        page_args,
+    )
+    return render_template(
+        "/trips/trip_list.html",
+        trips=page.items,
+        page=page,
+        page_endpoint=endpoint,
+        filters=filters,
+    )
+
+
+def validate_filter(filter_type, filter_data):
     if filter_type not in SUPPORTED_TRIP_FILTER_TYPES:
         raise ValueError("Filter type not supported!")
     if not filter_data and (
@@ -46,6 +135,103 @@ def filter_trips(trips, filter_type, filter_data):
     ):
         raise ValueError("Enter filter data")
 
+
+def build_trips_query(filter_type=None, filter_data=None, future_only=False):
+    # same filters as filter_trips, but applied as WHERE clauses
+    # so only the matching rows are loaded from the database
+    query = Trip.query
+    if filter_type is not None:
+        validate_filter(filter_type, filter_data)
+
+        if filter_type == SUPPORTED_TRIP_FILTER_TYPES[0]:
+            query = query.filter(Trip.departure_city == filter_data)
+        elif filter_type == SUPPORTED_TRIP_FILTER_TYPES[1]:
+            query = query.filter(Trip.arrival_city == filter_data)
+        else:
+            two_way_trip = filter_type == SUPPORTED_TRIP_FILTER_TYPES[3]
+            query = query.filter(Trip.two_way_trip == two_way_trip)
+
+    if future_only:
+        query = query.filter(Trip.departure_datetime >= datetime.now())
+
+    return query.order_by(Trip.departure_datetime, Trip.id)
+
+
+def parse_search_criteria(
+    departure_city=None,
+    arrival_city=None,
+    departure_from=None,
+    departure_to=None,
+    min_seats=None,
+    max_price=None,
+):
+    criteria = {}
+    if departure_city:
+        criteria["departure_city"] = departure_city
+    if arrival_city:
+        criteria["arrival_city"] = arrival_city
+
+    try:
+        if departure_from:
+            criteria["departure_from"] = datetime.strptime(
+                departure_from, DATETIME_FORMAT
+            )
+        if departure_to:
+            criteria["departure_to"] = datetime.strptime(departure_to, DATETIME_FORMAT)
+    except ValueError:
+        raise ValueError("Invalid departure time window.")
+    if departure_from and departure_to:
+        if criteria["departure_from"] > criteria["departure_to"]:
+            raise ValueError("Departure window cannot end before it starts.")
+
+    try:
+        if min_seats:
+            criteria["min_seats"] = int(min_seats)
+        if max_price:
+            criteria["max_price"] = float(max_price)
+    except ValueError:
+        raise ValueError("Seats and price must be numbers.")
+    if criteria.get("min_seats", 0) < 0:
+        raise ValueError("Minimum number of seats cannot be negative.")
+    if criteria.get("max_price", 1) <= 0:
+        raise ValueError("Maximum ticket price must be a positive number.")
+
+    if not criteria:
+        raise ValueError("Enter at least one search criterion")
+    return criteria
+
+
+def build_search_query(future_only=False, **search_args):
+    # all criteria are combined into one query - the equality conditions on
+    # the route come first so the (departure_city, arrival_city,
+    # departure_datetime) index turns route + date lookups into a range scan
+    criteria = parse_search_criteria(**search_args)
+
+    query = Trip.query
+    if "departure_city" in criteria:
+        query = query.filter(Trip.departure_city == criteria["departure_city"])
+    if "arrival_city" in criteria:
+        query = query.filter(Trip.arrival_city == criteria["arrival_city"])
+
+    departure_from = criteria.get("departure_from")
+    if future_only:
+        departure_from = max(departure_from or datetime.min, datetime.now())
+    if departure_from:
+        query = query.filter(Trip.departure_datetime >= departure_from)
+    if "departure_to" in criteria:
+        query = query.filter(Trip.departure_datetime <= criteria["departure_to"])
+
+    if "min_seats" in criteria:
+        query = query.filter(Trip.available_seats >= criteria["min_seats"])
+    if "max_price" in criteria:
+        query = query.filter(Trip.base_ticket_price <= criteria["max_price"])
+
+    return query.order_by(Trip.departure_datetime, Trip.id)
+
+
+def filter_trips(trips, filter_type, filter_data):
+    validate_filter(filter_type, filter_data)
+
     filtered_trips = []
     if filter_type == SUPPORTED_TRIP_FILTER_TYPES[0]:
         filtered_trips = [trip for trip in trips if trip.departure_city == filter_data]
@@ -105,6 +291,8 @@ def create_post():
         # add the new trip to the database
         db.session.add(new_trip)
         db.session.commit()
+        get_timetable_graph().add_trip(new_trip)
+        bump_timetable_version()
     except ValueError as e:
         flash(str(e), category="error")
         return redirect(url_for("trips.create"))
@@ -163,6 +351,8 @@ def edit_post(id):
 
         # update the trip in the database
         db.session.commit()
+        get_timetable_graph().update_trip(trip)
+        bump_timetable_version()
     except ValueError as e:
         flash(str(e), category="error")
         return redirect(url_for("trips.edit", id=trip.id))
@@ -185,6 +375,8 @@ def delete_post(id):
     # remove the trip from the database
     db.session.delete(trip)
     db.session.commit()
+    get_timetable_graph().remove_trip(id)
+    bump_timetable_version()
 
     flash("Trip successfully removed", category="info")
     return redirect(url_for("trips.list"))
@@ -199,9 +391,33 @@ def validate_trip_input(inputs):
     arrival_datetime = datetime.strptime(
         inputs.get("arrival_datetime", ""), DATETIME_FORMAT
     )
+    check_trip_sanity(
+        departure_city, arrival_city, departure_datetime, arrival_datetime
+    )
 
-    # sanity checks
+
+def check_trip_sanity(
+    departure_city, arrival_city, departure_datetime, arrival_datetime
+):
     if arrival_datetime <= departure_datetime:
         raise ValueError("Arrival time cannot be before departure time.")
     if departure_city.lower() == arrival_city.lower():
         raise ValueError("Trip departure and arrival cities cannot be the same.")
+
+
+@trips.cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--rejects",
+    type=click.Path(dir_okay=False),
+    help="Where to write rejected rows (defaults to PATH.rejects.jsonl).",
+)
+@click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True)
+def import_command(path, rejects, batch_size):
+    """Import trips from a CSV or JSONL timetable file."""
+    from .trip_import import import_trips
+
+    imported, rejected = import_trips(
+        path, rejects or path + ".rejects.jsonl", batch_size
+    )
+    click.echo(f"Imported {imported} trips, rejected {rejected}.")
@@ -0,0 +1,96 @@
+from . import USER_IMPORT_BATCH_SIZE, db
+from .models.user import User, check_email, check_username
+from .passwords import hash_passwords
+from .trip_import import parse_bool
+
+REQUIRED_USER_FIELDS = ["email", "username", "password", "firstname", "lastname", "age"]
+
+
+def parse_user_row(row):
+    if not isinstance(row, dict):
+        raise ValueError("Malformed row")
+    missing = [field for field in REQUIRED_USER_FIELDS if row.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+
+    values = {
+        "email": check_email(str(row["email"])),
+        "username": check_username(str(row["username"])),
+        "password": str(row["password"]),
+        "firstname": str(row["firstname"]),
+        "lastname": str(row["lastname"]),
+        "age": int(row["age"]),
+        "is_admin": parse_bool(row.get("is_admin")),
+    }
+
+    # the rows are inserted without creating User objects, so the model
+    # validators are run on the values directly - except the ones for email
+    # and username, whose uniqueness is checked for a whole batch at once
+    for key, (validator, _) in User.__mapper__.validators.items():
+        if key not in ("email", "username"):
+            values[key] = validator(None, key, values[key])
+    return values
+
+
+def import_users(rows, reject, batch_size=USER_IMPORT_BATCH_SIZE, workers=1, rounds=12):
+    # rows are (line number, row) pairs, reject is called with the line
+    # number, the row and the error of every row that isn't imported
+    imported = 0
+    batch = []
+
+    def flush():
+        emails = {values["email"] for _, _, values in batch}
+        usernames = {values["username"] for _, _, values in batch}
+        taken = db.session.execute(
+            db.select(User.email, User.username).where(
+                User.email.in_(emails) | User.username.in_(usernames)
+            )
+        ).all()
+        taken_emails = {email for email, _ in taken}
+        taken_usernames = {username for _, username in taken}
+
+        accepted = []
+        for line_number, row, values in batch:
+            # the first of the rows sharing an email or username wins
+            if values["email"] in taken_emails:
+                reject(line_number, row, "Email address is already in use")
+            elif values["username"] in taken_usernames:
+                reject(line_number, row, "Username is already in use")
+            else:
+                accepted.append(values)
+                taken_emails.add(values["email"])
+                taken_usernames.add(values["username"])
+        batch.clear()
+
+        if not accepted:
+            return 0
+        hashes = hash_passwords(
+            [values["password"] for values in accepted], workers, rounds
+        )
+        for values, hashed in zip(accepted, hashes):
+            values["password"] = hashed
+        # one executemany per batch, committed in its own transaction
+        db.session.execute(db.insert(User), accepted)
+        db.session.commit()
+        return len(accepted)
+
+    for line_number, row in rows:
+        try:
+            batch.append((line_number, row, parse_user_row(row)))
+        except (ValueError, TypeError) as e:
+            reject(line_number, row, str(e))
+            continue
+
+        if len(batch) >= batch_size:
+            imported += flush()
+
+    if batch:
+        imported += flush()
+    return imported
+
+
+def redact(row):
+    # rejected rows are reported back, without their password
+    if not isinstance(row, dict):
+        return row
+    return {field: value for field, value in row.items() if field != "password"}
@@ -1,23 +1,83 @@
+import io
+import itertools
+import json
 import os
 
-import bcrypt
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+import click
+from flask import (Blueprint, current_app, flash, redirect, render_template,
+                   request, url_for)
 from flask_login import current_user, login_required, login_user, logout_user
 
-from . import db
+from . import USER_IMPORT_BATCH_SIZE, db
+from .identity import invalidate_identity
 from .models.user import User
+from .pagination import paginate_request
+from .passwords import PasswordServiceBusy, get_password_hasher
+from .replicas import read_only
 
 users = Blueprint("users", __name__)
 
+USER_PAGE_KEY = (User.id,)
+
 
 @users.route("/users/")
 @login_required
+@read_only
 def list():
     if not current_user.is_admin:
         raise PermissionError("Cannot manage users as current user is not admin")
 
-    users = User.query.all()
-    return render_template("/users/list.html", users=users)
+    try:
+        page = paginate_request(User.query, USER_PAGE_KEY, request.args)
+    except ValueError as e:
+        flash(str(e), category="error")
+        page = paginate_request(User.query, USER_PAGE_KEY, {})
+
+    return render_template("/users/list.html", users=page.items, page=page)
+
+
+@users.route("/users/import", methods=["POST"])
+@login_required
+def import_post():
+    # onboarding a customer's staff: a CSV or JSONL upload with a user per row
+    if not current_user.is_admin:
+        raise PermissionError("Cannot import users as current user is not admin")
+
+    from .trip_import import read_file_rows
+    from .user_import import import_users, redact
+
+    users_file = request.files.get("users_file")
+    if not users_file:
+        return {"error": "Provide a users_file"}, 400
+
+    # the whole file is checked against the limit before anything is
+    # imported, so a rejected upload doesn't leave some of its users behind
+    max_rows = current_app.config["USER_IMPORT_MAX_ROWS"]
+    rows = tuple(
+        itertools.islice(
+            read_file_rows(
+                io.TextIOWrapper(users_file.stream, encoding="utf-8", newline=""),
+                (users_file.filename or "").endswith((".jsonl", ".json")),
+            ),
+            max_rows + 1,
+        )
+    )
+    if len(rows) > max_rows:
+        return {
+            "error": f"Upload at most {max_rows} users at a time, "
+            "import larger files with `flask users import`"
+        }, 413
+
+    rejected = []
+    imported = import_users(
+        rows,
+        lambda line_number, row, error: rejected.append(
+            {"line": line_number, "row": redact(row), "error": error}
+        ),
+        workers=current_app.config["PASSWORD_HASH_WORKERS"],
+        rounds=current_app.config["PASSWORD_HASH_ROUNDS"],
+    )
+    return {"imported": imported, "rejected": rejected}
 
 
 @users.route("/login")
@@ -31,13 +91,15 @@ def login_post():
     password = request.form.get("password")
 
     try:
-        validate_login(username, password)
+        user = validate_login(username, password)
+    except PasswordServiceBusy as e:
+        flash(str(e), category="error")
+        return render_template("users/login.html"), 503, {"Retry-After": "1"}
     except ValueError as e:
         flash(str(e), category="error")
         return redirect(url_for("users.login"))
 
     # credentials are correct - log user in
-    user = User.query.filter_by(username=username).first()
     login_user(user, remember=(True if request.form.get("remember") else False))
     return redirect(url_for("trips.list"))
 
@@ -48,14 +110,11 @@ def validate_login(username, password):
         raise ValueError("Invalid username - user doesn't exist.")
     else:
         # check if password is correct
-        hashed_pass = user.password
-        password_correct = (
-            bcrypt.hashpw(bytes(password, "utf-8"), hashed_pass) == hashed_pass
-        )
-
-        if not password_correct:
+        if not get_password_hasher().check(password or "", user.password):
             raise ValueError("Incorrect password.")
 
+    return user
+
 
 @users.route("/logout")
 @login_required
@@ -78,8 +137,10 @@ def signup_post():
         new_user = User(
             email=request.form.get("email"),
             username=request.form.get("username"),
-            password=bcrypt.hashpw(
-                bytes(request.form.get("password"), "utf-8"), bcrypt.gensalt()
+            password=(
+                get_password_hasher().hash(request.form.get("password"))
+                if request.form.get("password")
+                else None
             ),
             firstname=request.form.get("firstname"),
             lastname=request.form.get("lastname"),
@@ -89,6 +150,15 @@ def signup_post():
         # add the new user to the database
         db.session.add(new_user)
         db.session.commit()
+    except PasswordServiceBusy as e:
+        flash(str(e), category="error")
+        return (
+            render_template(
+                "users/signup.html", dev_mode=os.environ.get("DEV_MODE_ENABLED")
+            ),
+            503,
+            {"Retry-After": "1"},
+        )
     except ValueError as e:
         flash(str(e), category="error")
         return redirect(url_for("users.signup"))
@@ -134,9 +204,51 @@ def edit_post(id):
 
         # update the user in the database
         db.session.commit()
+        invalidate_identity(user.id)
     except ValueError as e:
         flash(str(e), category="error")
         return redirect(url_for("users.edit", id=user.id))
 
     flash("User successfully updated", category="info")
     return redirect(url_for("users.edit", id=user.id))
+
+
+@users.cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--rejects",
+    type=click.Path(dir_okay=False),
+    help="Where to write rejected rows (defaults to PATH.rejects.jsonl).",
+)
+@click.option("--batch-size", default=USER_IMPORT_BATCH_SIZE, show_default=True)
+@click.option(
+    "--workers",
+    default=os.cpu_count() or 1,
+    show_default=True,
+    help="Processes hashing the passwords.",
+)
+def import_command(path, rejects, batch_size, workers):
+    """Import users from a CSV or JSONL file."""
+    from .trip_import import read_rows
+    from .user_import import import_users, redact
+
+    rejects_path = rejects or path + ".rejects.jsonl"
+    rejected = []
+
+    def reject(line_number, row, error):
+        mode = "a" if rejected else "w"
+        with open(rejects_path, mode, encoding="utf-8") as f:
+            f.write(
+                json.dumps({"line": line_number, "row": redact(row), "error": error})
+                + "\n"
+            )
+        rejected.append(line_number)
+
+    imported = import_users(
+        read_rows(path),
+        reject,
+        batch_size,
+        workers=workers,
+        rounds=current_app.config["PASSWORD_HASH_ROUNDS"],
+    )
+    click.echo(f"Imported {imported} users, rejected {len(rejected)}.")